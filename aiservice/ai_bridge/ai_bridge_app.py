@@ -10,6 +10,7 @@ from flask import Flask
 from flask_cors import CORS
 from config import CORS_ORIGINS
 from model_loader import load_embedding_model, load_llama_model
+from reranker import reranker
 from routes import register_routes
 
 # Fix Windows console encoding issues
@@ -51,6 +52,11 @@ if __name__ == '__main__':
     
     if not llama_loaded:
         logger.warning("Llama model not loaded, will use rule-based description generation")
+
+    # Loaded up front so no search pays for it; without it, re-ranking is skipped
+    logger.info("Loading cross-encoder for search re-ranking...")
+    if not reranker.load():
+        logger.warning("Cross-encoder not loaded, search results will not be re-ranked")
     
     app = create_app()
     
@@ -59,8 +65,14 @@ if __name__ == '__main__':
     logger.info("  - Health check: GET /health")
     logger.info("  - Process document: POST /api/documents/process-ai")
     logger.info("  - Analyze document: POST /api/documents/analyze")
+    logger.info("  - Queue analysis job: POST /api/documents/analyze/jobs")
+    logger.info("  - Analysis job status: GET /api/documents/analyze/jobs/<job_id>")
+    logger.info("  - Analysis cache: GET/DELETE /api/documents/analyze/cache")
+    logger.info("  - Near-duplicate check: POST /api/documents/near-duplicates")
     logger.info("  - Document similarity: POST /api/documents/similarity")
     logger.info("  - Semantic search: POST /api/documents/search")
+    logger.info("  - Batch semantic search: POST /api/documents/search/batch")
+    logger.info("  - Title suggestions: GET /api/documents/suggest?q=")
 
     # Use werkzeug directly to avoid Flask CLI console issues on Windows
     from werkzeug.serving import run_simple
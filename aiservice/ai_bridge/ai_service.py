@@ -2,8 +2,14 @@
 Core AI functionality for document processing - With Groq/Llama fallback
 """
 import os
+import json
+import time
 import logging
+import threading
 import requests
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
+from collections import OrderedDict
+from contextlib import contextmanager
 import re
 from pathlib import Path
 from dotenv import load_dotenv
@@ -15,9 +21,38 @@ load_dotenv(dotenv_path=env_path)
 from config import (
     LARAVEL_BASE_URL, LARAVEL_API_TIMEOUT,
     MAX_TITLE_LENGTH, MAX_DESCRIPTION_LENGTH,
-    MIN_PARAGRAPH_LENGTH, TITLE_SEARCH_LINES, EMBEDDING_MODEL_PATH
+    MIN_PARAGRAPH_LENGTH, TITLE_SEARCH_LINES, EMBEDDING_MODEL_PATH,
+    ANALYSIS_MODE, ANALYSIS_COMBINED_MAX_TOKENS, LLAMA_PREFIX_CACHE_ENABLED,
+    SEARCH_QUANTIZATION, SEARCH_SNAPSHOT_PATH, SEARCH_SNAPSHOT_LOAD_ON_START, SEARCH_DEDUPLICATE,
+    SEARCH_REBUILD_IN_BACKGROUND, CHUNK_TEXT_CACHE_SIZE, CHUNK_TEXT_BATCH_SIZE,
+    ANALYSIS_CACHE_ENABLED, LLAMA_MODEL_PATH,
+    GROQ_HEDGE_ENABLED, GROQ_HEDGE_PERCENTILE, GROQ_HEDGE_DEFAULT_SECONDS, GROQ_HEDGE_MIN_SECONDS,
+    FOLDER_CLASSIFIER_ENABLED, FOLDER_LLM_CONFIDENCE
+)
+from model_loader import (
+    get_embedding_model, is_llama_loaded, get_llama_pool, get_namespace_encoder
+)
+from search_index import VectorIndex, extract_embedding_records
+from embedding_sync import EmbeddingSync
+from vector_namespaces import namespace_registry
+from quantized_index import QuantizedVectorIndex, float_file_path, remove_float_files
+from dedup_index import DeduplicatedVectorIndex
+from suggest_index import suggestion_index
+from search_snapshot import import_snapshot
+from index_holder import DoubleBufferedIndex
+from background_refresh import BackgroundRefresh
+from partitioned_index import FolderPartitionedIndex
+from llama_prefix_cache import llama_prefix_cache
+from analysis_cache import analysis_cache
+from groq_client import groq_client, groq_executor, hedge_executor
+from folder_classifier import FolderCentroidClassifier
+from document_features import TermMatcher, DocumentFeatureCache
+from excerpt_selector import excerpt_selector
+from analysis_prompts import (
+    LLAMA_DOCUMENT_PREFIX, LLAMA_TASK_SUFFIX, LLAMA_COMBINED_INSTRUCTION, LLAMA_TITLE_INSTRUCTION,
+    LLAMA_DESCRIPTION_INSTRUCTION, LLAMA_REMARKS_INSTRUCTION, LLAMA_FOLDER_INSTRUCTION,
+    GROQ_TITLE_PROMPT, GROQ_DESCRIPTION_PROMPT, GROQ_REMARKS_PROMPT, groq_messages
 )
-from model_loader import get_embedding_model, get_llama_model, is_llama_loaded, get_llama_lock
 
 # Configure logging
 # logging.basicConfig(level=logging.INFO)
@@ -32,7 +67,6 @@ logger.addHandler(fh)
 # Groq API configuration - loaded AFTER dotenv
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
-GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
 AI_SERVICE_TYPE = os.getenv('AI_SERVICE_TYPE', 'groq')  # 'groq' or 'local'
 
 logger.info(f"AI Service initialized - Type: {AI_SERVICE_TYPE}, Groq API Key: {'Found' if GROQ_API_KEY else 'Not found'}")
@@ -55,22 +89,46 @@ class ContentAnalyzer:
     ]
     
     TOPIC_PATTERNS = {
-        'attorney-client privilege': r'attorney[- ]client privilege',
-        'confidentiality': r'confidential|confidentiality',
-        'case preparation': r'case preparation|preparing cases',
-        'court procedures': r'court procedures|courtroom',
-        'evidence handling': r'evidence|handling evidence'
+        'attorney-client privilege': ('attorney-client privilege', 'attorney client privilege'),
+        'confidentiality': ('confidential',),
+        'case preparation': ('case preparation', 'preparing cases'),
+        'court procedures': ('court procedures', 'courtroom'),
+        'evidence handling': ('evidence',)
     }
-    
+
+    # Category keywords used when scoring categories
+    LEGAL_KEYWORDS = {
+        'contract': ['agreement', 'contract', 'terms'],
+        'litigation': ['court', 'case', 'plaintiff', 'defendant'],
+        'criminal': ['criminal', 'defense', 'case']
+    }
+
+    # Keywords the rule-based title and description generators look for
+    TITLE_KEYWORDS = [
+        'affidavit', 'no violation', 'compliance', 'loss', 'criminal', 'case', 'contract', 'agreement',
+        'policy', 'procedure', 'resolution', 'board', 'memorandum', 'memo', 'attorney-client privilege',
+        'confidential'
+    ]
+
+    @classmethod
+    def vocabulary(cls):
+        """Every fixed term the analyzers look up, matched in one pass per document"""
+        terms = set(cls.SUBJECT_PATTERNS) | set(cls.TITLE_KEYWORDS)
+        for keywords in list(cls.DOCUMENT_TYPES.values()) + list(cls.LEGAL_KEYWORDS.values()):
+            terms.update(keywords)
+        for phrases in cls.TOPIC_PATTERNS.values():
+            terms.update(phrases)
+        return terms
+
     @staticmethod
     def detect_document_type(text):
         """Detect document type based on content"""
-        text_lower = text.lower()
+        features = document_features.get(text)
         best_match = 'legal document'
         best_score = 0
         
         for doc_type, keywords in ContentAnalyzer.DOCUMENT_TYPES.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
+            score = sum(1 for keyword in keywords if features.has(keyword))
             if score > best_score:
                 best_score = score
                 best_match = doc_type
@@ -80,25 +138,54 @@ class ContentAnalyzer:
     @staticmethod
     def extract_subject_matter(text):
         """Extract main subject from document"""
-        text_lower = text.lower()
+        features = document_features.get(text)
         for pattern in ContentAnalyzer.SUBJECT_PATTERNS:
-            if re.search(pattern, text_lower):
+            if features.has(pattern):
                 return pattern
         return None
     
     @staticmethod
     def extract_key_topics(text):
         """Extract key topics from document"""
-        text_lower = text.lower()
+        features = document_features.get(text)
         found_topics = []
-        for topic, pattern in ContentAnalyzer.TOPIC_PATTERNS.items():
-            if re.search(pattern, text_lower):
+        for topic, phrases in ContentAnalyzer.TOPIC_PATTERNS.items():
+            if any(features.has(phrase) for phrase in phrases):
                 found_topics.append(topic)
         return found_topics[:3]
 
+# Global per-document features shared by every analyzer of a request
+document_features = DocumentFeatureCache(TermMatcher(ContentAnalyzer.vocabulary()))
+
 class AIBridgeService:
     def __init__(self):
         self.analyzer = ContentAnalyzer()
+        self.embedding_sync = EmbeddingSync(self)
+        self._search_indexes = {}  # namespace -> DoubleBufferedIndex keyed by (sync version, store generation)
+        self._search_indexes_lock = threading.Lock()
+        self._partitioned_indexes = {}  # namespace -> FolderPartitionedIndex
+        self._chunk_text_cache = OrderedDict()  # embedding_id -> chunk_text, least recently used first
+        self._chunk_text_lock = threading.Lock()
+        self._analysis_grammar = (None, None)  # (folder names, compiled JSON grammar) of the last combined prompt
+        self.folder_classifier = FolderCentroidClassifier()
+        self._suggestion_refresh = BackgroundRefresh('suggestions', self._refresh_suggestion_titles)
+        self._classifier_refresh = BackgroundRefresh('folder_classifier', self._refresh_folder_centroids)
+        self._analysis_state = threading.local()  # Per-request flag: a model call failed and a fallback answered
+        # A saved mirror is at least as current as any snapshot it was bootstrapped from
+        if SEARCH_SNAPSHOT_LOAD_ON_START and not self.embedding_sync.has_saved_state():
+            self.load_search_snapshot()
+
+    def load_search_snapshot(self, path=SEARCH_SNAPSHOT_PATH):
+        """Bootstrap the synced embeddings from a snapshot; later syncs only pull what changed since"""
+        if not os.path.exists(path):
+            return None
+        try:
+            info = import_snapshot(self.embedding_sync, path, suggestion_index)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable search snapshot {path}: {str(e)}")
+            return None
+        # Restoring bumps the sync version, so published indexes are rebuilt on their next use
+        return info
     
     def call_laravel_api(self, endpoint, method='GET', data=None, headers=None):
         """Make API calls to Laravel backend"""
@@ -133,6 +220,16 @@ class AIBridgeService:
             logger.error(f"Laravel API call failed: {str(e)}")
             return {'success': False, 'error': str(e), 'status_code': 500}
     
+    def stream_laravel_rows(self, endpoint, params=None, headers=None):
+        """Stream newline-delimited JSON rows from Laravel, parsing one row at a time"""
+        url = f"{LARAVEL_BASE_URL}/api{endpoint}"
+        with requests.get(url, params=params, headers=headers, timeout=LARAVEL_API_TIMEOUT, stream=True) as response:
+            if response.status_code >= 400 or response.status_code == 302:
+                raise Exception(f"Laravel API error: {response.status_code} for {endpoint}")
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
     def generate_embeddings_with_bert(self, text_chunks):
         """Generate embeddings using BERT model"""
         try:
@@ -153,7 +250,191 @@ class AIBridgeService:
         except Exception as e:
             logger.error(f"BERT embedding generation failed: {str(e)}")
             return []
-    
+
+    def encode_queries(self, queries, namespace=None):
+        """Encode all search queries with a single call to the namespace's embedding model"""
+        namespace = namespace_registry.resolve(namespace)
+        encoder = get_namespace_encoder(namespace)
+        if not encoder:
+            raise Exception(f"Embedding model for namespace {namespace} not loaded")
+        return encoder.encode(list(queries), convert_to_tensor=False)
+
+    def _build_search_index(self, namespace):
+        """Build a vector index for one namespace from the synced embeddings; returns (key, index)"""
+        store = namespace_registry.store(namespace)
+        key = (self.embedding_sync.version, store.generation)
+        holder = self.search_index_holder(namespace)
+        if holder.key == key:
+            # Another query rebuilt this version while this one waited for the build lock
+            return None
+        records = namespace_registry.records_for(
+            self.embedding_sync.records(),
+            namespace,
+            encoder=get_namespace_encoder(namespace),
+            fetch_texts=self.chunk_texts
+        )
+        if SEARCH_QUANTIZATION and not SEARCH_DEDUPLICATE:
+            # Vectors are streamed into this version's float file; files of versions nobody reads are removed
+            float_path = float_file_path(namespace, key)
+            remove_float_files(namespace, keep=[float_path] + [
+                getattr(index, 'float_path', None) for index in holder.indexes()
+            ])
+            search_index = QuantizedVectorIndex.from_records(records, SEARCH_QUANTIZATION, float_path)
+        else:
+            search_index = VectorIndex.from_records(records)
+        if SEARCH_DEDUPLICATE and len(search_index):
+            # Deduplication and quantization both replace the float matrix; deduplication wins
+            if SEARCH_QUANTIZATION:
+                logger.warning("SEARCH_QUANTIZATION is ignored while SEARCH_DEDUPLICATE is enabled")
+            search_index = DeduplicatedVectorIndex.from_index(search_index)
+        logger.info(f"Built search index for {namespace} with {len(search_index)} chunks")
+        return key, search_index
+
+    def search_index_holder(self, namespace):
+        """Double-buffered index holder for a namespace"""
+        with self._search_indexes_lock:
+            if namespace not in self._search_indexes:
+                self._search_indexes[namespace] = DoubleBufferedIndex(f"search:{namespace}")
+            return self._search_indexes[namespace]
+
+    @contextmanager
+    def search_index(self, headers=None, namespace=None, wait_for_rebuild=False):
+        """Hold the current vector index of a namespace over the incrementally synced Laravel embeddings
+
+        Only the very first build blocks. When the sync has applied changes since the index was
+        built, a shadow index is rebuilt in the background and swapped in while this and other
+        queries keep reading the published one, unless `wait_for_rebuild` asks for a fresh index.
+        """
+        namespace = namespace_registry.resolve(namespace)
+        self.embedding_sync.sync(headers=headers)
+
+        holder = self.search_index_holder(namespace)
+        build = lambda: self._build_search_index(namespace)
+        if holder.key is None:
+            holder.build(build, only_if_empty=True)
+        elif holder.key != (self.embedding_sync.version, namespace_registry.store(namespace).generation):
+            if wait_for_rebuild or not SEARCH_REBUILD_IN_BACKGROUND:
+                holder.build(build)
+            else:
+                holder.rebuild_async(build)
+
+        with holder.acquire() as search_index:
+            yield search_index
+
+    def partitioned_index(self, namespace):
+        """Folder-partitioned index of a namespace"""
+        with self._search_indexes_lock:
+            if namespace not in self._partitioned_indexes:
+                self._partitioned_indexes[namespace] = FolderPartitionedIndex(namespace)
+            return self._partitioned_indexes[namespace]
+
+    @contextmanager
+    def folder_search_index(self, headers=None, namespace=None, folder_ids=None):
+        """Search view over the folder partitions a query needs (all folders when `folder_ids` is None)
+
+        Only the requested folders are brought up to date and loaded, so a scoped query neither
+        rebuilds nor holds the rest of the archive.
+        """
+        namespace = namespace_registry.resolve(namespace)
+        self.embedding_sync.sync(headers=headers)
+
+        partitioned = self.partitioned_index(namespace)
+        encoder = get_namespace_encoder(namespace)
+        partitioned.refresh(
+            self.embedding_sync,
+            prepare_records=lambda records: namespace_registry.records_for(
+                records, namespace, encoder=encoder, fetch_texts=self.chunk_texts
+            ),
+            folder_ids=folder_ids,
+            store=namespace_registry.store(namespace)
+        )
+        yield partitioned.scope(folder_ids)
+
+    def chunk_texts(self, embedding_ids, headers=None):
+        """Chunk text by embedding_id; ids not cached are fetched from Laravel in batched calls"""
+        texts, missing = {}, []
+        with self._chunk_text_lock:
+            for embedding_id in dict.fromkeys(embedding_ids):
+                if embedding_id in self._chunk_text_cache:
+                    self._chunk_text_cache.move_to_end(embedding_id)
+                    texts[embedding_id] = self._chunk_text_cache[embedding_id]
+                else:
+                    missing.append(embedding_id)
+
+        for start in range(0, len(missing), CHUNK_TEXT_BATCH_SIZE):
+            result = self.call_laravel_api(
+                '/document-embeddings/texts',
+                method='POST',
+                data={'embedding_ids': missing[start:start + CHUNK_TEXT_BATCH_SIZE]},
+                headers=headers
+            )
+            if not result['success']:
+                logger.warning(f"Failed to fetch chunk texts: {result.get('error') or result.get('status_code')}")
+                continue
+            fetched = {
+                row['embedding_id']: row.get('chunk_text') or ''
+                for row in extract_embedding_records(result.get('data')) if 'embedding_id' in row
+            }
+            texts.update(fetched)
+            with self._chunk_text_lock:
+                self._chunk_text_cache.update(fetched)
+                while len(self._chunk_text_cache) > CHUNK_TEXT_CACHE_SIZE:
+                    self._chunk_text_cache.popitem(last=False)
+        return texts
+
+    def hydrate_results(self, results, headers=None):
+        """Fill in matched_chunk for search hits whose index row holds no chunk text
+
+        Returns False if Laravel could not supply some of the texts; those hits keep None.
+        """
+        pending = [result for result in results if not result.get('matched_chunk')]
+        if not pending:
+            return True
+        texts = self.chunk_texts([result['embedding_id'] for result in pending], headers=headers)
+        for result in pending:
+            result['matched_chunk'] = texts.get(result['embedding_id'])
+        return all(result['embedding_id'] in texts for result in pending)
+
+    def search_index_status(self):
+        with self._search_indexes_lock:
+            holders = dict(self._search_indexes)
+            partitioned = dict(self._partitioned_indexes)
+        status = {namespace: holder.status() for namespace, holder in holders.items()}
+        for namespace, index in partitioned.items():
+            status.setdefault(namespace, {})['partitions'] = index.status()
+        return status
+
+    def background_refresh_status(self):
+        return {
+            'suggestions': self._suggestion_refresh.status(),
+            'folder_classifier': self._classifier_refresh.status()
+        }
+
+    def refresh_suggestions(self, headers=None):
+        """The typeahead index, with a refresh from the synced embeddings started in the background
+
+        Only the very first call waits for the titles; later lookups answer from the index as it
+        stands while the sync and rebuild run off the request path.
+        """
+        if suggestion_index.synced_version is None and not len(suggestion_index):
+            self._refresh_suggestion_titles(headers=headers)
+        else:
+            self._suggestion_refresh.trigger(headers=headers)
+        return suggestion_index
+
+    def _refresh_suggestion_titles(self, headers=None):
+        """Bring the typeahead titles in line with the synced embeddings and rebuild the index"""
+        self.embedding_sync.sync(headers=headers)
+        version = self.embedding_sync.version
+        if suggestion_index.synced_version != version:
+            titles = {
+                record['doc_id']: record['document_title']
+                for record in self.embedding_sync.records()
+                if record.get('doc_id') and record.get('document_title')
+            }
+            suggestion_index.sync_titles(titles, version=version)
+        suggestion_index.rebuild()
+
     def analyze_document_content(self, text):
         """Analyze document content to extract title, description, and generate AI suggestions"""
         try:
@@ -170,14 +451,24 @@ class AIBridgeService:
                     'ai_remarks': 'ERROR: No text content available for analysis'
                 }
 
-            # Extract title
-            title = self._extract_title(text)
+            # Scan the text and select its prompt excerpt once up front; the generators share both
+            document_features.get(text)
+            excerpt_selector.excerpt(text)
+
+            if AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY:
+                # The three Groq generations are independent, so they run at once over pooled connections
+                title, description, remarks = self._run_concurrently(
+                    (self._extract_title, self._generate_description, self._generate_remarks), text
+                )
+            else:
+                # Extract title
+                title = self._extract_title(text)
 
-            # Generate description
-            description = self._generate_description(text)
+                # Generate description
+                description = self._generate_description(text)
 
-            # Generate remarks
-            remarks = self._generate_remarks(text)
+                # Generate remarks
+                remarks = self._generate_remarks(text)
 
             return {
                 'suggested_title': title,
@@ -194,6 +485,324 @@ class AIBridgeService:
                 'ai_remarks': f'Analysis error: {str(e)}'
             }
     
+    @staticmethod
+    def _llama_document_prefix(text):
+        """Prompt prefix shared by every Llama analysis task of a document, around its salient excerpt"""
+        return LLAMA_DOCUMENT_PREFIX.format(excerpt=excerpt_selector.excerpt(text))
+
+    def _run_llama_task(self, text, instruction, **generation_kwargs):
+        """Run one analysis task as the shared document prefix plus a task-specific suffix
+
+        The task runs on a free worker of the Llama pool. The prefix is evaluated once per
+        document and worker and restored from the prefix cache for the other tasks, so each
+        call only pays prompt evaluation for its own instruction.
+        """
+        prefix = self._llama_document_prefix(text)
+        prompt = f"{prefix}{instruction}{LLAMA_TASK_SUFFIX}"
+        # A worker is used by one job at a time, which keeps model access thread-safe
+        try:
+            with get_llama_pool().worker() as llama_model:
+                if LLAMA_PREFIX_CACHE_ENABLED:
+                    try:
+                        llama_prefix_cache.prepare(llama_model, prefix)
+                    except Exception as e:
+                        logger.warning(f"Llama prefix cache unavailable: {str(e)}")
+                return llama_model(prompt, **generation_kwargs)
+        except Exception:
+            self._mark_degraded()
+            raise
+
+    def _run_concurrently(self, generators, text):
+        """Results of `generator(text)` for each generator, run on the Groq executor threads
+
+        The degraded flag is per thread, so each task reports its own and they are merged back
+        into the calling request.
+        """
+        def run(generator):
+            self._analysis_state.degraded = False
+            return generator(text), self._analysis_state.degraded
+
+        outcomes = [future.result() for future in [groq_executor.submit(run, generator) for generator in generators]]
+        if any(degraded for _, degraded in outcomes):
+            self._mark_degraded()
+        return [result for result, _ in outcomes]
+
+    def _generate_with_groq(self, field, groq_generator, llama_generator, text, accept):
+        """Groq answer for one field, hedged with local Llama when Groq is slower than usual
+
+        Returns (result, llama_tried); result is None when the caller should fall back, and
+        llama_tried tells it the Llama generation already ran. An open circuit breaker makes
+        the Groq call fail at once. With GROQ_HEDGE_ENABLED, Llama is started once Groq has not
+        answered within the GROQ_HEDGE_PERCENTILE latency of recent calls and the first
+        acceptable answer wins; a losing Llama generation still runs to completion.
+        """
+        def attempt(generator, source='Groq'):
+            try:
+                result = generator(text)
+                return result if accept(result) else None
+            except Exception as e:
+                logger.warning(f"{source} {field} generation failed: {str(e)}")
+                return None
+
+        if not GROQ_HEDGE_ENABLED or not is_llama_loaded():
+            logger.info(f"Attempting Groq API for {field} generation...")
+            result = attempt(groq_generator)
+            if result is None:
+                self._mark_degraded()
+            return result, False
+
+        deadline = groq_client.breaker.latency_percentile(GROQ_HEDGE_PERCENTILE)
+        deadline = max(deadline if deadline is not None else GROQ_HEDGE_DEFAULT_SECONDS, GROQ_HEDGE_MIN_SECONDS)
+        groq_future = hedge_executor.submit(attempt, groq_generator)
+        try:
+            result = groq_future.result(timeout=deadline)
+            if result is None:
+                self._mark_degraded()
+            return result, False
+        except FuturesTimeoutError:
+            logger.info(f"Groq {field} slower than {deadline:.2f}s, hedging with local Llama")
+
+        llama_future = hedge_executor.submit(attempt, llama_generator, 'Llama')
+        for future in as_completed([groq_future, llama_future]):
+            result = future.result()
+            if result is not None:
+                if future is llama_future:
+                    # Not Groq's answer, so it must not be cached under the Groq model id
+                    self._mark_degraded()
+                logger.info(f"Hedged {field} answered by {'Llama' if future is llama_future else 'Groq'}")
+                return result, True
+        self._mark_degraded()
+        return None, True
+
+    def _mark_degraded(self):
+        """Note that the current analysis fell back from a failed model call, so it is not cached"""
+        self._analysis_state.degraded = True
+
+    @staticmethod
+    def _analysis_model_id():
+        """Identity of the model that answers analyses right now, part of the analysis cache key"""
+        if AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY:
+            return f"groq:{GROQ_MODEL}"
+        if is_llama_loaded():
+            size = os.path.getsize(LLAMA_MODEL_PATH) if os.path.exists(LLAMA_MODEL_PATH) else 0
+            return f"llama:{os.path.basename(LLAMA_MODEL_PATH)}:{size}"
+        return 'rule_based'
+
+    def analyze_document(self, text, categories, folders, mode=ANALYSIS_MODE, doc_id=None):
+        """Title, description, remarks and folder suggestion for a document
+
+        Returns (content_analysis, suggestions) in the shapes of analyze_document_content and
+        suggest_category_and_folder. In 'combined' mode with local Llama, the four Llama
+        generations are replaced by a single JSON generation. Results are served from the
+        persistent analysis cache when the same text was analyzed against the same folders,
+        model and prompts; results that fell back from a failed model call are not cached.
+        The folder classifier only runs when the analysis does, so a cache hit costs no encoding.
+        """
+        if not ANALYSIS_CACHE_ENABLED or not text or len(text.strip()) < 50:
+            return self._analyze_document(text, categories, folders, mode, self.classify_folder(text, folders, doc_id))
+
+        model_id = self._analysis_model_id()
+        try:
+            cached = analysis_cache.get(text, folders, model_id, categories)
+        except Exception as e:
+            logger.warning(f"Analysis cache lookup failed: {str(e)}")
+            cached = None
+        if cached is not None:
+            logger.info(f"Served document analysis from cache ({model_id})")
+            return cached
+
+        classification = self.classify_folder(text, folders, doc_id)
+        self._analysis_state.degraded = False
+        content_analysis, suggestions = self._analyze_document(text, categories, folders, mode, classification)
+        if self._analysis_state.degraded or content_analysis.get('fallback_fields'):
+            analysis_cache.skip()
+            return content_analysis, suggestions
+        try:
+            analysis_cache.put(text, folders, model_id, content_analysis, suggestions, categories)
+        except Exception as e:
+            logger.warning(f"Analysis cache store failed: {str(e)}")
+        return content_analysis, suggestions
+
+    def _analyze_document(self, text, categories, folders, mode, classification=None):
+        use_groq = AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY
+        if mode != 'combined' or use_groq or not is_llama_loaded() or not text or len(text.strip()) < 100:
+            return (
+                self.analyze_document_content(text),
+                self.suggest_category_and_folder(text, categories, folders, folder_classification=classification)
+            )
+
+        folder_names = [f.get('folder_name') for f in folders if isinstance(f, dict) and 'folder_name' in f]
+        analysis = self._generate_llama_analysis(text, folder_names)
+        content_analysis = {
+            'suggested_title': analysis['title'],
+            'suggested_description': analysis['description'],
+            'ai_remarks': analysis['remarks'],
+            'fallback_fields': analysis['fallback_fields']
+        }
+        # An empty name keeps suggest_category_and_folder from asking Llama a second time
+        suggestions = self.suggest_category_and_folder(
+            text, categories, folders, llama_folder_name=analysis['folder'] or '', folder_classification=classification
+        )
+        return content_analysis, suggestions
+
+    def classify_folder(self, text, folders, doc_id=None):
+        """Nearest-centroid classification of a document among `folders`, or None if it cannot be made
+
+        The document's own synced chunk vectors are used when Laravel already stored them,
+        otherwise the start of `text` is embedded. Folder centroids come from the documents
+        already filed; they are brought up to date from the embedding sync in the background,
+        so until the first refresh finishes the LLM picks the folder.
+        """
+        folder_ids = {folder.get('folder_id') for folder in folders or [] if isinstance(folder, dict)} - {None}
+        if not FOLDER_CLASSIFIER_ENABLED or not folder_ids:
+            return None
+        try:
+            doc_id = int(doc_id) if doc_id is not None else None
+            self._classifier_refresh.trigger()
+            encoder = get_namespace_encoder(namespace_registry.active_namespace)
+            vector = self.folder_classifier.document_vector(doc_id, text, encoder)
+            if vector is None:
+                return None
+            classification = self.folder_classifier.classify(vector, folder_ids, doc_id)
+            if classification:
+                logger.info(f"Folder classifier: folder {classification['folder_id']} with similarity "
+                            f"{classification['similarity']:.3f} and margin {classification['margin']} "
+                            f"({'confident' if classification['confident'] else 'asking the LLM'})")
+            return classification
+        except Exception as e:
+            logger.warning(f"Folder classification failed: {str(e)}")
+            return None
+
+    def _refresh_folder_centroids(self):
+        """Sync the embeddings and fold changed folders into the classifier's centroids"""
+        namespace = namespace_registry.active_namespace
+        encoder = get_namespace_encoder(namespace)
+        # The changes feed needs no user token
+        self.embedding_sync.sync()
+        self.folder_classifier.refresh(
+            self.embedding_sync,
+            namespace,
+            prepare_records=lambda records: namespace_registry.records_for(
+                records, namespace, encoder=encoder, fetch_texts=self.chunk_texts
+            ),
+            store=namespace_registry.store(namespace)
+        )
+
+    @staticmethod
+    def _classified_folder(classification, folders):
+        """Folder object the classifier confidently chose, or None"""
+        if not classification or not classification['confident']:
+            return None
+        return next(
+            (folder for folder in folders if isinstance(folder, dict) and folder.get('folder_id') == classification['folder_id']),
+            None
+        )
+
+    def _analysis_json_grammar(self, folder_names):
+        """llama.cpp grammar forcing the combined analysis JSON, or None if it cannot be built"""
+        cached_names, grammar = self._analysis_grammar
+        if cached_names == folder_names:
+            return grammar
+
+        schema = {
+            'type': 'object',
+            'properties': {
+                'title': {'type': 'string'},
+                'description': {'type': 'string'},
+                'remarks': {'type': 'string'},
+                'folder': {'type': 'string', 'enum': folder_names} if folder_names else {'type': 'string'}
+            },
+            'required': ['title', 'description', 'remarks', 'folder']
+        }
+        try:
+            from llama_cpp import LlamaGrammar
+            grammar = LlamaGrammar.from_json_schema(json.dumps(schema), verbose=False)
+        except Exception as e:
+            logger.warning(f"JSON grammar unavailable, relying on the prompt alone: {str(e)}")
+            grammar = None
+        self._analysis_grammar = (list(folder_names), grammar)
+        return grammar
+
+    @staticmethod
+    def _parse_analysis_json(raw_response):
+        """The JSON object in a combined analysis response, or {} if there is none"""
+        raw_response = (raw_response or '').strip()
+        candidates = [raw_response]
+        match = re.search(r'\{.*\}', raw_response, re.DOTALL)
+        if match:
+            candidates.append(match.group(0))
+        for candidate in candidates:
+            try:
+                parsed = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+        return {}
+
+    def _generate_llama_analysis(self, text, folder_names):
+        """One Llama generation for title, description, remarks and folder, validated per field
+
+        Each field that is missing or fails the same checks as the separate generators falls
+        back to its rule-based generator; `fallback_fields` lists which ones did.
+        """
+        raw_response = ''
+        started = time.perf_counter()
+        try:
+            if get_llama_pool() is None:
+                raise Exception("Llama model not available")
+
+            folders_list = ', '.join(folder_names) if folder_names else 'none'
+            instruction = LLAMA_COMBINED_INSTRUCTION.format(folders_list=folders_list)
+
+            grammar = self._analysis_json_grammar(folder_names)
+            response = self._run_llama_task(
+                text,
+                instruction,
+                max_tokens=ANALYSIS_COMBINED_MAX_TOKENS,
+                temperature=0.2,
+                top_p=0.9,
+                repeat_penalty=1.1,
+                stop=["<|eot_id|>", "<|start_header_id|>"],
+                grammar=grammar
+            )
+            raw_response = response['choices'][0]['text']
+        except Exception as e:
+            logger.error(f"Llama combined analysis failed: {str(e)}")
+
+        fields = self._parse_analysis_json(raw_response)
+        value = lambda key: fields.get(key) if isinstance(fields.get(key), str) else None
+        fallback_fields = []
+
+        title = self._clean_llama_title(value('title')) if value('title') else None
+        if not title:
+            fallback_fields.append('title')
+            title = self._generate_enhanced_title(text)
+
+        description = self._clean_llama_description(value('description')) if value('description') else None
+        if not description:
+            fallback_fields.append('description')
+            description = self._generate_rule_based_description(text)
+
+        remarks = (value('remarks') or '').strip()
+        if len(remarks) <= 20:
+            fallback_fields.append('remarks')
+            remarks = self._generate_rule_based_remarks(text)
+
+        folder = self._match_folder_name(value('folder'), folder_names, text) if folder_names else None
+        if folder_names and value('folder') not in folder_names:
+            fallback_fields.append('folder')
+
+        logger.info(f"Llama combined analysis took {time.perf_counter() - started:.2f}s "
+                    f"(fallback fields: {fallback_fields or 'none'})")
+        return {
+            'title': title,
+            'description': description,
+            'remarks': remarks,
+            'folder': folder,
+            'fallback_fields': fallback_fields
+        }
+
     def _extract_title(self, text):
         """Extract document title with automatic Groq/Llama fallback"""
         try:
@@ -208,19 +817,19 @@ class AIBridgeService:
                 return "Legal Document"
 
             # Try Groq first (if configured as primary and has API key)
+            llama_tried = False
             if AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY:
-                try:
-                    logger.info("Attempting Groq API for title generation...")
-                    title = self._generate_groq_title(text)
-                    if title and len(title.strip()) > 5:
-                        logger.info(f"Groq generated title: {title}")
-                        return title
-                except Exception as e:
-                    logger.warning(f"Groq title generation failed: {str(e)}")
-                    logger.info("Falling back to local Llama...")
+                title, llama_tried = self._generate_with_groq(
+                    'title', self._generate_groq_title, self._generate_llama_title, text,
+                    lambda title: title and title != "Legal Document" and len(title.strip()) > 5
+                )
+                if title:
+                    logger.info(f"Generated title: {title}")
+                    return title
+                logger.info("Falling back to local Llama...")
 
             # Try local Llama (either as primary or fallback from Groq)
-            if is_llama_loaded():
+            if is_llama_loaded() and not llama_tried:
                 logger.info("Attempting local Llama title generation...")
                 title = self._generate_llama_title(text)
                 if title and title != "Legal Document" and len(title.strip()) > 5:
@@ -254,40 +863,15 @@ class AIBridgeService:
     def _generate_groq_title(self, text):
         """Generate title using Groq API"""
         try:
-            if not GROQ_API_KEY:
-                raise Exception("Groq API key not configured")
-
-            text_sample = text[:2000] if len(text) > 2000 else text
-
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    'Authorization': f'Bearer {GROQ_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': GROQ_MODEL,
-                    'messages': [
-                        {
-                            'role': 'system',
-                            'content': 'You are an expert legal document analyst. Create highly specific, unique document titles that distinguish this document from others of the same type.'
-                        },
-                        {
-                            'role': 'user',
-                            'content': f'Read this legal document and create a unique, specific title (5-10 words). You MUST use this format: "[Document Type] - [Specific Person/Org Name] - [Date or Reference ID]".\n\nSTRICT RULES:\n1. NEVER use generic titles like "Affidavit" or "Contract".\n2. YOU MUST include the specific name of the person or organization involved.\n3. YOU MUST include a date (YYYY-MM-DD) or a case/reference number if found.\n\nExamples of BAD titles: "Affidavit of Loss", "Board Resolution", "Service Contract"\nExamples of GOOD titles: "Affidavit of Loss - Juan Dela Cruz - 2024-05-12", "Board Resolution No. 45-2023 - Approving Budget", "Service Contract - CMU and Security Agency - 2024"\n\nDocument:\n{text_sample}\n\nProvide only the specific title:'
-                        }
-                    ],
-                    'temperature': 0.3,
-                    'max_tokens': 60
-                },
-                timeout=30
-            )
+            text_sample = excerpt_selector.excerpt(text)
 
-            if response.status_code != 200:
-                raise Exception(f"Groq API error: {response.status_code} - {response.text}")
-
-            data = response.json()
-            title = data['choices'][0]['message']['content'].strip()
+            content = groq_client.chat(
+                GROQ_MODEL,
+                groq_messages(GROQ_TITLE_PROMPT, text_sample),
+                temperature=0.3,
+                max_tokens=60
+            )
+            title = content.strip()
 
             # Clean up
             title = title.replace('"', '').replace("'", '').replace('Title:', '').strip()
@@ -312,67 +896,58 @@ class AIBridgeService:
     def _generate_llama_title(self, text):
         """Generate title using Llama model with embeddings content"""
         try:
-            llama_model = get_llama_model()
-            if not llama_model:
+            if get_llama_pool() is None:
                 raise Exception("Llama model not available")
 
-            # Use first 1500 characters to avoid context issues
-            text_sample = text[:1500] if len(text) > 1500 else text
-
-            # Simpler, more direct prompt
-            prompt = f"""<|start_header_id|>system<|end_header_id|>
-
-You extract document titles. Reply with ONLY the title, nothing else.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-What is the title of this document? Reply with ONLY the title in format: [DocType] - [Name] - [Date]
-
-{text_sample}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
-
-            # Use the lock for thread-safe model access
-            with get_llama_lock():
-                response = llama_model(
-                    prompt,
-                    max_tokens=40,
-                    temperature=0.1,
-                    top_p=0.9,
-                    repeat_penalty=1.2,
-                    stop=["<|eot_id|>", "\n", "<|start_header_id|>"]
-                )
-
-            title = response['choices'][0]['text'].strip()
+            # Simpler, more direct instruction
+            response = self._run_llama_task(
+                text,
+                LLAMA_TITLE_INSTRUCTION,
+                max_tokens=40,
+                temperature=0.1,
+                top_p=0.9,
+                repeat_penalty=1.2,
+                stop=["<|eot_id|>", "\n", "<|start_header_id|>"]
+            )
 
-            # Check for chatty responses - if it starts with common prefixes, fall back
-            chatty_starts = [
-                'here is', 'the title', 'this is', 'i have', 'based on',
-                'the document', 'extracted', 'output:', 'answer:'
-            ]
-            if any(title.lower().startswith(prefix) for prefix in chatty_starts):
-                logger.warning(f"Llama gave chatty response: '{title[:50]}', using rule-based")
-                return None
+            title = self._clean_llama_title(response['choices'][0]['text'])
+            if title:
+                logger.info(f"Generated Llama title: '{title}'")
+            return title
 
-            # Detect refusal
-            refusal_phrases = ['i cannot', 'i can\'t', 'i will not', 'cannot provide', 'unable to']
-            if any(phrase in title.lower() for phrase in refusal_phrases):
-                logger.warning(f"Llama refused: {title[:50]}")
-                return None
+        except Exception as e:
+            logger.error(f"Llama title generation failed: {str(e)}")
+            return None
 
-            # Clean up quotes
-            title = title.strip('"\'').strip()
-            title = ' '.join(title.split())
+    def _clean_llama_title(self, title):
+        """Clean a Llama title, or return None if it is chatty, a refusal or the wrong length"""
+        title = (title or '').strip()
+
+        # Check for chatty responses - if it starts with common prefixes, fall back
+        chatty_starts = [
+            'here is', 'the title', 'this is', 'i have', 'based on',
+            'the document', 'extracted', 'output:', 'answer:'
+        ]
+        if any(title.lower().startswith(prefix) for prefix in chatty_starts):
+            logger.warning(f"Llama gave chatty response: '{title[:50]}', using rule-based")
+            return None
 
-            # Validate
-            if len(title) < 5 or len(title) > MAX_TITLE_LENGTH:
-                logger.warning(f"Invalid title length: {len(title)}")
-                return None
+        # Detect refusal
+        refusal_phrases = ['i cannot', 'i can\'t', 'i will not', 'cannot provide', 'unable to']
+        if any(phrase in title.lower() for phrase in refusal_phrases):
+            logger.warning(f"Llama refused: {title[:50]}")
+            return None
 
-            logger.info(f"Generated Llama title: '{title}'")
-            return title
+        # Clean up quotes
+        title = title.strip('"\'').strip()
+        title = ' '.join(title.split())
 
-        except Exception as e:
-            logger.error(f"Llama title generation failed: {str(e)}")
+        # Validate
+        if len(title) < 5 or len(title) > MAX_TITLE_LENGTH:
+            logger.warning(f"Invalid title length: {len(title)}")
             return None
+
+        return title
     
     def _generate_enhanced_title(self, text):
         """Generate title using enhanced content analysis of embeddings"""
@@ -408,7 +983,7 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
                 title = "Legal Contract Agreement"
             else:
                 # Last resort - analyze key terms in text
-                text_lower = text.lower()
+                features = document_features.get(text)
                 
                 # Helper to extract name using regex
                 def extract_name(text_content):
@@ -425,25 +1000,25 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
                 extracted_name = extract_name(text)
                 name_suffix = f" - {extracted_name}" if extracted_name else ""
 
-                if 'affidavit' in text_lower:
+                if features.has('affidavit'):
                     # Try to extract specific affidavit type
-                    if 'no violation' in text_lower:
+                    if features.has('no violation'):
                         title = f"Affidavit of No Violation{name_suffix}"
-                    elif 'compliance' in text_lower:
+                    elif features.has('compliance'):
                         title = f"Affidavit of Compliance{name_suffix}"
-                    elif 'loss' in text_lower:
+                    elif features.has('loss'):
                         title = f"Affidavit of Loss{name_suffix}"
                     else:
                         title = f"Affidavit{name_suffix}"
-                elif 'criminal' in text_lower and 'case' in text_lower:
+                elif features.has('criminal') and features.has('case'):
                     title = "Criminal Case Reference Guide"
-                elif 'contract' in text_lower and 'agreement' in text_lower:
+                elif features.has('contract') and features.has('agreement'):
                     title = f"Contract Agreement{name_suffix}"
-                elif 'policy' in text_lower and 'procedure' in text_lower:
+                elif features.has('policy') and features.has('procedure'):
                     title = "Policy and Procedures Manual"
-                elif 'resolution' in text_lower and 'board' in text_lower:
+                elif features.has('resolution') and features.has('board'):
                     title = "Board Resolution"
-                elif 'memorandum' in text_lower or 'memo' in text_lower:
+                elif features.has('memorandum') or features.has('memo'):
                     title = f"Memorandum{name_suffix}"
                 else:
                     title = "Legal Reference Document"
@@ -462,7 +1037,7 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
     
     def _extract_traditional_title(self, text):
         """Extract title using traditional rule-based methods"""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        lines = document_features.get(text).lines
         
         for line in lines[:TITLE_SEARCH_LINES]:
             if 10 < len(line) < 100:
@@ -476,19 +1051,19 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
         """Generate intelligent description with automatic Groq/Llama fallback"""
         try:
             # Try Groq first (if configured as primary and has API key)
+            llama_tried = False
             if AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY:
-                try:
-                    logger.info("Attempting Groq API for description generation...")
-                    description = self._generate_groq_description(text)
-                    if description and len(description.strip()) > 20:
-                        logger.info("Groq generated description successfully")
-                        return description
-                except Exception as e:
-                    logger.warning(f"Groq description generation failed: {str(e)}")
-                    logger.info("Falling back to local Llama...")
+                description, llama_tried = self._generate_with_groq(
+                    'description', self._generate_groq_description, self._generate_llama_description, text,
+                    lambda description: description and len(description.strip()) > 20
+                )
+                if description:
+                    logger.info("Generated description successfully")
+                    return description
+                logger.info("Falling back to local Llama...")
 
             # Try local Llama (either as primary or fallback from Groq)
-            if is_llama_loaded():
+            if is_llama_loaded() and not llama_tried:
                 logger.info("Attempting local Llama description generation...")
                 description = self._generate_llama_description(text)
                 if description and len(description.strip()) > 20:
@@ -510,45 +1085,20 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
 
         except Exception as e:
             logger.error(f"Description generation failed: {str(e)}")
-            return f"Legal document containing {len(text.split())} words available for review and processing."
+            return f"Legal document containing {document_features.get(text).word_count} words available for review and processing."
     
     def _generate_groq_description(self, text):
         """Generate description using Groq API"""
         try:
-            if not GROQ_API_KEY:
-                raise Exception("Groq API key not configured")
-
-            text_sample = text[:1500] if len(text) > 1500 else text
-
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    'Authorization': f'Bearer {GROQ_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': GROQ_MODEL,
-                    'messages': [
-                        {
-                            'role': 'system',
-                            'content': 'You are an expert legal document analyst. Write detailed, specific document summaries that highlight unique information.'
-                        },
-                        {
-                            'role': 'user',
-                            'content': f'Read this legal document and write a specific 2-3 sentence summary (under 400 characters). You MUST mention:\n1. The SPECIFIC NAMES of people/parties involved (e.g., "Juan Dela Cruz", "TechCorp Inc.").\n2. The SPECIFIC purpose or amount (e.g., "Php 50,000 loan", "Lost Student ID").\n3. Any specific dates or unique conditions.\n\nExample of BAD summary: "This is an affidavit of loss filed by an individual regarding a lost item."\nExample of GOOD summary: "Affidavit of Loss filed by Juan Dela Cruz regarding a lost BPI ATM Card. The incident occurred on May 12, 2024, in Valencia City."\n\nDocument:\n{text_sample}\n\nSummary:'
-                        }
-                    ],
-                    'temperature': 0.4,
-                    'max_tokens': 180
-                },
-                timeout=30
-            )
-
-            if response.status_code != 200:
-                raise Exception(f"Groq API error: {response.status_code} - {response.text}")
+            text_sample = excerpt_selector.excerpt(text)
 
-            data = response.json()
-            description = data['choices'][0]['message']['content'].strip().replace('\n', ' ')
+            content = groq_client.chat(
+                GROQ_MODEL,
+                groq_messages(GROQ_DESCRIPTION_PROMPT, text_sample),
+                temperature=0.4,
+                max_tokens=180
+            )
+            description = content.strip().replace('\n', ' ')
 
             if len(description) > MAX_DESCRIPTION_LENGTH:
                 cutoff = description[:MAX_DESCRIPTION_LENGTH].rfind(' ')
@@ -563,77 +1113,70 @@ What is the title of this document? Reply with ONLY the title in format: [DocTyp
     def _generate_llama_description(self, text):
         """Generate description using Llama model"""
         try:
-            llama_model = get_llama_model()
-            if not llama_model:
+            if get_llama_pool() is None:
                 raise Exception("Llama model not available")
 
-            text_sample = text[:1500] if len(text) > 1500 else text
-
-            # Pure extraction prompt - no creation, just extraction
-            prompt = f"""<|start_header_id|>system<|end_header_id|>
-
-Extract and list facts from text.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-List the key facts from this text (names, dates, amounts, purpose) in 2-3 sentences:
-
-Text: {text_sample}
-
-Facts:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
-
-            # Use the lock for thread-safe model access
-            with get_llama_lock():
-                response = llama_model(
-                    prompt,
-                    max_tokens=180,
-                    temperature=0.4,
-                    top_p=0.9,
-                    repeat_penalty=1.1,
-                    stop=["<|eot_id|>", "<|start_header_id|>"]
-                )
-            description = response['choices'][0]['text'].strip().replace('\n', ' ')
-
-            # Clean up common AI response prefixes
-            unwanted_prefixes = [
-                'here is a 2-3 sentence summary of the document:',
-                'here is a 2-3 sentence summary:',
-                'here is a summary:',
-                'here is the summary:',
-                'summary:',
-                'this document is',
-                'the document is',
-                'facts:',
-                'here are the facts:',
-                'here are the key facts:'
-            ]
-            description_lower = description.lower()
-            for prefix in unwanted_prefixes:
-                if description_lower.startswith(prefix):
-                    description = description[len(prefix):].strip()
-                    if description:
-                        description = description[0].upper() + description[1:]
-                    break
-
-            # Detect if Llama refused to process (safety rejection)
-            refusal_phrases = ['i cannot', 'i can\'t', 'i will not', 'i won\'t', 'cannot provide',
-                             'unable to', 'not appropriate', 'cannot assist', 'i apologize']
-            if any(phrase in description.lower() for phrase in refusal_phrases):
-                logger.warning(f"Llama refused to generate description (safety): {description[:100]}")
-                raise Exception("Llama safety refusal - falling back to rule-based")
-
-            if len(description) > MAX_DESCRIPTION_LENGTH:
-                cutoff = description[:MAX_DESCRIPTION_LENGTH].rfind(' ')
-                description = description[:cutoff] + "..."
-
-            if len(description.strip()) < 20:
-                raise Exception("Generated description too short")
+            # Pure extraction instruction - no creation, just extraction
+            response = self._run_llama_task(
+                text,
+                LLAMA_DESCRIPTION_INSTRUCTION,
+                max_tokens=180,
+                temperature=0.4,
+                top_p=0.9,
+                repeat_penalty=1.1,
+                stop=["<|eot_id|>", "<|start_header_id|>"]
+            )
+            description = self._clean_llama_description(response['choices'][0]['text'])
+            if description is None:
+                raise Exception("Llama description rejected - falling back to rule-based")
             
             return description
             
         except Exception as e:
             logger.error(f"Llama description generation failed: {str(e)}")
             return self._generate_rule_based_description(text)
+
+    def _clean_llama_description(self, description):
+        """Clean a Llama description, or return None if it is a refusal or too short"""
+        description = (description or '').strip().replace('\n', ' ')
+
+        # Clean up common AI response prefixes
+        unwanted_prefixes = [
+            'here is a 2-3 sentence summary of the document:',
+            'here is a 2-3 sentence summary:',
+            'here is a summary:',
+            'here is the summary:',
+            'summary:',
+            'this document is',
+            'the document is',
+            'facts:',
+            'here are the facts:',
+            'here are the key facts:'
+        ]
+        description_lower = description.lower()
+        for prefix in unwanted_prefixes:
+            if description_lower.startswith(prefix):
+                description = description[len(prefix):].strip()
+                if description:
+                    description = description[0].upper() + description[1:]
+                break
+
+        # Detect if Llama refused to process (safety rejection)
+        refusal_phrases = ['i cannot', 'i can\'t', 'i will not', 'i won\'t', 'cannot provide',
+                         'unable to', 'not appropriate', 'cannot assist', 'i apologize']
+        if any(phrase in description.lower() for phrase in refusal_phrases):
+            logger.warning(f"Llama refused to generate description (safety): {description[:100]}")
+            return None
+
+        if len(description) > MAX_DESCRIPTION_LENGTH:
+            cutoff = description[:MAX_DESCRIPTION_LENGTH].rfind(' ')
+            description = description[:cutoff] + "..."
+
+        if len(description.strip()) < 20:
+            logger.warning("Generated description too short")
+            return None
+
+        return description
     
     def _suggest_folder_with_llama(self, text, folder_names):
         """Use Llama to suggest folder from available folders (same as Groq)"""
@@ -642,91 +1185,80 @@ Facts:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
                 logger.warning("No folders available for suggestion")
                 return None
 
-            llama_model = get_llama_model()
-            if not llama_model:
+            if get_llama_pool() is None:
                 logger.warning("Llama not available, using keyword matching")
                 # Fallback to keyword matching
+                features = document_features.get(text)
                 for folder_name in folder_names:
-                    if folder_name.lower() in text.lower():
+                    if features.has(folder_name):
                         return folder_name
                 return None
 
-            text_sample = text[:1500] if len(text) > 1500 else text
             folders_list = ', '.join(folder_names)
 
-            prompt = f"""<|start_header_id|>system<|end_header_id|>
-
-You are a filing assistant. Choose a folder for this document.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-Pick ONE folder from: {folders_list}
-
-Document:
-{text_sample}
-
-Answer ONLY with the folder name. Folder:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
-
-            # Use the lock for thread-safe model access
-            with get_llama_lock():
-                response = llama_model(
-                    prompt,
-                    max_tokens=50,
-                    temperature=0.1, # Lower temperature for more deterministic output
-                    top_p=0.9,
-                    stop=["<|eot_id|>", "\n", "<|start_header_id|>"]
-                )
+            response = self._run_llama_task(
+                text,
+                LLAMA_FOLDER_INSTRUCTION.format(folders_list=folders_list),
+                max_tokens=50,
+                temperature=0.1, # Lower temperature for more deterministic output
+                top_p=0.9,
+                stop=["<|eot_id|>", "\n", "<|start_header_id|>"]
+            )
 
             raw_response = response['choices'][0]['text'].strip()
             logger.info(f"Llama raw folder response: '{raw_response}'")
-
-            # Clean up response
-            suggested_folder = raw_response.replace('"', '').replace("'", '').strip()
-
-            # 1. Exact match check
-            if suggested_folder in folder_names:
-                logger.info(f"Llama suggested folder (Exact): {suggested_folder}")
-                return suggested_folder
-            
-            # 2. Case-insensitive match
-            for folder_name in folder_names:
-                if folder_name.lower() == suggested_folder.lower():
-                     logger.info(f"Llama suggested folder (Case-insensitive): {folder_name}")
-                     return folder_name
-
-            # 3. Contains match (The Fix for "I will choose...")
-            # Check if any folder name is contained WITHIN the response
-            best_match = None
-            longest_match_len = 0
-            
-            response_lower = suggested_folder.lower()
-            for folder_name in folder_names:
-                if folder_name.lower() in response_lower:
-                    if len(folder_name) > longest_match_len:
-                        best_match = folder_name
-                        longest_match_len = len(folder_name)
-            
-            if best_match:
-                logger.info(f"Llama suggested folder (Contains Match): {best_match} from '{suggested_folder}'")
-                return best_match
-
-            # 4. Keyword fallback (if Llama failed completely)
-            logger.warning(f"Llama suggested invalid folder: {suggested_folder}. Trying generic keyword matching.")
-            for folder_name in folder_names:
-                if folder_name.lower() in text.lower():
-                    return folder_name
-                    
-            return None
+            return self._match_folder_name(raw_response, folder_names, text)
 
         except Exception as e:
             logger.error(f"Llama folder suggestion failed: {str(e)}")
             return None
 
+    def _match_folder_name(self, raw_response, folder_names, text):
+        """Map a Llama folder answer onto one of `folder_names`, falling back to keyword matching"""
+        # Clean up response
+        suggested_folder = (raw_response or '').replace('"', '').replace("'", '').strip()
+
+        # 1. Exact match check
+        if suggested_folder in folder_names:
+            logger.info(f"Llama suggested folder (Exact): {suggested_folder}")
+            return suggested_folder
+        
+        # 2. Case-insensitive match
+        for folder_name in folder_names:
+            if folder_name.lower() == suggested_folder.lower():
+                 logger.info(f"Llama suggested folder (Case-insensitive): {folder_name}")
+                 return folder_name
+
+        # 3. Contains match (The Fix for "I will choose...")
+        # Check if any folder name is contained WITHIN the response
+        best_match = None
+        longest_match_len = 0
+        
+        response_lower = suggested_folder.lower()
+        for folder_name in folder_names:
+            if folder_name.lower() in response_lower:
+                if len(folder_name) > longest_match_len:
+                    best_match = folder_name
+                    longest_match_len = len(folder_name)
+        
+        if best_match:
+            logger.info(f"Llama suggested folder (Contains Match): {best_match} from '{suggested_folder}'")
+            return best_match
+
+        # 4. Keyword fallback (if Llama failed completely)
+        logger.warning(f"Llama suggested invalid folder: {suggested_folder}. Trying generic keyword matching.")
+        features = document_features.get(text)
+        for folder_name in folder_names:
+            if features.has(folder_name):
+                return folder_name
+                
+        return None
+
     def _generate_rule_based_description(self, text):
         """Generate description using content analysis"""
         try:
-            word_count = len(text.split())
-            text_lower = text.lower()
+            features = document_features.get(text)
+            word_count = features.word_count
 
             doc_type = self.analyzer.detect_document_type(text)
             subject_matter = self.analyzer.extract_subject_matter(text)
@@ -744,7 +1276,7 @@ Answer ONLY with the folder name. Folder:<|eot_id|><|start_header_id|>assistant<
             
             description += f". This document contains {word_count:,} words"
             
-            if 'attorney-client privilege' in text_lower or 'confidential' in text_lower:
+            if features.has('attorney-client privilege') or features.has('confidential'):
                 description += " with confidentiality requirements"
             
             description += "."
@@ -758,23 +1290,23 @@ Answer ONLY with the folder name. Folder:<|eot_id|><|start_header_id|>assistant<
             
         except Exception as e:
             logger.error(f"Rule-based description generation failed: {str(e)}")
-            return f"Legal document containing {len(text.split())} words available for review and processing."
+            return f"Legal document containing {document_features.get(text).word_count} words available for review and processing."
     
     def _generate_remarks(self, text):
         """Generate AI remarks about the document with automatic Groq/Llama fallback"""
         try:
             # Try Groq first (if configured as primary and has API key)
+            llama_tried = False
             if AI_SERVICE_TYPE == 'groq' and GROQ_API_KEY:
-                try:
-                    logger.info("Attempting Groq API for remarks generation...")
-                    remarks = self._generate_groq_remarks(text)
-                    if remarks and len(remarks.strip()) > 20:
-                        return remarks
-                except Exception as e:
-                    logger.warning(f"Groq remarks generation failed: {str(e)}")
+                remarks, llama_tried = self._generate_with_groq(
+                    'remarks', self._generate_groq_remarks, self._generate_llama_remarks, text,
+                    lambda remarks: remarks and len(remarks.strip()) > 20
+                )
+                if remarks:
+                    return remarks
 
             # Try local Llama 
-            if is_llama_loaded():
+            if is_llama_loaded() and not llama_tried:
                 logger.info("Attempting local Llama remarks generation...")
                 remarks = self._generate_llama_remarks(text)
                 if remarks and len(remarks.strip()) > 20:
@@ -790,40 +1322,15 @@ Answer ONLY with the folder name. Folder:<|eot_id|><|start_header_id|>assistant<
     def _generate_groq_remarks(self, text):
         """Generate remarks using Groq API"""
         try:
-            if not GROQ_API_KEY:
-                raise Exception("Groq API key not configured")
-
-            text_sample = text[:2000] if len(text) > 2000 else text
-
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    'Authorization': f'Bearer {GROQ_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': GROQ_MODEL,
-                    'messages': [
-                        {
-                            'role': 'system',
-                            'content': 'You are an expert legal document analyst. Extract key specific details such as penalties, dates, and obligations.'
-                        },
-                        {
-                            'role': 'user',
-                            'content': f'Analyze this legal document and provide a concise list of key REMARKS. Focus on:\n1. Specific penalties for non-compliance (if any).\n2. Critical deadlines or dates.\n3. Key obligations or requirements.\n4. Names of main parties.\n\nKeep it under 300 characters. Format as a running paragraph or comma-separated points.\n\nDocument:\n{text_sample}\n\nRemarks:'
-                        }
-                    ],
-                    'temperature': 0.3,
-                    'max_tokens': 150
-                },
-                timeout=30
-            )
+            text_sample = excerpt_selector.excerpt(text)
 
-            if response.status_code != 200:
-                raise Exception(f"Groq API error: {response.status_code}")
-
-            data = response.json()
-            return data['choices'][0]['message']['content'].strip()
+            content = groq_client.chat(
+                GROQ_MODEL,
+                groq_messages(GROQ_REMARKS_PROMPT, text_sample),
+                temperature=0.3,
+                max_tokens=150
+            )
+            return content.strip()
         except Exception as e:
             logger.error(f"Groq remarks generation failed: {str(e)}")
             raise
@@ -831,34 +1338,18 @@ Answer ONLY with the folder name. Folder:<|eot_id|><|start_header_id|>assistant<
     def _generate_llama_remarks(self, text):
         """Generate remarks using Llama model"""
         try:
-            llama_model = get_llama_model()
-            if not llama_model:
+            if get_llama_pool() is None:
                 raise Exception("Llama model not available")
 
-            text_sample = text[:2000] if len(text) > 2000 else text
-
-            # Pure extraction prompt
-            prompt = f"""<|start_header_id|>system<|end_header_id|>
-
-Extract key details from text.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-Extract from this text: important dates, deadlines, names, amounts (under 300 chars):
-
-Text: {text_sample}
-
-Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
-
-            # Use the lock for thread-safe model access
-            with get_llama_lock():
-                response = llama_model(
-                    prompt,
-                    max_tokens=150,
-                    temperature=0.3,
-                    top_p=0.9,
-                    stop=["<|eot_id|>", "<|start_header_id|>"]
-                )
+            # Pure extraction instruction
+            response = self._run_llama_task(
+                text,
+                LLAMA_REMARKS_INSTRUCTION,
+                max_tokens=150,
+                temperature=0.3,
+                top_p=0.9,
+                stop=["<|eot_id|>", "<|start_header_id|>"]
+            )
 
             remarks = response['choices'][0]['text'].strip()
             
@@ -870,7 +1361,7 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
     def _generate_rule_based_remarks(self, text):
         """Generate basic rule-based remarks (fallback)"""
         try:
-            word_count = len(text.split())
+            word_count = document_features.get(text).word_count
             doc_type = self.analyzer.detect_document_type(text)
             
             remarks = f"AI Analysis: Document classified as {doc_type.replace('_', ' ')}. "
@@ -885,23 +1376,35 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
         except Exception as e:
             return f"AI analysis completed with basic metrics. Error: {str(e)}"
     
-    def suggest_category_and_folder(self, text, categories, folders):
-        """Suggest category and folder based on document content using AI (Llama)"""
+    def suggest_category_and_folder(self, text, categories, folders, llama_folder_name=None, folder_classification=None):
+        """Suggest category and folder based on document content using AI (Llama)
+
+        `llama_folder_name` is a folder already chosen by a combined analysis generation.
+        `folder_classification` is the embedding classifier's result; when it is confident the
+        LLM is not asked. Otherwise the LLM's choice is used, then keyword matching.
+        `folder_confidence` is in [0, 1] and `folder_source` tells which of the three decided.
+        """
         try:
-            text_lower = text.lower()
+            features = document_features.get(text)
 
             logger.info(f"Folder suggestion - Received {len(folders)} folders: {[f.get('folder_name') for f in folders if isinstance(f, dict)]}")
 
-            # Use Llama to intelligently suggest folder (same as Groq)
+            # Use Llama to intelligently suggest folder (same as Groq), unless the embeddings already decided
             folder_names = [f.get('folder_name') for f in folders if isinstance(f, dict) and 'folder_name' in f]
-            suggested_folder_name = self._suggest_folder_with_llama(text, folder_names)
+            classified_folder = self._classified_folder(folder_classification, folders)
+            if classified_folder is not None:
+                suggested_folder_name = None
+            elif llama_folder_name is not None:
+                suggested_folder_name = llama_folder_name
+            else:
+                suggested_folder_name = self._suggest_folder_with_llama(text, folder_names)
 
             # Find the folder object
-            suggested_folder = None
+            llm_folder = None
             if suggested_folder_name:
                 for folder in folders:
                     if isinstance(folder, dict) and folder.get('folder_name') == suggested_folder_name:
-                        suggested_folder = folder
+                        llm_folder = folder
                         break
 
             logger.info(f"AI suggested folder: {suggested_folder_name}")
@@ -917,19 +1420,13 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
                 score = 0
                 category_name_lower = category['category_name'].lower()
 
-                if category_name_lower in text_lower:
+                if features.has(category_name_lower):
                     score += 10
 
                 # Legal keywords matching
-                legal_keywords = {
-                    'contract': ['agreement', 'contract', 'terms'],
-                    'litigation': ['court', 'case', 'plaintiff', 'defendant'],
-                    'criminal': ['criminal', 'defense', 'case']
-                }
-
-                for legal_type, keywords in legal_keywords.items():
+                for legal_type, keywords in ContentAnalyzer.LEGAL_KEYWORDS.items():
                     if legal_type in category_name_lower:
-                        score += sum(2 for keyword in keywords if keyword in text_lower)
+                        score += sum(2 for keyword in keywords if features.has(keyword))
 
                 if score > 0:
                     category_scores[category['category_id']] = {'category': category, 'score': score}
@@ -952,7 +1449,7 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
 
                 logger.info(f"Checking folder '{folder['folder_name']}' against text...")
 
-                if folder_name_lower in text_lower:
+                if features.has(folder_name_lower):
                     score += 5
                     logger.info(f"  - Found '{folder_name_lower}' in text! Score: {score}")
 
@@ -965,18 +1462,33 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
 
             logger.info(f"Folder scores: {[(f['folder']['folder_name'], f['score']) for f in folder_scores.values()]}")
 
-            if folder_scores:
+            folder_confidence, folder_source = 0, None
+            if classified_folder is not None:
+                suggested_folder = classified_folder
+                folder_confidence, folder_source = folder_classification['confidence'], 'embedding'
+            elif llm_folder is not None:
+                suggested_folder = llm_folder
+                probabilities = (folder_classification or {}).get('probabilities', {})
+                folder_confidence = probabilities.get(llm_folder.get('folder_id'), FOLDER_LLM_CONFIDENCE)
+                folder_source = 'llm'
+            elif folder_scores:
                 best_folder = max(folder_scores.values(), key=lambda x: x['score'])
                 suggested_folder = best_folder['folder']
-                logger.info(f"Best folder selected: {suggested_folder['folder_name']} with score {best_folder['score']}")
+                # Name found in the text (5) plus category match (8) is the strongest keyword evidence
+                folder_confidence, folder_source = min(best_folder['score'] / 13, 1.0), 'keywords'
             else:
                 logger.warning("No folder matches found!")
 
+            if suggested_folder:
+                logger.info(f"Best folder selected: {suggested_folder['folder_name']} by {folder_source} "
+                            f"with confidence {folder_confidence:.2f}")
+
             return {
                 'suggested_category': suggested_category,
                 'suggested_folder': suggested_folder,
                 'category_confidence': category_scores.get(suggested_category['category_id'], {}).get('score', 0) if suggested_category else 0,
-                'folder_confidence': folder_scores.get(suggested_folder['folder_id'], {}).get('score', 0) if suggested_folder else 0
+                'folder_confidence': folder_confidence,
+                'folder_source': folder_source
             }
 
         except Exception as e:
@@ -987,5 +1499,6 @@ Details:<|eot_id|><|start_header_id|>assistant<|end_header_id|>
                 'suggested_category': categories[0] if categories and len(categories) > 0 else None,
                 'suggested_folder': folders[0] if folders and len(folders) > 0 else None,
                 'category_confidence': 0,
-                'folder_confidence': 0
+                'folder_confidence': 0,
+                'folder_source': None
             }
\ No newline at end of file
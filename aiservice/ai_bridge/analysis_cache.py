@@ -0,0 +1,179 @@
+"""
+Persistent cache of document analysis results for AI Bridge
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from config import (
+    ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_PROMPT_VERSION, ANALYSIS_MODE,
+    ANALYSIS_COMBINED_MAX_TOKENS, EXCERPT_SELECTION_ENABLED, EXCERPT_TOKEN_BUDGET, EXCERPT_CHARS_PER_TOKEN,
+    EXCERPT_PASSAGE_CHARS, MAX_TITLE_LENGTH, MAX_DESCRIPTION_LENGTH
+)
+from analysis_prompts import PROMPT_TEMPLATES
+from excerpt_selector import ExcerptSelector
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def _sha1(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+def text_hash(text):
+    """Hash of the document text, insensitive to whitespace and line-break differences between extractions"""
+    return _sha1(_WHITESPACE_PATTERN.sub(' ', text or '').strip())
+
+def folder_hash(folders, categories=None):
+    """Hash of the folder (and category) choices offered to the model, independent of their order"""
+    def canonical(items):
+        return sorted(json.dumps(item, sort_keys=True, default=str) for item in (items or []))
+    return _sha1(json.dumps([canonical(folders), canonical(categories)]))
+
+def prompt_fingerprint():
+    """ANALYSIS_PROMPT_VERSION plus a digest of the prompt templates and the settings shaping the output
+
+    Editing a template in analysis_prompts.py yields a new fingerprint, so old results stop
+    matching without anyone remembering to bump the version.
+    """
+    digest = hashlib.sha1()
+    for template in PROMPT_TEMPLATES:
+        digest.update(template.encode('utf-8'))
+        digest.update(b'\x00')
+    digest.update(json.dumps([
+        ANALYSIS_MODE, ANALYSIS_COMBINED_MAX_TOKENS, MAX_TITLE_LENGTH, MAX_DESCRIPTION_LENGTH,
+        # The excerpt is what the model reads, so a different selection means a different answer
+        EXCERPT_SELECTION_ENABLED, EXCERPT_TOKEN_BUDGET, EXCERPT_CHARS_PER_TOKEN, EXCERPT_PASSAGE_CHARS,
+        ExcerptSelector.VERSION, ExcerptSelector.CENTRALITY_WEIGHT, ExcerptSelector.SPECIFICITY_WEIGHT,
+        ExcerptSelector.POSITION_WEIGHT, ExcerptSelector.BOILERPLATE_DAMPING, ExcerptSelector.GAP_MARKER
+    ]).encode('utf-8'))
+    return f"{ANALYSIS_PROMPT_VERSION}-{digest.hexdigest()[:12]}"
+
+class AnalysisCache:
+    """SQLite table of analysis results keyed by (text hash, folder hash, model id, prompt version)
+
+    Entries written under an older prompt version are purged when the cache opens. Past
+    `max_entries` the least recently used results are dropped.
+    """
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, prompt_version=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.prompt_version = prompt_version or prompt_fingerprint()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0, 'evictions': 0, 'invalidated': 0}
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        """Open the database on first use and drop results of older prompt versions (lock held)"""
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_results (
+                    text_hash TEXT NOT NULL,
+                    folder_hash TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (text_hash, folder_hash, model_id, prompt_version)
+                )
+            """)
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS analysis_results_last_used ON analysis_results (last_used_at)'
+            )
+            purged = self._connection.execute(
+                'DELETE FROM analysis_results WHERE prompt_version != ?', (self.prompt_version,)
+            ).rowcount
+            self._connection.commit()
+            if purged:
+                self.stats['invalidated'] += purged
+                logger.info(f"Dropped {purged} cached analyses from older prompt versions")
+        return self._connection
+
+    def get(self, text, folders, model_id, categories=None):
+        """Cached (content_analysis, suggestions) for this exact work, or None"""
+        key = (text_hash(text), folder_hash(folders, categories), model_id, self.prompt_version)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT result FROM analysis_results '
+                'WHERE text_hash = ? AND folder_hash = ? AND model_id = ? AND prompt_version = ?', key
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            connection.execute(
+                'UPDATE analysis_results SET last_used_at = ?, hits = hits + 1 '
+                'WHERE text_hash = ? AND folder_hash = ? AND model_id = ? AND prompt_version = ?',
+                (time.time(),) + key
+            )
+            connection.commit()
+            self.stats['hits'] += 1
+        result = json.loads(row[0])
+        return result['content_analysis'], result['suggestions']
+
+    def put(self, text, folders, model_id, content_analysis, suggestions, categories=None):
+        key = (text_hash(text), folder_hash(folders, categories), model_id, self.prompt_version)
+        result = json.dumps({'content_analysis': content_analysis, 'suggestions': suggestions}, default=str)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO analysis_results '
+                '(text_hash, folder_hash, model_id, prompt_version, result, created_at, last_used_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                key + (result, now, now)
+            )
+            self.stats['stores'] += 1
+            overflow = connection.execute('SELECT COUNT(*) FROM analysis_results').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                connection.execute(
+                    'DELETE FROM analysis_results WHERE rowid IN '
+                    '(SELECT rowid FROM analysis_results ORDER BY last_used_at LIMIT ?)', (overflow,)
+                )
+                self.stats['evictions'] += overflow
+            connection.commit()
+
+    def skip(self):
+        """Count a result that was not cached because it came from a fallback path"""
+        with self._lock:
+            self.stats['skipped'] += 1
+
+    def clear(self, model_id=None):
+        """Drop every cached result, or only those of one model; returns the number removed"""
+        with self._lock:
+            connection = self._connect()
+            if model_id is None:
+                removed = connection.execute('DELETE FROM analysis_results').rowcount
+            else:
+                removed = connection.execute('DELETE FROM analysis_results WHERE model_id = ?', (model_id,)).rowcount
+            connection.commit()
+            self.stats['invalidated'] += removed
+            return removed
+
+    def status(self):
+        with self._lock:
+            connection = self._connect()
+            entries = connection.execute('SELECT COUNT(*) FROM analysis_results').fetchone()[0]
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=entries,
+                max_entries=self.max_entries,
+                hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+                prompt_version=self.prompt_version,
+                path=self.path
+            )
+
+# Global analysis cache instance
+analysis_cache = AnalysisCache()
@@ -0,0 +1,235 @@
+"""
+Asynchronous document analysis jobs for AI Bridge
+"""
+import time
+import uuid
+import queue
+import logging
+import threading
+import traceback
+from datetime import datetime
+from config import (
+    ANALYSIS_JOB_WORKERS, ANALYSIS_JOB_MAX_QUEUE, ANALYSIS_JOB_RETENTION_SECONDS, ANALYSIS_JOB_MAX_RETAINED
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job states; 'completed' and 'failed' are terminal
+JOB_STATES = ('queued', 'running', 'completed', 'failed')
+
+class AnalysisQueueFull(Exception):
+    """Raised when the analysis queue already holds ANALYSIS_JOB_MAX_QUEUE waiting jobs"""
+
+def _folder_name_of(suggested_folder):
+    if isinstance(suggested_folder, dict):
+        return suggested_folder.get('folder_name')
+    return suggested_folder
+
+def run_document_analysis(bridge_service, doc_id, extracted_text, folders, headers=None, progress=None):
+    """Title, description, remarks and folder suggestion for one document
+
+    Shared by the blocking /api/documents/analyze route and the analysis job workers.
+    `progress(stage, fraction)` is called as the analysis moves through its stages. Raises
+    ValueError when no usable document text is available.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    headers = headers or {}
+
+    # Only fetch document info from Laravel if the text wasn't provided
+    if not extracted_text:
+        progress('fetching_text', 0.1)
+        logger.info(f"Getting document text for document ID {doc_id}")
+        text_response = bridge_service.call_laravel_api(f'/documents/{doc_id}/text', headers=headers)
+        if text_response['success'] and text_response.get('data'):
+            response_data = text_response['data']
+            # Handle nested data structure
+            if isinstance(response_data, dict) and 'data' in response_data:
+                extracted_text = response_data['data'].get('text', '')
+            else:
+                extracted_text = response_data.get('text', '')
+
+    logger.info(f"Got document text: {len(extracted_text or '')} characters")
+    if not extracted_text or len(extracted_text.strip()) < 50:
+        logger.error(f"No text content available for doc_id {doc_id}.")
+        raise ValueError('Document text not available.')
+
+    # If folders weren't passed (old behavior), try to fetch them
+    if not folders:
+        progress('fetching_folders', 0.2)
+        logger.warning("Folders not provided in payload, attempting to fetch (risk of deadlock)")
+        folders_response = bridge_service.call_laravel_api('/ai/folders/public')
+        if folders_response.get('success') and folders_response.get('data'):
+            laravel_data = folders_response.get('data')
+            if isinstance(laravel_data, dict) and 'data' in laravel_data:
+                folders = laravel_data['data']
+            elif isinstance(laravel_data, list):
+                folders = laravel_data
+
+    progress('analyzing', 0.3)
+    logger.info(f"Analyzing with {len(folders or [])} folders")
+    # Categories are removed as per requirement, passing empty list
+    content_analysis, suggestions = bridge_service.analyze_document(extracted_text, [], folders or [], doc_id=doc_id)
+
+    return {
+        'title': content_analysis['suggested_title'],
+        'description': content_analysis['suggested_description'],
+        'remarks': content_analysis['ai_remarks'],
+        'suggested_folder': _folder_name_of(suggestions['suggested_folder']),
+        'folder_confidence': suggestions.get('folder_confidence', 0),
+        'category': None,
+        'document_type': None,
+    }
+
+class AnalysisJobQueue:
+    """Bounded queue of document analysis jobs processed by a small pool of worker threads
+
+    Submitting returns a job id straight away. A job moves queued -> running -> completed or
+    failed; its result is kept for polling for ANALYSIS_JOB_RETENTION_SECONDS after it
+    finishes. When a job carries a callback path, the result is also POSTed to Laravel.
+    """
+
+    def __init__(self, bridge_service, workers=ANALYSIS_JOB_WORKERS, max_queue=ANALYSIS_JOB_MAX_QUEUE,
+                 retention_seconds=ANALYSIS_JOB_RETENTION_SECONDS, max_retained=ANALYSIS_JOB_MAX_RETAINED):
+        self.bridge_service = bridge_service
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._pending = queue.Queue(maxsize=max_queue)
+        self._jobs = {}  # job_id -> job dict, in submission order
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'callbacks_failed': 0}
+        self._workers = [
+            threading.Thread(target=self._work, name=f"analysis-worker-{number}", daemon=True)
+            for number in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, doc_id, extracted_text, folders, headers=None, callback=None):
+        """Queue an analysis and return its job id; raises AnalysisQueueFull when the queue is full"""
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'doc_id': doc_id,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'submitted_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'callback': callback,
+            'callback_status': None,
+            '_text': extracted_text,
+            '_folders': folders,
+            '_headers': headers or {},
+            '_finished': None
+        }
+        with self._lock:
+            self._expire()
+            try:
+                self._pending.put_nowait(job['job_id'])
+            except queue.Full:
+                self.stats['rejected'] += 1
+                raise AnalysisQueueFull(f'Analysis queue is full ({self._pending.maxsize} jobs waiting)')
+            self._jobs[job['job_id']] = job
+            self.stats['submitted'] += 1
+        logger.info(f"Queued analysis job {job['job_id']} for doc_id {doc_id}")
+        return job['job_id']
+
+    def get(self, job_id):
+        """Public view of a job, or None once it is unknown or expired"""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def _public(self, job):
+        view = {name: value for name, value in job.items() if not name.startswith('_')}
+        view.pop('callback', None)
+        if job['status'] == 'queued':
+            pending = list(self._pending.queue)
+            view['queue_position'] = pending.index(job['job_id']) + 1 if job['job_id'] in pending else None
+        return view
+
+    def _expire(self):
+        """Drop finished jobs past their retention, and the oldest finished ones past the cap (lock held)"""
+        now = time.monotonic()
+        finished = [job_id for job_id, job in self._jobs.items() if job['_finished'] is not None]
+        for job_id in finished:
+            if now - self._jobs[job_id]['_finished'] > self.retention_seconds:
+                del self._jobs[job_id]
+        finished = [job_id for job_id in finished if job_id in self._jobs]
+        for job_id in finished[:max(len(finished) - self.max_retained, 0)]:
+            del self._jobs[job_id]
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _work(self):
+        while True:
+            job_id = self._pending.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                self._run(job)
+            self._pending.task_done()
+
+    def _run(self, job):
+        self._update(job, status='running', stage='starting', progress=0.05, started_at=datetime.now().isoformat())
+        try:
+            result = run_document_analysis(
+                self.bridge_service, job['doc_id'], job['_text'], job['_folders'], job['_headers'],
+                progress=lambda stage, fraction: self._update(job, stage=stage, progress=fraction)
+            )
+            self._update(job, status='completed', stage='completed', progress=1.0, result=result)
+            with self._lock:
+                self.stats['completed'] += 1
+            logger.info(f"Analysis job {job['job_id']} for doc_id {job['doc_id']} completed")
+        except Exception as e:
+            self._update(job, status='failed', stage='failed', error=str(e))
+            with self._lock:
+                self.stats['failed'] += 1
+            logger.error(f"Analysis job {job['job_id']} for doc_id {job['doc_id']} failed: {str(e)}")
+            if not isinstance(e, ValueError):
+                logger.error(traceback.format_exc())
+        finally:
+            # The document text is only needed while the job runs, the auth header until its callback
+            self._update(job, finished_at=datetime.now().isoformat(), _text=None, _folders=None, _finished=time.monotonic(),
+                         _headers=job['_headers'] if job['callback'] else None)
+
+        if job['callback']:
+            self._deliver(job)
+
+    def _deliver(self, job):
+        """POST the finished job to its Laravel callback path"""
+        payload = {
+            'job_id': job['job_id'],
+            'docId': job['doc_id'],
+            'status': job['status'],
+            'result': job['result'],
+            'error': job['error']
+        }
+        response = self.bridge_service.call_laravel_api(job['callback'], method='POST', data=payload, headers=job['_headers'])
+        self._update(job, callback_status=response.get('status_code'), _headers=None)
+        if not response.get('success'):
+            with self._lock:
+                self.stats['callbacks_failed'] += 1
+            logger.warning(f"Analysis callback for job {job['job_id']} failed: "
+                           f"{response.get('error') or response.get('status_code')}")
+
+    def status(self):
+        with self._lock:
+            self._expire()
+            states = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                states[job['status']] += 1
+            return dict(
+                self.stats,
+                workers=len(self._workers),
+                queue_depth=self._pending.qsize(),
+                max_queue=self._pending.maxsize,
+                retained_jobs=len(self._jobs),
+                states=states
+            )
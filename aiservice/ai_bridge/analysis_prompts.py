@@ -0,0 +1,61 @@
+"""
+Prompt templates for AI Bridge document analysis
+
+The analysis cache fingerprints every template here, so editing a prompt retires the results
+cached under the old wording.
+"""
+
+# Llama: a shared document prefix, then one task instruction per generation
+LLAMA_DOCUMENT_PREFIX = """<|start_header_id|>system<|end_header_id|>
+
+You are a legal document assistant. Extract information from the document and follow the instruction after it exactly.<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+Document:
+{excerpt}
+
+"""
+LLAMA_TASK_SUFFIX = "<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
+
+LLAMA_COMBINED_INSTRUCTION = """Reply with ONLY a JSON object with these keys:
+"title": the title in format [DocType] - [Name] - [Date]
+"description": the key facts (names, dates, amounts, purpose) in 2-3 sentences
+"remarks": important dates, deadlines, names, amounts (under 300 chars)
+"folder": ONE folder from: {folders_list}"""
+LLAMA_TITLE_INSTRUCTION = (
+    "What is the title of this document? Reply with ONLY the title, nothing else, in format: "
+    "[DocType] - [Name] - [Date]"
+)
+LLAMA_DESCRIPTION_INSTRUCTION = "List the key facts from this text (names, dates, amounts, purpose) in 2-3 sentences."
+LLAMA_REMARKS_INSTRUCTION = "Extract from this text: important dates, deadlines, names, amounts (under 300 chars)."
+LLAMA_FOLDER_INSTRUCTION = (
+    "Choose a folder for this document. Pick ONE folder from: {folders_list}\n\n"
+    "Answer ONLY with the folder name."
+)
+
+# Groq: (system message, user message) per field
+GROQ_TITLE_PROMPT = (
+    'You are an expert legal document analyst. Create highly specific, unique document titles that distinguish this document from others of the same type.',
+    'Read this legal document and create a unique, specific title (5-10 words). You MUST use this format: "[Document Type] - [Specific Person/Org Name] - [Date or Reference ID]".\n\nSTRICT RULES:\n1. NEVER use generic titles like "Affidavit" or "Contract".\n2. YOU MUST include the specific name of the person or organization involved.\n3. YOU MUST include a date (YYYY-MM-DD) or a case/reference number if found.\n\nExamples of BAD titles: "Affidavit of Loss", "Board Resolution", "Service Contract"\nExamples of GOOD titles: "Affidavit of Loss - Juan Dela Cruz - 2024-05-12", "Board Resolution No. 45-2023 - Approving Budget", "Service Contract - CMU and Security Agency - 2024"\n\nDocument:\n{text_sample}\n\nProvide only the specific title:'
+)
+GROQ_DESCRIPTION_PROMPT = (
+    'You are an expert legal document analyst. Write detailed, specific document summaries that highlight unique information.',
+    'Read this legal document and write a specific 2-3 sentence summary (under 400 characters). You MUST mention:\n1. The SPECIFIC NAMES of people/parties involved (e.g., "Juan Dela Cruz", "TechCorp Inc.").\n2. The SPECIFIC purpose or amount (e.g., "Php 50,000 loan", "Lost Student ID").\n3. Any specific dates or unique conditions.\n\nExample of BAD summary: "This is an affidavit of loss filed by an individual regarding a lost item."\nExample of GOOD summary: "Affidavit of Loss filed by Juan Dela Cruz regarding a lost BPI ATM Card. The incident occurred on May 12, 2024, in Valencia City."\n\nDocument:\n{text_sample}\n\nSummary:'
+)
+GROQ_REMARKS_PROMPT = (
+    'You are an expert legal document analyst. Extract key specific details such as penalties, dates, and obligations.',
+    'Analyze this legal document and provide a concise list of key REMARKS. Focus on:\n1. Specific penalties for non-compliance (if any).\n2. Critical deadlines or dates.\n3. Key obligations or requirements.\n4. Names of main parties.\n\nKeep it under 300 characters. Format as a running paragraph or comma-separated points.\n\nDocument:\n{text_sample}\n\nRemarks:'
+)
+
+def groq_messages(prompt, text_sample):
+    """Chat messages for a (system, user) Groq prompt around a document excerpt"""
+    system, user = prompt
+    return [
+        {'role': 'system', 'content': system},
+        {'role': 'user', 'content': user.format(text_sample=text_sample)}
+    ]
+
+# Every template, in a fixed order, for the analysis cache fingerprint
+PROMPT_TEMPLATES = (
+    LLAMA_DOCUMENT_PREFIX, LLAMA_TASK_SUFFIX, LLAMA_COMBINED_INSTRUCTION, LLAMA_TITLE_INSTRUCTION,
+    LLAMA_DESCRIPTION_INSTRUCTION, LLAMA_REMARKS_INSTRUCTION, LLAMA_FOLDER_INSTRUCTION
+) + GROQ_TITLE_PROMPT + GROQ_DESCRIPTION_PROMPT + GROQ_REMARKS_PROMPT
@@ -0,0 +1,61 @@
+"""
+Single-flight background refresh of state derived from the embedding sync
+"""
+import time
+import logging
+import threading
+import traceback
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class BackgroundRefresh:
+    """Runs `refresh_fn` on a daemon thread, one run at a time
+
+    trigger() returns at once. A trigger that arrives while a run is in progress is folded
+    into one follow-up run with the latest arguments, so changes made during a run are not
+    missed and a burst of triggers costs at most two runs.
+    """
+
+    def __init__(self, name, refresh_fn):
+        self.name = name
+        self.refresh_fn = refresh_fn
+        self._lock = threading.Lock()
+        self._running = False  # Set under the lock, so a trigger never lands between a run and its exit
+        self._pending = None  # (args, kwargs) of a trigger that arrived during a run
+        self.stats = {'runs': 0, 'failed_runs': 0, 'last_run_seconds': None, 'last_error': None}
+
+    def is_running(self):
+        return self._running
+
+    def trigger(self, *args, **kwargs):
+        """Start a run, or schedule one after the current run; returns True if a thread was started"""
+        with self._lock:
+            if self._running:
+                self._pending = (args, kwargs)
+                return False
+            self._running = True
+        threading.Thread(target=self._run, args=(args, kwargs), name=f"refresh-{self.name}", daemon=True).start()
+        return True
+
+    def _run(self, args, kwargs):
+        while True:
+            started = time.perf_counter()
+            try:
+                self.refresh_fn(*args, **kwargs)
+                self.stats['last_error'] = None
+            except Exception as e:
+                self.stats['failed_runs'] += 1
+                self.stats['last_error'] = str(e)
+                logger.error(f"Background refresh of {self.name} failed: {str(e)}")
+                logger.error(traceback.format_exc())
+            self.stats['runs'] += 1
+            self.stats['last_run_seconds'] = round(time.perf_counter() - started, 3)
+            with self._lock:
+                if self._pending is None:
+                    self._running = False
+                    return
+                (args, kwargs), self._pending = self._pending, None
+
+    def status(self):
+        return dict(self.stats, running=self.is_running())
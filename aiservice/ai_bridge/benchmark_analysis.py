@@ -0,0 +1,103 @@
+"""
+Latency benchmark of the separate and combined Llama document analysis paths
+
+Runs the four per-field Llama generations (title, description, remarks, folder) and the single
+combined JSON generation over the same documents and reports end-to-end seconds per document,
+how often the combined output fell back to a rule-based generator and how much prompt
+evaluation the shared document-prefix cache saved. Needs the local Llama model; nothing here
+talks to Laravel or Groq.
+"""
+import json
+import argparse
+import time
+import numpy as np
+from model_loader import load_llama_model
+from ai_service import AIBridgeService
+from benchmark_retrieval import _legal_text
+from llama_prefix_cache import llama_prefix_cache
+
+DEFAULT_FOLDERS = 'Contracts,Affidavits,Litigation,Property,Corporate,Notarial'
+
+def synthetic_documents(num_documents, chunks_per_doc=6, seed=0):
+    """Legal-like documents built from the retrieval benchmark's clause templates"""
+    titles, chunk_texts, _ = _legal_text(num_documents * chunks_per_doc, chunks_per_doc, np.random.default_rng(seed))
+    return [
+        titles[start] + '\n\n' + '\n'.join(chunk_texts[start:start + chunks_per_doc])
+        for start in range(0, len(chunk_texts), chunks_per_doc)
+    ]
+
+def run_separate(service, text, folder_names):
+    """The four Llama generations analyze_document runs in 'separate' mode"""
+    fields = {
+        'title': service._generate_llama_title(text),
+        'description': service._generate_llama_description(text),
+        'remarks': service._generate_llama_remarks(text),
+        'folder': service._suggest_folder_with_llama(text, folder_names)
+    }
+    return fields, [name for name, value in fields.items() if not value]
+
+def run_combined(service, text, folder_names):
+    analysis = service._generate_llama_analysis(text, folder_names)
+    return analysis, analysis['fallback_fields']
+
+def benchmark(service, documents, folder_names, repeats=1):
+    rows = []
+    for mode, run in (('separate', run_separate), ('combined', run_combined)):
+        timings, fallbacks = [], {}
+        llama_prefix_cache.clear()
+        saved_before = llama_prefix_cache.stats['saved_seconds']
+        for _ in range(repeats):
+            for text in documents:
+                started = time.perf_counter()
+                _, failed_fields = run(service, text, folder_names)
+                timings.append(time.perf_counter() - started)
+                for field in failed_fields:
+                    fallbacks[field] = fallbacks.get(field, 0) + 1
+        rows.append({
+            'mode': mode,
+            'documents': len(documents) * repeats,
+            'mean_seconds': round(float(np.mean(timings)), 3),
+            'p50_seconds': round(float(np.percentile(timings, 50)), 3),
+            'p95_seconds': round(float(np.percentile(timings, 95)), 3),
+            'fallbacks': fallbacks,
+            'prefix_saved_seconds_per_document': round(
+                (llama_prefix_cache.stats['saved_seconds'] - saved_before) / max(len(timings), 1), 3
+            )
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare separate and combined Llama document analysis latency')
+    parser.add_argument('--docs', nargs='*', default=[], help='text files to analyze instead of synthetic documents')
+    parser.add_argument('--synthetic', type=int, default=5, help='synthetic documents when no --docs are given')
+    parser.add_argument('--folders', default=DEFAULT_FOLDERS, help='comma separated folder names to choose from')
+    parser.add_argument('--repeats', type=int, default=1, help='passes over the documents per mode')
+    parser.add_argument('--json', default=None, help='also write the rows to this JSON file')
+    args = parser.parse_args()
+
+    if not load_llama_model():
+        raise SystemExit('Llama model could not be loaded')
+
+    documents = []
+    for path in args.docs:
+        with open(path, 'r', encoding='utf-8') as handle:
+            documents.append(handle.read())
+    documents = documents or synthetic_documents(args.synthetic)
+    folder_names = [name.strip() for name in args.folders.split(',') if name.strip()]
+
+    rows = benchmark(AIBridgeService(), documents, folder_names, repeats=args.repeats)
+
+    print(f"{'mode':>10} {'docs':>6} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'saved s':>8}  fallbacks")
+    for row in rows:
+        print(f"{row['mode']:>10} {row['documents']:>6} {row['mean_seconds']:>8.2f} {row['p50_seconds']:>8.2f}"
+              f" {row['p95_seconds']:>8.2f} {row['prefix_saved_seconds_per_document']:>8.2f}  {row['fallbacks'] or '-'}")
+    separate, combined = rows
+    if combined['mean_seconds']:
+        print(f"combined speedup: {separate['mean_seconds'] / combined['mean_seconds']:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(rows, handle, indent=2)
+
+if __name__ == '__main__':
+    main()
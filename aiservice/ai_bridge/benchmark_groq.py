@@ -0,0 +1,151 @@
+"""
+Groq client benchmark against a local mock Groq server
+
+Starts an OpenAI-compatible mock chat completion endpoint that adds latency and answers a
+share of requests with 429 or 503, then runs the title/description/remarks generations per
+document twice: the old way (three sequential requests.post calls, no session, no retries) and
+through the pooled GroqClient issuing them concurrently. Reports seconds per document,
+connections opened and failed generations; exits non-zero if the pooled client lost any
+generation to an injected fault. Nothing here talks to the real Groq API.
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from groq_client import GroqClient, GroqError
+
+GENERATIONS = ('title', 'description', 'remarks')
+
+class MockGroqServer:
+    """Chat completion endpoint with injected latency and every `fail_every`-th request failing"""
+
+    def __init__(self, latency_ms=300, fail_every=0, fail_status=429):
+        self.latency = latency_ms / 1000
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                    server.connections.add(self.client_address)
+                time.sleep(server.latency)
+                if server.fail_every and number % server.fail_every == 0:
+                    self._reply(server.fail_status, {'error': {'message': 'injected failure'}}, {'Retry-After': '0.05'})
+                    return
+                prompt = body['messages'][-1]['content']
+                self._reply(200, {'choices': [{'message': {'content': f"mock answer to {len(prompt)} chars"}}]})
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/openai/v1/chat/completions"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = set()
+
+    def close(self):
+        self.httpd.shutdown()
+
+def _messages(generation, text):
+    return [{'role': 'user', 'content': f"Write the {generation} of this document:\n{text}"}]
+
+def run_sequential(url, text):
+    """The previous code path: one fresh connection per generation, no retries"""
+    failed = 0
+    for generation in GENERATIONS:
+        response = requests.post(
+            url,
+            headers={'Authorization': 'Bearer test', 'Content-Type': 'application/json'},
+            json={'model': 'mock', 'messages': _messages(generation, text)},
+            timeout=30
+        )
+        failed += response.status_code != 200
+    return failed
+
+def run_pooled(client, executor, text):
+    def generate(generation):
+        try:
+            client.chat('mock', _messages(generation, text))
+            return 0
+        except GroqError:
+            return 1
+    return sum(executor.map(generate, GENERATIONS))
+
+def benchmark(server, documents, pool_size=8, max_retries=3):
+    client = GroqClient(api_key='test', api_url=server.url, pool_size=pool_size,
+                        max_retries=max_retries, backoff_base=0.05)
+    executor = ThreadPoolExecutor(max_workers=pool_size)
+    rows = []
+    for mode, run in (('sequential', lambda text: run_sequential(server.url, text)),
+                      ('pooled', lambda text: run_pooled(client, executor, text))):
+        server.reset()
+        failed, started = 0, time.perf_counter()
+        for number in range(documents):
+            failed += run(f"Synthetic legal document {number}. " * 40)
+        elapsed = time.perf_counter() - started
+        rows.append({
+            'mode': mode,
+            'documents': documents,
+            'seconds_per_document': round(elapsed / documents, 3),
+            'requests': server.requests,
+            'connections': len(server.connections),
+            'failed_generations': failed
+        })
+    executor.shutdown()
+    return rows, client.status()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sequential and pooled Groq calls against a mock server')
+    parser.add_argument('--documents', type=int, default=10, help='documents to analyze per mode')
+    parser.add_argument('--latency-ms', type=int, default=300, help='latency the mock adds to every request')
+    parser.add_argument('--fail-every', type=int, default=5, help='every n-th request fails (0: never)')
+    parser.add_argument('--fail-status', type=int, default=429, help='status code of injected failures')
+    parser.add_argument('--retries', type=int, default=3, help='retries of the pooled client')
+    args = parser.parse_args()
+
+    server = MockGroqServer(args.latency_ms, args.fail_every, args.fail_status)
+    try:
+        rows, client_status = benchmark(server, args.documents, max_retries=args.retries)
+    finally:
+        server.close()
+
+    print(f"{'mode':>12} {'s/doc':>8} {'requests':>9} {'connections':>12} {'failed':>7}")
+    for row in rows:
+        print(f"{row['mode']:>12} {row['seconds_per_document']:>8.3f} {row['requests']:>9} "
+              f"{row['connections']:>12} {row['failed_generations']:>7}")
+    sequential, pooled = rows
+    if pooled['seconds_per_document']:
+        print(f"pooled speedup: {sequential['seconds_per_document'] / pooled['seconds_per_document']:.2f}x "
+              f"(client retries: {client_status['retries']})")
+    if pooled['failed_generations']:
+        raise SystemExit(f"pooled client lost {pooled['failed_generations']} generations to injected failures")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Offline quality and latency benchmark harness for AI Bridge retrieval engines
+
+Builds synthetic legal-like corpora at several sizes where every query has a known relevant
+chunk, runs each search engine configuration over them and reports recall@k, MRR, p50/p95
+latency, build time and memory. Nothing here talks to Laravel.
+"""
+import json
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from numpy.linalg import norm
+from config import SEARCH_RESCORE_CANDIDATES
+from quantized_index import QuantizedVectorIndex, QUANTIZATION_MODES
+from dedup_index import DeduplicatedVectorIndex
+from search_index import VectorIndex, normalize_rows
+from benchmark_search import build_synthetic_index
+
+DOCUMENT_TYPES = [
+    'Deed of Absolute Sale', 'Affidavit of Loss', 'Contract of Lease', 'Special Power of Attorney',
+    'Complaint for Sum of Money', 'Memorandum of Agreement', 'Secretary Certificate', 'Notice of Hearing'
+]
+PARTIES = [
+    'Juan Dela Cruz', 'Maria Santos', 'Pedro Reyes', 'Ana Villanueva', 'Jose Garcia', 'Carmen Bautista',
+    'ABC Realty Corporation', 'Mindanao Trading Inc.', 'Luzon Holdings Corp.', 'Rosa Mendoza'
+]
+PLACES = ['Quezon City', 'Makati City', 'Cebu City', 'Davao City', 'Pasig City', 'Manila', 'Iloilo City']
+CLAUSES = [
+    "{party} hereby sells and conveys to the vendee the parcel of land known as Lot {number} located in {place} "
+    "for the sum of PHP {amount}.",
+    "The lessee shall pay a monthly rental of PHP {amount} for the premises at {place}, payable on or before "
+    "the {day}th day of each month.",
+    "I, {party}, of legal age and a resident of {place}, after having been duly sworn, depose and state that "
+    "the original of document No. {number} was lost.",
+    "{party} is hereby appointed attorney-in-fact to sign, execute and deliver all papers relating to Lot "
+    "{number} in {place}.",
+    "The plaintiff demands payment of PHP {amount} plus legal interest from the defendant {party} from the "
+    "{day}th day of the month until fully paid.",
+    "The parties agree that any dispute arising from agreement No. {number} shall be settled exclusively in the "
+    "courts of {place}.",
+    "This instrument was acknowledged before me in {place} by {party}, who exhibited competent evidence of "
+    "identity No. {number}.",
+    "The hearing on the motion is set on the {day}th day of the month before the Regional Trial Court of "
+    "{place}, Branch {number}.",
+]
+
+class SyntheticCorpus:
+    """A chunk index plus query vectors whose relevant embedding_ids are known"""
+
+    def __init__(self, index, query_vectors, relevant_ids, query_texts=None):
+        self.index = index
+        self.query_vectors = query_vectors
+        self.relevant_ids = relevant_ids
+        self.query_texts = query_texts or []
+
+def _legal_text(num_chunks, chunks_per_doc, rng):
+    """Titles, chunk texts and a distinctive fact query per chunk"""
+    titles, chunk_texts, fact_queries = [], [], []
+    for doc_id in range((num_chunks + chunks_per_doc - 1) // chunks_per_doc):
+        document_type = DOCUMENT_TYPES[rng.integers(len(DOCUMENT_TYPES))]
+        party = PARTIES[rng.integers(len(PARTIES))]
+        title = f"{document_type} - {party} - {2015 + doc_id % 10}-{doc_id % 12 + 1:02d}"
+        for chunk_index in range(chunks_per_doc):
+            facts = {
+                'party': party,
+                'place': PLACES[rng.integers(len(PLACES))],
+                'number': f"{2015 + doc_id % 10}-{doc_id * chunks_per_doc + chunk_index:06d}",
+                'amount': f"{int(rng.integers(10, 5000)) * 1000:,}",
+                'day': int(rng.integers(1, 28)),
+            }
+            titles.append(title)
+            chunk_texts.append(CLAUSES[(doc_id + chunk_index) % len(CLAUSES)].format(**facts))
+            fact_queries.append(f"{document_type} {facts['party']} {facts['place']} No. {facts['number']}")
+    return titles[:num_chunks], chunk_texts[:num_chunks], fact_queries[:num_chunks]
+
+def build_corpus(num_chunks, dimension=768, num_queries=200, chunks_per_doc=8, query_specificity=0.3,
+                 query_noise=0.05, boilerplate_fraction=0.0, boilerplate_clauses=20, encoder=None, seed=0):
+    """Synthetic legal-like corpus with one known relevant chunk per query
+
+    Without an encoder, vectors come from build_synthetic_index and each query sits between
+    its target chunk and the centroid of the target's document (`query_specificity` is how far
+    towards the chunk), plus noise, so sibling chunks and similar documents compete with it.
+    With a SentenceTransformer encoder, chunk texts are embedded and queries are short fact
+    strings (document type, party, place, number) of the target chunk.
+
+    `boilerplate_fraction` of the chunks are copies of `boilerplate_clauses` shared clauses,
+    as repeated template text is in real archives; queries never target them.
+    """
+    rng = np.random.default_rng(seed)
+    titles, chunk_texts, fact_queries = _legal_text(num_chunks, chunks_per_doc, rng)
+    boilerplate_rows = rng.choice(
+        np.arange(boilerplate_clauses, num_chunks), size=int((num_chunks - boilerplate_clauses) * boilerplate_fraction),
+        replace=False
+    ) if boilerplate_fraction > 0 and num_chunks > boilerplate_clauses else np.zeros(0, dtype=np.int64)
+    boilerplate_sources = rng.integers(0, boilerplate_clauses, len(boilerplate_rows))
+    for row, source in zip(boilerplate_rows, boilerplate_sources):
+        chunk_texts[row] = chunk_texts[source]
+    candidates = np.setdiff1d(np.arange(num_chunks), boilerplate_rows)
+    targets = rng.choice(candidates, size=min(num_queries, len(candidates)), replace=False)
+
+    if encoder is None:
+        index = build_synthetic_index(num_chunks, dimension, seed=seed, chunks_per_doc=chunks_per_doc)
+        index.titles, index.chunk_texts = titles, chunk_texts
+        index.vectors[boilerplate_rows] = index.vectors[boilerplate_sources]
+        order, offsets, centroids = index.documents()
+        document_rows = np.searchsorted(index.doc_ids[order[offsets[:-1]]], index.doc_ids[targets])
+        noise = rng.standard_normal((len(targets), dimension), dtype=np.float32) * query_noise
+        query_vectors = normalize_rows(
+            centroids[document_rows] + query_specificity * (index.vectors[targets] - centroids[document_rows]) + noise
+        )
+        query_texts = None
+    else:
+        vectors = encoder.encode(chunk_texts, batch_size=64, convert_to_tensor=False, show_progress_bar=False)
+        doc_ids = np.arange(num_chunks, dtype=np.int64) // chunks_per_doc
+        index = VectorIndex(
+            vectors=normalize_rows(vectors),
+            embedding_ids=np.arange(num_chunks, dtype=np.int64),
+            doc_ids=doc_ids,
+            chunk_indexes=np.arange(num_chunks, dtype=np.int32) % chunks_per_doc,
+            titles=titles,
+            chunk_texts=chunk_texts,
+        )
+        query_texts = [fact_queries[target] for target in targets]
+        query_vectors = normalize_rows(encoder.encode(query_texts, convert_to_tensor=False, show_progress_bar=False))
+
+    relevant_ids = [{int(index.embedding_ids[target])} for target in targets]
+    return SyntheticCorpus(index, query_vectors, relevant_ids, query_texts)
+
+class PythonLoopIndex:
+    """The per-chunk cosine loop the search route used before the vectorized index, kept as a baseline"""
+
+    def __init__(self, index):
+        self.index = index
+        self.rows = [np.array(vector) for vector in index.vectors]
+
+    def search(self, query_vector, limit=10, min_score=-1.0, top_docs=None):
+        results = []
+        for row, chunk_embedding in enumerate(self.rows):
+            similarity = np.dot(query_vector, chunk_embedding) / (norm(query_vector) * norm(chunk_embedding))
+            if similarity > min_score:
+                results.append(self.index.build_result(row, similarity))
+        results.sort(key=lambda result: result['similarity_score'], reverse=True)
+        return results[:limit]
+
+    def memory_footprint(self):
+        return self.index.memory_footprint()
+
+def _copy_index(index):
+    return VectorIndex(
+        vectors=normalize_rows(index.vectors),
+        embedding_ids=index.embedding_ids.copy(),
+        doc_ids=index.doc_ids.copy(),
+        chunk_indexes=index.chunk_indexes.copy(),
+        titles=index.titles,
+        chunk_texts=index.chunk_texts,
+    )
+
+def _two_stage_index(index):
+    copy = _copy_index(index)
+    copy.documents()  # Centroids are part of the build, not the first query
+    return copy
+
+def engine_configurations(two_stage_options=(50,), rescore_candidates=SEARCH_RESCORE_CANDIDATES, include_loop=True):
+    """(name, builder, search options) for every available engine configuration"""
+    configurations = []
+    if include_loop:
+        configurations.append(('python_loop', PythonLoopIndex, {}))
+    configurations.append(('flat', _copy_index, {}))
+    for top_docs in two_stage_options:
+        configurations.append((f'two_stage@{top_docs}', _two_stage_index, {'top_docs': top_docs}))
+    configurations.append(('dedup', DeduplicatedVectorIndex.from_index, {}))
+    for mode in QUANTIZATION_MODES:
+        configurations.append((
+            mode,
+            lambda index, mode=mode: QuantizedVectorIndex.from_index(index, mode, rescore_candidates=rescore_candidates),
+            {}
+        ))
+    return configurations
+
+def score_rankings(rankings, relevant_ids, k):
+    """recall@k and MRR@k of ranked embedding_id lists against the known relevant ids"""
+    recalls, reciprocal_ranks = [], []
+    for ranking, relevant in zip(rankings, relevant_ids):
+        top = ranking[:k]
+        recalls.append(len(relevant.intersection(top)) / len(relevant))
+        rank = next((position for position, embedding_id in enumerate(top, 1) if embedding_id in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    return float(np.mean(recalls)), float(np.mean(reciprocal_ranks))
+
+def run_engine(corpus, name, builder, search_options, k=10):
+    """Build one engine over the corpus and measure it query by query"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    engine = builder(corpus.index)
+    build_seconds = time.perf_counter() - started
+    _, peak_build_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    try:
+        latencies, rankings = [], []
+        for query in corpus.query_vectors:
+            started = time.perf_counter()
+            results = engine.search(query, limit=k, min_score=-1.0, **search_options)
+            latencies.append((time.perf_counter() - started) * 1000)
+            rankings.append([result['embedding_id'] for result in results])
+
+        recall, mrr = score_rankings(rankings, corpus.relevant_ids, k)
+        footprint = engine.memory_footprint()
+        return {
+            'engine': name,
+            'chunks': len(corpus.index),
+            f'recall@{k}': round(recall, 4),
+            'mrr': round(mrr, 4),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'build_seconds': round(build_seconds, 3),
+            'resident_mb': round(footprint['resident_bytes'] / 1e6, 2),
+            'disk_mb': round(footprint['disk_bytes'] / 1e6, 2),
+            'peak_build_mb': round(peak_build_bytes / 1e6, 2)
+        }
+    finally:
+        if hasattr(engine, 'close'):
+            engine.close()
+
+def run_benchmark(sizes, dimension=768, num_queries=200, k=10, two_stage_options=(50,),
+                  rescore_candidates=SEARCH_RESCORE_CANDIDATES, loop_max_chunks=20000, boilerplate_fraction=0.0,
+                  encoder=None, engines=None):
+    """Run every engine configuration over a corpus of each size; returns one row per (size, engine)"""
+    rows = []
+    for size in sizes:
+        corpus = build_corpus(size, dimension, num_queries=num_queries, boilerplate_fraction=boilerplate_fraction,
+                              encoder=encoder)
+        for name, builder, search_options in engine_configurations(two_stage_options, rescore_candidates,
+                                                                   include_loop=size <= loop_max_chunks):
+            if engines and name.split('@')[0] not in engines:
+                continue
+            rows.append(run_engine(corpus, name, builder, search_options, k))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare AI Bridge retrieval engines on synthetic legal corpora')
+    parser.add_argument('--sizes', default='10000,50000,100000', help='comma separated corpus sizes in chunks')
+    parser.add_argument('--dimension', type=int, default=768, help='embedding dimension without --model')
+    parser.add_argument('--queries', type=int, default=200, help='queries per corpus')
+    parser.add_argument('--k', type=int, default=10, help='cut-off for recall and MRR')
+    parser.add_argument('--two-stage', default='50', help='comma separated top-N document counts for two-stage search')
+    parser.add_argument('--rescore-candidates', type=int, default=SEARCH_RESCORE_CANDIDATES,
+                        help='candidates rescored in full precision by quantized engines')
+    parser.add_argument('--loop-max-chunks', type=int, default=20000,
+                        help='largest corpus the python_loop baseline is run on')
+    parser.add_argument('--boilerplate', type=float, default=0.0,
+                        help='fraction of chunks that repeat a shared template clause')
+    parser.add_argument('--engines', default=None, help='comma separated subset, e.g. flat,two_stage,binary')
+    parser.add_argument('--model', default=None, help='optional SentenceTransformer path to embed the corpus text')
+    parser.add_argument('--json', default=None, help='also write the rows to this JSON file')
+    args = parser.parse_args()
+
+    encoder = None
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(args.model)
+        args.dimension = encoder.get_sentence_embedding_dimension()
+
+    rows = run_benchmark(
+        sizes=[int(size) for size in args.sizes.split(',') if size.strip()],
+        dimension=args.dimension,
+        num_queries=args.queries,
+        k=args.k,
+        two_stage_options=[int(value) for value in args.two_stage.split(',') if value.strip()],
+        rescore_candidates=args.rescore_candidates,
+        loop_max_chunks=args.loop_max_chunks,
+        boilerplate_fraction=args.boilerplate,
+        encoder=encoder,
+        engines=set(args.engines.split(',')) if args.engines else None,
+    )
+
+    recall_key = f'recall@{args.k}'
+    print(f"{'chunks':>8} {'engine':>14} {recall_key:>10} {'mrr':>7} {'p50 ms':>8} {'p95 ms':>8}"
+          f" {'build s':>8} {'res MB':>8} {'disk MB':>8} {'peak MB':>8}")
+    for row in rows:
+        print(f"{row['chunks']:>8} {row['engine']:>14} {row[recall_key]:>10.3f} {row['mrr']:>7.3f}"
+              f" {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['build_seconds']:>8.3f}"
+              f" {row['resident_mb']:>8.2f} {row['disk_mb']:>8.2f} {row['peak_build_mb']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(rows, handle, indent=2)
+
+if __name__ == '__main__':
+    main()
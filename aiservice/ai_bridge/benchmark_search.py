@@ -0,0 +1,141 @@
+"""
+Offline benchmarks for the AI Bridge semantic search index
+"""
+import argparse
+import time
+import numpy as np
+from quantized_index import QuantizedVectorIndex, QUANTIZATION_MODES
+from search_index import VectorIndex, normalize_rows
+
+def build_synthetic_index(num_chunks, dimension, seed=0, num_topics=200, chunks_per_doc=8):
+    """Build a VectorIndex of documents whose chunks cluster around a per-document direction"""
+    rng = np.random.default_rng(seed)
+    num_docs = (num_chunks + chunks_per_doc - 1) // chunks_per_doc
+    topics = normalize_rows(rng.standard_normal((num_topics, dimension), dtype=np.float32))
+    documents = normalize_rows(topics[rng.integers(0, num_topics, num_docs)]
+                               + rng.standard_normal((num_docs, dimension), dtype=np.float32) * 0.02)
+    doc_ids = np.arange(num_chunks, dtype=np.int64) // chunks_per_doc
+    vectors = normalize_rows(documents[doc_ids] + rng.standard_normal((num_chunks, dimension), dtype=np.float32) * 0.02)
+    return VectorIndex(
+        vectors=vectors,
+        embedding_ids=np.arange(num_chunks, dtype=np.int64),
+        doc_ids=doc_ids,
+        chunk_indexes=np.arange(num_chunks, dtype=np.int32) % chunks_per_doc,
+        titles=[f"Document {doc_id}" for doc_id in doc_ids],
+        chunk_texts=[''] * num_chunks,
+    )
+
+def benchmark_batch_sizes(index, batch_sizes, limit=10, repeats=5, encoder=None, seed=1):
+    """Measure amortized per-query latency of search_batch for each batch size"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for batch_size in batch_sizes:
+        queries = [f"legal query {i}" for i in range(batch_size)]
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            if encoder is not None:
+                query_vectors = encoder.encode(queries, convert_to_tensor=False)
+            else:
+                query_vectors = rng.standard_normal((batch_size, index.dimension), dtype=np.float32)
+            index.search_batch(query_vectors, limit=limit, min_score=-1.0)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        rows.append((batch_size, best * 1000, best * 1000 / batch_size))
+    return rows
+
+def sample_queries(index, num_queries, noise=0.05, seed=2):
+    """Perturbed copies of random corpus vectors, so every query has true near neighbours"""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index), num_queries)
+    return normalize_rows(index.vectors[rows] + rng.standard_normal((num_queries, index.dimension), dtype=np.float32) * noise)
+
+def recall_at_k(exact_results, approximate_results, k=10):
+    """Mean fraction of the exact top-k embedding ids that the approximate search also returned"""
+    recalls = []
+    for exact, approximate in zip(exact_results, approximate_results):
+        expected = {result['embedding_id'] for result in exact[:k]}
+        if expected:
+            found = {result['embedding_id'] for result in approximate[:k]}
+            recalls.append(len(expected & found) / len(expected))
+    return float(np.mean(recalls)) if recalls else 0.0
+
+def benchmark_quantization(index, num_queries=100, k=10, rescore_candidates=200):
+    """Compare memory footprint, latency and recall@k of quantized indexes against exact float search"""
+    queries = sample_queries(index, num_queries)
+
+    start = time.perf_counter()
+    exact_results = [index.search(query, limit=k, min_score=-1.0) for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / num_queries
+    rows = [('float32', index.memory_footprint(), exact_ms, 1.0)]
+
+    for mode in QUANTIZATION_MODES:
+        quantized = QuantizedVectorIndex.from_index(index, mode, rescore_candidates=rescore_candidates)
+        try:
+            start = time.perf_counter()
+            results = [quantized.search(query, limit=k, min_score=-1.0) for query in queries]
+            latency_ms = (time.perf_counter() - start) * 1000 / num_queries
+            rows.append((mode, quantized.memory_footprint(), latency_ms, recall_at_k(exact_results, results, k)))
+        finally:
+            quantized.close()
+    return rows
+
+def benchmark_two_stage(index, top_docs_options, num_queries=100, k=10):
+    """Compare latency and recall@k of two-stage retrieval against the flat exact scan"""
+    queries = sample_queries(index, num_queries)
+    index.documents()  # Centroids are built once per index, not per query
+
+    start = time.perf_counter()
+    exact_results = [index.search(query, limit=k, min_score=-1.0) for query in queries]
+    flat_ms = (time.perf_counter() - start) * 1000 / num_queries
+    rows = [('flat', flat_ms, 1.0)]
+
+    for top_docs in top_docs_options:
+        start = time.perf_counter()
+        results = [index.search(query, limit=k, min_score=-1.0, top_docs=top_docs) for query in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / num_queries
+        rows.append((f"top {top_docs} docs", latency_ms, recall_at_k(exact_results, results, k)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AI Bridge semantic search')
+    parser.add_argument('--chunks', type=int, default=50000, help='number of synthetic chunks')
+    parser.add_argument('--dimension', type=int, default=768, help='embedding dimension')
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16,32', help='comma separated batch sizes')
+    parser.add_argument('--quantization', action='store_true', help='also report int8/binary memory and recall@10')
+    parser.add_argument('--rescore-candidates', type=int, default=200, help='candidates rescored in full precision')
+    parser.add_argument('--two-stage', default=None, help='comma separated top-N document counts to compare against flat search')
+    parser.add_argument('--model', default=None, help='optional SentenceTransformer path to include query encoding')
+    args = parser.parse_args()
+
+    encoder = None
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(args.model)
+        args.dimension = encoder.get_sentence_embedding_dimension()
+
+    index = build_synthetic_index(args.chunks, args.dimension)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',') if size.strip()]
+
+    print(f"Batched search over {args.chunks} chunks x {args.dimension} dims"
+          f"{' (including query encoding)' if encoder else ''}")
+    print(f"{'batch':>6} {'total ms':>10} {'ms/query':>10}")
+    for batch_size, total_ms, per_query_ms in benchmark_batch_sizes(index, batch_sizes, encoder=encoder):
+        print(f"{batch_size:>6} {total_ms:>10.2f} {per_query_ms:>10.3f}")
+
+    if args.quantization:
+        print(f"\nQuantized index (rescoring top {args.rescore_candidates} in float32)")
+        print(f"{'mode':>8} {'resident MB':>12} {'disk MB':>9} {'ms/query':>10} {'recall@10':>10}")
+        for mode, footprint, latency_ms, recall in benchmark_quantization(index, rescore_candidates=args.rescore_candidates):
+            print(f"{mode:>8} {footprint['resident_bytes'] / 1e6:>12.2f} {footprint['disk_bytes'] / 1e6:>9.2f}"
+                  f" {latency_ms:>10.3f} {recall:>10.3f}")
+
+    if args.two_stage:
+        top_docs_options = [int(value) for value in args.two_stage.split(',') if value.strip()]
+        print(f"\nTwo-stage retrieval over {index.document_count()} documents")
+        print(f"{'mode':>16} {'ms/query':>10} {'recall@10':>10}")
+        for mode, latency_ms, recall in benchmark_two_stage(index, top_docs_options):
+            print(f"{mode:>16} {latency_ms:>10.3f} {recall:>10.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Circuit breaker and latency tracking for calls to a remote model API
+"""
+import time
+import logging
+import threading
+from collections import deque
+import numpy as np
+from config import (
+    GROQ_BREAKER_WINDOW, GROQ_BREAKER_MIN_CALLS, GROQ_BREAKER_FAILURE_RATIO, GROQ_BREAKER_SLOW_CALL_SECONDS,
+    GROQ_BREAKER_OPEN_SECONDS
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over the outcomes of the last `window` calls
+
+    A call counts as failed when the remote was unreachable, timed out, rate limited or
+    failed server-side, or took longer than `slow_call_seconds`; a call the remote rejected
+    as invalid is not counted, since it says nothing about the remote's health. Once at
+    least `min_calls` outcomes are recorded and the failed share reaches `failure_ratio`, the
+    breaker opens and `allow()` refuses calls for `open_seconds`. After that a single probe is
+    let through (half-open): its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, name, window=GROQ_BREAKER_WINDOW, min_calls=GROQ_BREAKER_MIN_CALLS,
+                 failure_ratio=GROQ_BREAKER_FAILURE_RATIO, slow_call_seconds=GROQ_BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds=GROQ_BREAKER_OPEN_SECONDS, latency_samples=200):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self._outcomes = deque(maxlen=window)  # True for a failed call
+        self._latencies = deque(maxlen=latency_samples)  # Seconds of successful calls
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'ignored': 0, 'short_circuited': 0, 'opened': 0}
+
+    def allow(self):
+        """Whether a call may go out now; refused calls are counted as short-circuited"""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'closed' or (self.state == 'half_open' and not self._probe_in_flight):
+                if self.state == 'half_open':
+                    self._probe_in_flight = True
+                return True
+            self.stats['short_circuited'] += 1
+            return False
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.stats['calls'] += 1
+            slow = seconds > self.slow_call_seconds
+            self._latencies.append(seconds)
+            if slow:
+                self.stats['slow_calls'] += 1
+            self._record(failed=slow)
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['failures'] += 1
+            self._record(failed=True)
+
+    def record_ignored(self):
+        """Note a call whose outcome is not counted; a half-open probe is released for the next call"""
+        with self._lock:
+            self.stats['ignored'] += 1
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+
+    def _record(self, failed):
+        """Fold one outcome into the window and move between states (lock held)"""
+        if self.state == 'half_open':
+            self._probe_in_flight = False
+            if failed:
+                self._open('probe call failed')
+            else:
+                self.state = 'closed'
+                self._outcomes.clear()
+                logger.info(f"{self.name} circuit closed after a successful probe")
+            return
+
+        self._outcomes.append(failed)
+        failures = sum(self._outcomes)
+        if (self.state == 'closed' and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_ratio):
+            self._open(f"{failures} of the last {len(self._outcomes)} calls failed or were slow")
+
+    def _open(self, reason):
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+        self.stats['opened'] += 1
+        logger.warning(f"{self.name} circuit opened for {self.open_seconds}s: {reason}")
+
+    def latency_percentile(self, percentile, min_samples=10):
+        """Latency of successful calls at `percentile`, or None before `min_samples` were seen"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            return float(np.percentile(self._latencies, percentile))
+
+    def status(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            return dict(
+                self.stats,
+                state=self.state,
+                recent_failure_ratio=round(sum(self._outcomes) / len(self._outcomes), 3) if self._outcomes else 0.0,
+                p50_latency_seconds=round(float(np.percentile(latencies, 50)), 3) if latencies else None,
+                p95_latency_seconds=round(float(np.percentile(latencies, 95)), 3) if latencies else None
+            )
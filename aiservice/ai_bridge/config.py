@@ -8,13 +8,21 @@ _current_dir = os.path.dirname(__file__)  # ai_bridge directory
 _aiservice_dir = os.path.dirname(_current_dir)  # aiservice directory
 _project_root = os.path.dirname(_aiservice_dir)  # Legal_Arch_aiu directory
 _storage_path = os.path.join(_project_root, "storage", "app", "models")
+_search_index_path = os.path.join(_project_root, "storage", "app", "search_index")
 
 # Global configuration
 LARAVEL_BASE_URL = "http://127.0.0.1:8000"
 EMBEDDING_MODEL_PATH = os.path.join(_storage_path, "legal-bert-base-uncased")
 FALLBACK_MODEL_PATH = os.path.join(_storage_path, "all-MiniLM-L6-v2")
+RERANK_MODEL_PATH = os.path.join(_storage_path, "ms-marco-MiniLM-L-6-v2")
 LLAMA_MODEL_PATH = os.path.join(_storage_path, "Llama-3.2-3B-Instruct-Q8_0-GGUF", "llama-3.2-3b-instruct-q8_0.gguf")
 
+# Llama worker pool: LLAMA_POOL_SIZE instances share LLAMA_CPU_BUDGET cores (None: every core)
+LLAMA_POOL_SIZE = 1
+LLAMA_CPU_BUDGET = 2
+LLAMA_POOL_MAX_QUEUE = 8  # Generation jobs allowed to wait for a free worker before new ones are rejected
+LLAMA_POOL_WAIT_TIMEOUT = 120  # Seconds a job waits for a worker
+
 # Service URLs
 TEXT_EXTRACTION_URL = "http://127.0.0.1:5002"
 EMBEDDING_SERVICE_URL = "http://127.0.0.1:5001"
@@ -33,7 +41,145 @@ MAX_TITLE_LENGTH = 100
 MAX_DESCRIPTION_LENGTH = 500
 MIN_PARAGRAPH_LENGTH = 50
 TITLE_SEARCH_LINES = 10
+DOCUMENT_FEATURE_CACHE_SIZE = 16  # Texts whose lowercased form, word count and keyword matches are kept for reuse
+ANALYSIS_MODE = 'separate'  # 'separate' (one Llama generation per field) or 'combined' (one JSON generation)
+ANALYSIS_COMBINED_MAX_TOKENS = 420  # Roughly the four separate generation budgets together
+LLAMA_PREFIX_CACHE_ENABLED = True  # Evaluate the document prompt prefix once per document and restore its llama.cpp state
+LLAMA_PREFIX_CACHE_STATES = 2  # Saved prefix states kept per Llama worker (each holds the prefix's KV cache)
+
+# Document excerpt in every Groq and Llama analysis prompt: the most salient passages (central terms,
+# names, dates and amounts, opening and closing position) that fit EXCERPT_TOKEN_BUDGET; with selection
+# disabled, the start of the document
+EXCERPT_SELECTION_ENABLED = True
+EXCERPT_TOKEN_BUDGET = 500  # Estimated as characters / EXCERPT_CHARS_PER_TOKEN
+EXCERPT_CHARS_PER_TOKEN = 4
+EXCERPT_PASSAGE_CHARS = 400
+EXCERPT_CACHE_SIZE = 64
+
+# Asynchronous analysis jobs (POST /api/documents/analyze/jobs)
+ANALYSIS_JOB_WORKERS = LLAMA_POOL_SIZE  # Jobs analyzed at once; more would only wait on the Llama pool
+ANALYSIS_JOB_MAX_QUEUE = 200  # Waiting jobs before new submissions are rejected with 503
+ANALYSIS_JOB_RETENTION_SECONDS = 3600  # Finished jobs stay pollable this long
+ANALYSIS_JOB_MAX_RETAINED = 1000  # Finished jobs kept at most, oldest dropped first
+
+# Persistent analysis cache: results keyed by (text hash, folder hash, model id, prompt version)
+ANALYSIS_CACHE_ENABLED = True
+ANALYSIS_CACHE_PATH = os.path.join(_search_index_path, 'analysis_cache.sqlite3')
+ANALYSIS_CACHE_MAX_ENTRIES = 20000  # Least recently used results dropped past this
+ANALYSIS_PROMPT_VERSION = 1  # Bump to drop cached results; edits to analysis_prompts.py templates invalidate them on their own
+
+# Embedding folder classifier: nearest folder centroid of the document's chunk vectors; the LLM is
+# only asked when the best folder beats the runner-up by less than FOLDER_CLASSIFIER_MIN_MARGIN, is less
+# similar than FOLDER_CLASSIFIER_MIN_SIMILARITY, or fewer than two offered folders have a centroid
+FOLDER_CLASSIFIER_ENABLED = True
+FOLDER_CLASSIFIER_MIN_MARGIN = 0.05  # Cosine similarity
+FOLDER_CLASSIFIER_MIN_SIMILARITY = 0.3  # Cosine similarity of the best folder's centroid
+FOLDER_CLASSIFIER_MIN_DOCS = 3  # Filed documents a folder needs before it has a centroid
+FOLDER_CLASSIFIER_TEMPERATURE = 0.02  # Softmax temperature turning similarities into folder_confidence
+FOLDER_CLASSIFIER_TEXT_CHUNKS = 8  # Chunks encoded for documents whose embeddings are not synced yet
+FOLDER_LLM_CONFIDENCE = 0.5  # folder_confidence of an LLM choice the classifier has no centroid for
+
+# Groq client (the API key and model come from .env)
+GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
+GROQ_TIMEOUT = 30
+GROQ_POOL_SIZE = 8  # Keep-alive connections, and threads issuing a request's generations concurrently
+GROQ_MAX_RETRIES = 3  # Retries after a 429, a 5xx or a connection error
+GROQ_BACKOFF_BASE = 0.5  # Seconds; the n-th retry waits a random 0..base*2^n, capped at GROQ_BACKOFF_MAX
+GROQ_BACKOFF_MAX = 8
+# Circuit breaker: open after GROQ_BREAKER_FAILURE_RATIO of the last GROQ_BREAKER_WINDOW calls failed or
+# were slower than GROQ_BREAKER_SLOW_CALL_SECONDS; while open, generations go straight to local Llama
+GROQ_BREAKER_WINDOW = 20
+GROQ_BREAKER_MIN_CALLS = 5
+GROQ_BREAKER_FAILURE_RATIO = 0.5
+GROQ_BREAKER_SLOW_CALL_SECONDS = 15
+GROQ_BREAKER_OPEN_SECONDS = 60  # Then a single probe call decides whether to close again
+# Hedging: start the local Llama generation too when Groq has not answered within the
+# GROQ_HEDGE_PERCENTILE latency of recent calls, and keep whichever acceptable answer comes first
+GROQ_HEDGE_ENABLED = False
+GROQ_HEDGE_PERCENTILE = 95
+GROQ_HEDGE_DEFAULT_SECONDS = 5.0  # Deadline until enough Groq latencies are known
+GROQ_HEDGE_MIN_SECONDS = 0.5
 
 # API timeouts (in seconds)
 LARAVEL_API_TIMEOUT = 30
-TEXT_EXTRACTION_TIMEOUT = 60
\ No newline at end of file
+TEXT_EXTRACTION_TIMEOUT = 60
+
+# Semantic search settings
+SEARCH_MIN_SIMILARITY = 0.3
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_BATCH_MAX_QUERIES = 32
+SEARCH_MODE = 'flat'  # 'flat' (exact scan of every chunk) or 'two_stage' (documents first, then their chunks)
+SEARCH_TWO_STAGE_TOP_DOCS = 50  # Documents whose chunks are scored in two-stage mode
+
+# Quantized search index: None (exact float32), 'int8' or 'binary'
+SEARCH_QUANTIZATION = None
+SEARCH_RESCORE_CANDIDATES = 200
+SEARCH_INDEX_DIR = _search_index_path
+
+# Embedding namespaces ('<model>@<version>'): every stored vector belongs to exactly one
+# namespace and queries are encoded with the model of the namespace they search
+EMBEDDING_NAMESPACES = {
+    'all-MiniLM-L6-v2@1': {'model_path': FALLBACK_MODEL_PATH, 'dimensions': 384},
+    'legal-bert-base-uncased@1': {'model_path': EMBEDDING_MODEL_PATH, 'dimensions': 768},
+}
+DEFAULT_EMBEDDING_NAMESPACE = 'all-MiniLM-L6-v2@1'  # Produced by embedding_service.py
+
+# Background re-embedding job settings
+REEMBED_BATCH_SIZE = 32
+REEMBED_MAX_CHUNKS_PER_SECOND = 20
+
+# Incremental embedding sync from Laravel
+SYNC_PAGE_SIZE = 500
+SYNC_MIN_INTERVAL_SECONDS = 5  # Searches within this window reuse the last sync
+SYNC_RETRY_BASE_SECONDS = 5  # After a failed sync the mirror is served as is; the wait doubles per failure
+SYNC_RETRY_MAX_SECONDS = 300
+SYNC_STATE_PATH = os.path.join(_search_index_path, 'embedding_sync.sqlite3')  # Saved mirror and cursor, resumed on restart
+
+# Cross-encoder re-ranking of search candidates
+RERANK_ENABLED = False  # Default when a search request does not pass 'rerank'
+RERANK_TOP_N = 20  # Candidates re-scored in a single cross-encoder batch
+RERANK_BUDGET_MS = 250  # Skip re-ranking when its predicted cost exceeds this; not a time limit on the batch
+RERANK_CACHE_SIZE = 5000  # (query, chunk) scores kept in the LRU cache
+
+# Typeahead suggestions over document titles and title entities
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_SELECT_WEIGHT = 1.0  # Popularity added when a user picks a suggestion
+SUGGEST_SEARCH_HIT_WEIGHT = 0.1  # Popularity added when a document is returned by semantic search
+
+# Near-duplicate detection at ingest (MinHash over word shingles, LSH banding)
+NEAR_DUPLICATE_NUM_PERM = 128
+NEAR_DUPLICATE_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always collide
+NEAR_DUPLICATE_SHINGLE_WORDS = 3
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity reported as a near-duplicate
+NEAR_DUPLICATE_REUSE_THRESHOLD = 0.95  # Similar enough to reuse the earlier analysis and embeddings
+
+# Offline folder clustering over document centroids (spherical mini-batch k-means)
+CLUSTER_BATCH_SIZE = 1024
+CLUSTER_MAX_ITERATIONS = 300
+CLUSTER_MIN_DOMINANT_SHARE = 0.6  # Clusters with a majority folder this strong drive bulk folder suggestions
+CLUSTER_CROSS_FOLDER_PURITY = 0.5  # Clusters whose top folder holds less than this are reported as cutting across folders
+
+# Search state snapshot used to bootstrap a new or restarted bridge instance
+SEARCH_SNAPSHOT_PATH = os.path.join(_search_index_path, 'search_snapshot.bin')
+SEARCH_SNAPSHOT_LOAD_ON_START = True
+
+# Deduplicated search index: identical or near-identical chunk vectors are stored and scored once
+SEARCH_DEDUPLICATE = False
+SEARCH_DEDUP_TOLERANCE = 1e-3  # Vectors equal after rounding every dimension to this step are merged
+
+# Rebuild stale search indexes in a background shadow copy and swap them in atomically;
+# when False, the query that notices new embeddings waits for the rebuild
+SEARCH_REBUILD_IN_BACKGROUND = True
+
+# Folder-partitioned search: one sub-index per folder, written under SEARCH_PARTITION_DIR and
+# loaded on first use. Searches that pass folder_ids always use partitions; with
+# SEARCH_PARTITION_BY_FOLDER, unscoped searches fan out over every partition too.
+SEARCH_PARTITION_BY_FOLDER = False
+SEARCH_PARTITION_DIR = os.path.join(_search_index_path, 'partitions')
+SEARCH_PARTITION_MEMORY_BUDGET_MB = 512  # Loaded partitions beyond this are evicted least recently used first
+
+# Sync embeddings without chunk_text and fetch the text of search hits only, in one batched
+# call to Laravel per search; recently fetched texts are kept in a small LRU cache
+SEARCH_LAZY_CHUNK_TEXT = False
+CHUNK_TEXT_CACHE_SIZE = 4096
+CHUNK_TEXT_BATCH_SIZE = 1000  # Embedding ids per Laravel call (the endpoint's limit)
@@ -0,0 +1,131 @@
+"""
+Deduplicated vector index for repeated boilerplate chunks in AI Bridge search
+"""
+import logging
+import numpy as np
+from config import SEARCH_MIN_SIMILARITY, SEARCH_DEDUP_TOLERANCE
+from search_index import VectorIndex, normalize_rows, top_k_rows
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class DeduplicatedVectorIndex(VectorIndex):
+    """Chunk index that stores each distinct vector once with a posting list of the chunk rows using it
+
+    Chunks with the same normalized text, or whose vectors agree within `tolerance` on every
+    dimension (the same clause embedded in different batches), share one unique row. Queries
+    are scored against the unique rows and matches are expanded to their chunks in results.
+    """
+
+    def __init__(self, row_to_unique, tolerance=SEARCH_DEDUP_TOLERANCE, **columns):
+        super().__init__(**columns)
+        self.row_to_unique = row_to_unique
+        self.tolerance = tolerance
+        self._posting_order = np.argsort(row_to_unique, kind='stable')
+        self._posting_offsets = np.searchsorted(row_to_unique[self._posting_order], np.arange(len(self.vectors) + 1))
+
+    @classmethod
+    def from_index(cls, index, tolerance=SEARCH_DEDUP_TOLERANCE):
+        """Collapse an index's chunk vectors into unique vectors plus postings"""
+        vectors = normalize_rows(index.row_vectors(np.arange(len(index)))) if len(index) else index.vectors
+        key_type = np.int16 if 1 / tolerance < np.iinfo(np.int16).max else np.int32
+        keys = np.rint(vectors / tolerance).astype(key_type)
+
+        # Chunks with the same normalized text come from the same model, so they share a vector too
+        row_to_unique = np.empty(len(index), dtype=np.int32)
+        unique_by_key, unique_by_text, first_rows = {}, {}, []
+        for row in range(len(index)):
+            key = keys[row].tobytes()
+            text = index.chunk_texts[row] if index.chunk_texts else None
+            text_key = ' '.join(text.lower().split()) if text else None
+            unique_row = unique_by_key.get(key)
+            if unique_row is None and text_key:
+                unique_row = unique_by_text.get(text_key)
+            if unique_row is None:
+                unique_row = len(first_rows)
+                first_rows.append(row)
+            unique_by_key.setdefault(key, unique_row)
+            if text_key:
+                unique_by_text.setdefault(text_key, unique_row)
+            row_to_unique[row] = unique_row
+        unique_vectors = vectors[np.asarray(first_rows, dtype=np.int64)]
+
+        return cls(
+            row_to_unique=row_to_unique,
+            tolerance=tolerance,
+            vectors=unique_vectors,
+            embedding_ids=index.embedding_ids,
+            doc_ids=index.doc_ids,
+            chunk_indexes=index.chunk_indexes,
+            titles=index.titles,
+            chunk_texts=index.chunk_texts,
+        )
+
+    def __len__(self):
+        return len(self.row_to_unique)
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1] if len(self) else 0
+
+    def unique_count(self):
+        return self.vectors.shape[0]
+
+    def postings(self, unique_row):
+        """Chunk rows, in index order, that share a unique vector"""
+        return self._posting_order[self._posting_offsets[unique_row]:self._posting_offsets[unique_row + 1]]
+
+    def row_vectors(self, rows):
+        return np.asarray(self.vectors[self.row_to_unique[rows]], dtype=np.float32)
+
+    def search_batch(self, query_vectors, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        """Score each unique vector once, then expand the best ones to their chunks"""
+        if not len(self):
+            return [[] for _ in range(len(query_vectors))]
+        if top_docs and top_docs < self.document_count():
+            return self.search_two_stage(query_vectors, limit, min_score, top_docs)
+
+        batch_results = []
+        # Every unique vector has at least one chunk, so the top `limit` uniques cover the top `limit` chunks
+        for query_scores in self.score_batch(query_vectors):
+            results = []
+            for unique_row, score in top_k_rows(query_scores, limit, min_score):
+                results.extend(self.build_result(int(row), score) for row in self.postings(unique_row))
+                if len(results) >= limit:
+                    break
+            batch_results.append(results[:limit])
+        return batch_results
+
+    def memory_footprint(self):
+        """Unique vectors plus the row mapping and postings instead of one vector per chunk"""
+        footprint = super().memory_footprint()
+        footprint['vector_bytes'] = (self.vectors.nbytes + self.row_to_unique.nbytes
+                                     + self._posting_order.nbytes + self._posting_offsets.nbytes)
+        footprint['resident_bytes'] = footprint['vector_bytes'] + footprint['id_bytes']
+        return footprint
+
+    def dedup_report(self, top_repeated=10):
+        """How much storage and scan work deduplication saves on this index"""
+        rows, unique = len(self), self.unique_count()
+        counts = np.diff(self._posting_offsets)
+        full_vector_bytes = rows * self.dimension * 4
+        footprint = self.memory_footprint()
+        repeated = np.argsort(-counts, kind='stable')[:top_repeated]
+        return {
+            'chunks': rows,
+            'unique_vectors': unique,
+            'duplicate_chunks': rows - unique,
+            'duplicate_ratio': round(1 - unique / rows, 4) if rows else 0.0,
+            'scan_reduction': round(rows / unique, 2) if unique else 1.0,
+            'vector_bytes_full': full_vector_bytes,
+            'vector_bytes_deduplicated': footprint['vector_bytes'],
+            'bytes_saved': full_vector_bytes - footprint['vector_bytes'],
+            'most_repeated': [
+                {
+                    'chunks': int(counts[unique_row]),
+                    'documents': int(len(np.unique(self.doc_ids[self.postings(unique_row)]))),
+                    'preview': (self.chunk_texts[self.postings(unique_row)[0]] or '')[:120] if self.chunk_texts else None
+                }
+                for unique_row in repeated if counts[unique_row] > 1
+            ]
+        }
@@ -0,0 +1,104 @@
+"""
+Per-document text features shared by the rule-based analyzers
+"""
+import re
+import logging
+import threading
+from collections import Counter, OrderedDict
+from config import DOCUMENT_FEATURE_CACHE_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class TermMatcher:
+    """Finds every occurrence of a fixed set of lowercase terms in one regex pass
+
+    The terms are compiled into a single alternation inside a lookahead, longest first, so the
+    scan tries every position once and reports the longest term starting there. Shorter terms
+    starting at the same position are its prefixes and are counted from a precomputed table,
+    which gives the same overlapping, substring-semantics counts as testing `term in text`
+    for each term separately.
+    """
+
+    def __init__(self, terms):
+        self.terms = frozenset(term.lower() for term in terms if term)
+        ordered = sorted(self.terms, key=len, reverse=True)
+        self._pattern = re.compile('(?=(%s))' % '|'.join(re.escape(term) for term in ordered))
+        self._prefixes = {
+            term: [other for other in self.terms if term.startswith(other)]
+            for term in self.terms
+        }
+
+    def scan(self, text_lower):
+        """Occurrences of each term in `text_lower`"""
+        longest = Counter(match.group(1) for match in self._pattern.finditer(text_lower))
+        counts = Counter()
+        for term, occurrences in longest.items():
+            for prefix in self._prefixes[term]:
+                counts[prefix] += occurrences
+        return counts
+
+class DocumentFeatures:
+    """Lowercased text, word count, lines and term counts of one document, computed once
+
+    Terms outside the matcher's vocabulary (folder and category names, which change per request)
+    are looked up in the lowercased text on first use and remembered.
+    """
+
+    def __init__(self, text, matcher):
+        self.text = text or ''
+        self.lower = self.text.lower()
+        self.word_count = len(self.text.split())
+        self.lines = [line.strip() for line in self.text.split('\n') if line.strip()]
+        self.term_counts = matcher.scan(self.lower)
+        self._vocabulary = matcher.terms
+        self._extra = {}  # term outside the vocabulary -> whether the text contains it
+
+    def has(self, term):
+        """Whether the document contains `term`, case-insensitively"""
+        term = term.lower()
+        if term in self._vocabulary:
+            return term in self.term_counts
+        found = self._extra.get(term)
+        if found is None:
+            found = self._extra[term] = term in self.lower
+        return found
+
+    def count(self, term):
+        """Occurrences of a vocabulary term"""
+        return self.term_counts.get(term.lower(), 0)
+
+class DocumentFeatureCache:
+    """Features of the most recently analyzed texts, so every analyzer of a request shares one scan
+
+    Keyed by the text itself: the generators of one request run on different threads but get
+    the same string, whose hash Python computes once.
+    """
+
+    def __init__(self, matcher, max_entries=DOCUMENT_FEATURE_CACHE_SIZE):
+        self.matcher = matcher
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # text -> DocumentFeatures, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, text):
+        text = text or ''
+        with self._lock:
+            features = self._entries.get(text)
+            if features is not None:
+                self._entries.move_to_end(text)
+                self.stats['hits'] += 1
+                return features
+            self.stats['misses'] += 1
+
+        features = DocumentFeatures(text, self.matcher)
+        with self._lock:
+            self._entries[text] = features
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return features
+
+    def status(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), terms=len(self.matcher.terms))
@@ -0,0 +1,273 @@
+"""
+Cursor-based incremental sync of chunk embeddings from Laravel
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import numpy as np
+from config import (
+    SYNC_PAGE_SIZE, SYNC_MIN_INTERVAL_SECONDS, SYNC_RETRY_BASE_SECONDS, SYNC_RETRY_MAX_SECONDS, SYNC_STATE_PATH,
+    SEARCH_LAZY_CHUNK_TEXT
+)
+from search_index import parse_vector
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class EmbeddingSync:
+    """Bridge-side mirror of Laravel's chunk embeddings, kept current through /document-embeddings/changes
+
+    Each sync pulls only rows changed since the stored cursor, in pages of `page_size` rows
+    parsed one line at a time, and applies tombstones for deleted or deactivated chunks.
+    `version` increases whenever the mirror changes so callers can cache derived indexes;
+    `folder_versions` records the version at which each folder's rows last changed.
+
+    The mirror and its cursor are saved to a SQLite file page by page, so a restarted bridge
+    resumes from where it stopped instead of pulling the whole feed again. A failed sync is
+    logged and the mirror is served as it stands; the next attempt waits a backoff that doubles
+    with each consecutive failure.
+    """
+
+    def __init__(self, bridge_service, page_size=SYNC_PAGE_SIZE, min_interval=SYNC_MIN_INTERVAL_SECONDS,
+                 path=SYNC_STATE_PATH):
+        self.bridge_service = bridge_service
+        self.page_size = page_size
+        self.min_interval = min_interval
+        self.path = path
+        self.cursor = None
+        self.version = 0
+        self.last_sync = 0.0
+        self.retry_at = 0.0
+        self.failures = 0
+        self.last_error = None
+        self.folder_versions = {}
+        self._records = {}
+        self._changed_folders = set()
+        self._lock = threading.Lock()  # Guards the mirrored rows and versions
+        self._sync_lock = threading.Lock()  # One sync at a time; also serializes the SQLite connection
+        self._connection = None
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._records)
+
+    def has_saved_state(self):
+        """Whether an earlier run left a saved mirror to resume from"""
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _connect(self):
+        """Open the saved mirror on first use (sync lock held)"""
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings (embedding_id INTEGER PRIMARY KEY, record TEXT NOT NULL, vector BLOB NOT NULL)'
+            )
+            self._connection.execute('CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.commit()
+        return self._connection
+
+    def _load_saved(self):
+        """Read the saved mirror and cursor once, unless rows were restored from a snapshot first (sync lock held)"""
+        if self._loaded or not self.path:
+            return
+        self._loaded = True
+        if not self.has_saved_state():
+            return
+        try:
+            connection = self._connect()
+            records = {}
+            for embedding_id, record, vector in connection.execute('SELECT embedding_id, record, vector FROM embeddings'):
+                records[embedding_id] = dict(json.loads(record), embedding_vector=np.frombuffer(vector, dtype=np.float32))
+            row = connection.execute("SELECT value FROM sync_state WHERE name = 'cursor'").fetchone()
+        except (OSError, sqlite3.Error, ValueError) as e:
+            logger.warning(f"Could not read the saved embedding mirror {self.path}: {str(e)}")
+            return
+        with self._lock:
+            self._records = records
+            self.cursor = row[0] if row else None
+            self.version += 1
+            self.folder_versions = {record.get('folder_id'): self.version for record in records.values()}
+        logger.info(f"Resumed {len(records)} mirrored chunks from {self.path}")
+
+    def _save(self, upserts, deletions, cursor, replace=False):
+        """Write changed rows and the cursor they lead to in one transaction (sync lock held)
+
+        A failed write only costs a larger catch-up after the next restart, so it is logged.
+        """
+        if not self.path:
+            return
+        try:
+            connection = self._connect()
+            with connection:
+                if replace:
+                    connection.execute('DELETE FROM embeddings')
+                connection.executemany(
+                    'INSERT OR REPLACE INTO embeddings (embedding_id, record, vector) VALUES (?, ?, ?)',
+                    [
+                        (
+                            embedding_id,
+                            json.dumps({name: value for name, value in record.items() if name != 'embedding_vector'}, default=str),
+                            np.asarray(record['embedding_vector'], dtype=np.float32).tobytes()
+                        )
+                        for embedding_id, record in upserts.items()
+                    ]
+                )
+                connection.executemany('DELETE FROM embeddings WHERE embedding_id = ?', [(embedding_id,) for embedding_id in deletions])
+                connection.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES ('cursor', ?)", (cursor,))
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not save the embedding mirror to {self.path}: {str(e)}")
+
+    def records(self):
+        """Snapshot of the mirrored embedding rows ordered by embedding_id"""
+        with self._lock:
+            return [self._records[embedding_id] for embedding_id in sorted(self._records)]
+
+    def records_by_folder(self, folder_ids=None):
+        """Mirrored rows grouped by folder_id, optionally only for `folder_ids`"""
+        with self._lock:
+            grouped = {}
+            for embedding_id in sorted(self._records):
+                record = self._records[embedding_id]
+                folder_id = record.get('folder_id')
+                if folder_ids is None or folder_id in folder_ids:
+                    grouped.setdefault(folder_id, []).append(record)
+            return grouped
+
+    def snapshot(self):
+        """Consistent copy of the mirrored rows, cursor and version for a search snapshot"""
+        with self._lock:
+            return [self._records[embedding_id] for embedding_id in sorted(self._records)], self.cursor, self.version
+
+    def restore(self, records, cursor):
+        """Replace the mirror with rows from a snapshot; the next sync resumes from `cursor`"""
+        with self._sync_lock:
+            self._loaded = True
+            restored = {record['embedding_id']: record for record in records}
+            with self._lock:
+                self._records = restored
+                self.cursor = cursor
+                self.version += 1
+                self.folder_versions = {record.get('folder_id'): self.version for record in records}
+                self.last_sync = 0.0
+                self.retry_at = 0.0
+            self._save(restored, [], cursor, replace=True)
+
+    def apply(self, row):
+        """Apply one change row or tombstone; returns True if the mirror changed"""
+        embedding_id = row.get('embedding_id')
+        if not embedding_id:
+            return False
+        if row.get('deleted'):
+            with self._lock:
+                previous = self._records.pop(embedding_id, None)
+                if previous is None:
+                    return False
+                self._changed_folders.add(previous.get('folder_id'))
+            return True
+
+        vector = parse_vector(row.get('embedding_vector'))
+        if vector is None:
+            return False
+        record = dict(row, embedding_vector=vector)
+        record.pop('deleted', None)
+        with self._lock:
+            previous = self._records.get(embedding_id)
+            self._records[embedding_id] = record
+            # A document moved between folders changes both partitions
+            if previous is not None:
+                self._changed_folders.add(previous.get('folder_id'))
+            self._changed_folders.add(record.get('folder_id'))
+        return True
+
+    def sync(self, headers=None, force=False):
+        """Pull every change since the cursor; skipped if the last sync was under `min_interval` ago
+
+        Searches read the mirror while a sync runs; once the mirror holds rows, a caller that
+        finds another sync in progress does not wait for it. A failed sync leaves the mirror as
+        it was and schedules a retry after the backoff; only a `force`d sync raises the error.
+        """
+        if not self._sync_lock.acquire(blocking=force or not self._records):
+            return {'pages': 0, 'upserted': 0, 'deleted': 0, 'skipped': True}
+        try:
+            self._load_saved()
+            now = time.monotonic()
+            if not force and (now - self.last_sync < self.min_interval or now < self.retry_at):
+                return {'pages': 0, 'upserted': 0, 'deleted': 0, 'skipped': True}
+
+            stats = {'pages': 0, 'upserted': 0, 'deleted': 0, 'skipped': False}
+            try:
+                has_more = True
+                while has_more:
+                    params = {'limit': self.page_size}
+                    if self.cursor:
+                        params['cursor'] = self.cursor
+                    if SEARCH_LAZY_CHUNK_TEXT:
+                        params['include_text'] = 0
+
+                    footer = None
+                    upserts, deletions = {}, set()
+                    for row in self.bridge_service.stream_laravel_rows('/document-embeddings/changes', params=params, headers=headers):
+                        if 'next_cursor' in row:
+                            footer = row
+                        elif 'error' in row:
+                            raise Exception(f"Laravel embedding changes feed failed: {row['error']}")
+                        elif self.apply(row):
+                            embedding_id = row['embedding_id']
+                            if row.get('deleted'):
+                                stats['deleted'] += 1
+                                upserts.pop(embedding_id, None)
+                                deletions.add(embedding_id)
+                            else:
+                                stats['upserted'] += 1
+                                upserts[embedding_id] = self._records[embedding_id]
+                                deletions.discard(embedding_id)
+
+                    if footer is None:
+                        raise Exception("Embedding changes feed ended without a cursor")
+
+                    # Rows are idempotent upserts, so a page cut short is simply pulled again
+                    self.cursor = footer['next_cursor']
+                    self._save(upserts, deletions, self.cursor)
+                    has_more = bool(footer.get('has_more'))
+                    stats['pages'] += 1
+                self.failures, self.retry_at, self.last_error = 0, 0.0, None
+                self.last_sync = time.monotonic()
+            except Exception as e:
+                self.failures += 1
+                delay = min(SYNC_RETRY_MAX_SECONDS, SYNC_RETRY_BASE_SECONDS * 2 ** (self.failures - 1))
+                self.retry_at = time.monotonic() + delay
+                self.last_error = str(e)
+                if force:
+                    raise
+                logger.warning(f"Embedding sync failed ({self.failures} in a row), serving the mirrored "
+                               f"{len(self._records)} chunks and retrying in {delay:.0f}s: {str(e)}")
+                stats['error'] = str(e)
+            finally:
+                with self._lock:
+                    if stats['upserted'] or stats['deleted']:
+                        self.version += 1
+                        for folder_id in self._changed_folders:
+                            self.folder_versions[folder_id] = self.version
+                        logger.info(f"Embedding sync applied {stats['upserted']} upserts and {stats['deleted']} "
+                                    f"deletions in {stats['pages']} pages ({len(self._records)} chunks mirrored)")
+                    self._changed_folders.clear()
+            return stats
+        finally:
+            self._sync_lock.release()
+
+    def status(self):
+        return {
+            'chunks': len(self._records),
+            'version': self.version,
+            'cursor': self.cursor,
+            'seconds_since_sync': round(time.monotonic() - self.last_sync, 1) if self.last_sync else None,
+            'consecutive_failures': self.failures,
+            'last_error': self.last_error,
+            'retry_in_seconds': round(max(0.0, self.retry_at - time.monotonic()), 1) if self.failures else None
+        }
@@ -0,0 +1,206 @@
+"""
+Salience-based document excerpts for LLM prompts
+"""
+import re
+import math
+import logging
+import threading
+from collections import Counter, OrderedDict
+from config import (
+    EXCERPT_SELECTION_ENABLED, EXCERPT_TOKEN_BUDGET, EXCERPT_CHARS_PER_TOKEN, EXCERPT_PASSAGE_CHARS,
+    EXCERPT_CACHE_SIZE
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_BLANK_LINE_PATTERN = re.compile(r'\n\s*\n')
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?;:])\s+')
+_DIGITS_PATTERN = re.compile(r'\d+')
+_WORD_PATTERN = re.compile(r'[A-Za-z][A-Za-z\'-]+|\d[\d,./-]*')
+# Names, dates, amounts and reference numbers: what the title, description and remarks prompts ask for
+_SPECIFIC_PATTERN = re.compile(
+    r'\b\d[\d,./-]*\b|\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b'
+    r'|(?:php|usd|\$|₱)\s?\d|\b(?:no|ref|case)\.?\s?\d',
+    re.IGNORECASE
+)
+# Runs of capitalized words: people, parties and organizations
+_NAME_PATTERN = re.compile(r'\b[A-Z][a-z]+(?:\s+(?:[A-Z]\.|[A-Z][a-z]+))+')
+
+def _line_key(line):
+    """Line with its numbers masked, so 'Page 2 of 6' and 'Page 3 of 6' count as the same header"""
+    return _DIGITS_PATTERN.sub('#', line.strip().lower())
+
+def split_passages(text, passage_chars=EXCERPT_PASSAGE_CHARS):
+    """Paragraphs of `text`, long ones cut at sentence ends, short consecutive ones packed together
+
+    Passages keep their order and never exceed `passage_chars` unless a single sentence does,
+    in which case that sentence is cut hard.
+    """
+    pieces = []
+    for paragraph in _BLANK_LINE_PATTERN.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= passage_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END_PATTERN.split(paragraph):
+            while len(sentence) > passage_chars:
+                pieces.append(sentence[:passage_chars])
+                sentence = sentence[passage_chars:]
+            if sentence.strip():
+                pieces.append(sentence.strip())
+
+    passages = []
+    for piece in pieces:
+        if passages and len(passages[-1]) + len(piece) + 1 <= passage_chars // 2:
+            passages[-1] = passages[-1] + '\n' + piece
+        else:
+            passages.append(piece)
+    return passages
+
+class ExcerptSelector:
+    """Picks the most informative passages of a document under a prompt token budget
+
+    Each passage is scored by
+      - centrality: cosine similarity of its idf-weighted term vector to the document's,
+        so passages about what the whole document is about rank high;
+      - specificity: the density of names, dates, amounts and reference numbers, which the
+        prompts ask the model to quote;
+      - position: the opening passage (title, parties) first, the closing one (signatures,
+        dates) slightly, the rest decaying with distance from the start.
+    Lines that repeat across the document (page headers and footers) and passages that are
+    mostly digits and punctuation (tables of contents) are damped. The best passages that fit
+    the budget are returned in document order. Documents within the budget are returned as is.
+    Excerpts are cached per text, so the prompts of one document share one selection.
+    """
+
+    VERSION = 1  # Part of the analysis cache key; bump when the way passages are split or picked changes
+    CENTRALITY_WEIGHT = 0.5
+    SPECIFICITY_WEIGHT = 0.3
+    POSITION_WEIGHT = 0.2
+    BOILERPLATE_DAMPING = 0.2
+    GAP_MARKER = '\n[...]\n'
+
+    def __init__(self, token_budget=EXCERPT_TOKEN_BUDGET, chars_per_token=EXCERPT_CHARS_PER_TOKEN,
+                 passage_chars=EXCERPT_PASSAGE_CHARS, max_entries=EXCERPT_CACHE_SIZE, enabled=EXCERPT_SELECTION_ENABLED):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.passage_chars = passage_chars
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()  # text -> excerpt, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'selected': 0, 'source_chars': 0, 'excerpt_chars': 0}
+
+    @property
+    def budget_chars(self):
+        return self.token_budget * self.chars_per_token
+
+    def excerpt(self, text):
+        """Excerpt of `text` for prompts, at most `token_budget` estimated tokens"""
+        text = text or ''
+        if len(text) <= self.budget_chars:
+            return text
+        with self._lock:
+            cached = self._entries.get(text)
+            if cached is not None:
+                self._entries.move_to_end(text)
+                self.stats['hits'] += 1
+                return cached
+            self.stats['misses'] += 1
+
+        if self.enabled:
+            try:
+                result = self.select(text)
+            except Exception as e:
+                logger.warning(f"Excerpt selection failed, using the start of the document: {str(e)}")
+                result = text[:self.budget_chars]
+        else:
+            result = text[:self.budget_chars]
+
+        with self._lock:
+            self._entries[text] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats['selected'] += 1
+            self.stats['source_chars'] += len(text)
+            self.stats['excerpt_chars'] += len(result)
+        return result
+
+    def scores(self, passages):
+        """Salience of each passage, in [0, 1]"""
+        count = len(passages)
+        terms = [Counter(word.lower() for word in _WORD_PATTERN.findall(passage)) for passage in passages]
+        document_frequency = Counter(term for passage_terms in terms for term in passage_terms)
+        idf = {term: math.log((1 + count) / (1 + frequency)) + 1 for term, frequency in document_frequency.items()}
+
+        document_vector = Counter()
+        for passage_terms in terms:
+            for term, frequency in passage_terms.items():
+                document_vector[term] += frequency * idf[term]
+        document_norm = math.sqrt(sum(weight * weight for weight in document_vector.values())) or 1.0
+
+        line_counts = Counter(_line_key(line) for passage in passages for line in passage.split('\n') if line.strip())
+        decay = max(3.0, count / 10)
+
+        results = []
+        for index, (passage, passage_terms) in enumerate(zip(passages, terms)):
+            weights = {term: frequency * idf[term] for term, frequency in passage_terms.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            centrality = (
+                sum(weight * document_vector[term] for term, weight in weights.items()) / (norm * document_norm)
+                if norm else 0.0
+            )
+            words = sum(passage_terms.values())
+            specific = len(_SPECIFIC_PATTERN.findall(passage)) + len(_NAME_PATTERN.findall(passage))
+            specificity = min(1.0, 4 * specific / words) if words else 0.0
+            position = 1.0 if index == 0 else 0.5 if index == count - 1 else math.exp(-index / decay)
+            score = (
+                self.CENTRALITY_WEIGHT * centrality
+                + self.SPECIFICITY_WEIGHT * specificity
+                + self.POSITION_WEIGHT * position
+            )
+
+            lines = [_line_key(line) for line in passage.split('\n') if line.strip()]
+            repeated = sum(1 for line in lines if line_counts[line] > 1)
+            letters = sum(character.isalpha() for character in passage)
+            if (lines and repeated / len(lines) > 0.5) or letters < 0.5 * len(passage):
+                score *= self.BOILERPLATE_DAMPING
+            results.append(score)
+        return results
+
+    def select(self, text):
+        """Best-scoring passages that fit the budget, joined in document order"""
+        passages = split_passages(text, self.passage_chars)
+        scores = self.scores(passages)
+        budget = self.budget_chars
+        chosen = set()
+        for index in sorted(range(len(passages)), key=lambda position: -scores[position]):
+            cost = len(passages[index]) + len(self.GAP_MARKER)
+            if cost <= budget:
+                chosen.add(index)
+                budget -= cost
+
+        parts = []
+        previous = None
+        for index in sorted(chosen):
+            if previous is not None:
+                parts.append('\n\n' if index == previous + 1 else self.GAP_MARKER)
+            parts.append(passages[index])
+            previous = index
+        return ''.join(parts) or text[:self.budget_chars]
+
+    def status(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                enabled=self.enabled,
+                token_budget=self.token_budget,
+                compression=round(self.stats['excerpt_chars'] / self.stats['source_chars'], 4) if self.stats['source_chars'] else None
+            )
+
+# Global excerpt selector shared by every prompt of a document
+excerpt_selector = ExcerptSelector()
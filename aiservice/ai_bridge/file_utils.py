@@ -0,0 +1,13 @@
+"""
+File helpers shared by the AI Bridge's on-disk state
+"""
+import os
+import json
+
+def write_json_atomic(path, payload):
+    """Write JSON through a temporary file and rename it into place"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as handle:
+        json.dump(payload, handle, indent=2)
+    os.replace(temp_path, path)
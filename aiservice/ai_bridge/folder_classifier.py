@@ -0,0 +1,224 @@
+"""
+Nearest-centroid folder classification over the chunk embeddings of filed documents
+"""
+import logging
+import threading
+import numpy as np
+from config import (
+    FOLDER_CLASSIFIER_MIN_MARGIN, FOLDER_CLASSIFIER_MIN_SIMILARITY, FOLDER_CLASSIFIER_MIN_DOCS, FOLDER_CLASSIFIER_TEMPERATURE,
+    FOLDER_CLASSIFIER_TEXT_CHUNKS
+)
+from search_index import normalize_rows
+from vector_namespaces import store_digest
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _document_vector(vectors):
+    """Unit-length mean of a document's chunk vectors"""
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm else mean
+
+class FolderCentroidClassifier:
+    """Suggests a folder by comparing a document's embedding with the centroid of each folder
+
+    A document is represented by the mean of its chunk vectors, a folder by the sum of its
+    documents' vectors. The sums are kept per folder and updated document by document as the
+    embedding sync reports changed folders, so moving, adding or removing a document adjusts
+    two sums instead of rebuilding every centroid. A folder is re-read when its synced rows
+    changed or when the namespace's bridge-side store gained vectors for its rows, so a
+    re-embedding job only refolds the folders it touched. A classification is confident when at least
+    two candidate folders have a centroid, the best is at least `min_similarity` similar and
+    beats the runner-up by at least `min_margin` cosine similarity. With a single centroid
+    there is nothing to compare against, so the LLM decides.
+    """
+
+    def __init__(self, min_margin=FOLDER_CLASSIFIER_MIN_MARGIN, min_similarity=FOLDER_CLASSIFIER_MIN_SIMILARITY,
+                 min_docs=FOLDER_CLASSIFIER_MIN_DOCS, temperature=FOLDER_CLASSIFIER_TEMPERATURE):
+        self.min_margin = min_margin
+        self.min_similarity = min_similarity
+        self.min_docs = min_docs
+        self.temperature = temperature
+        self._documents = {}  # doc_id -> (folder_id, unit document vector)
+        self._sums = {}  # folder_id -> sum of its document vectors
+        self._counts = {}  # folder_id -> documents filed there
+        self._namespace = None  # Vector space the sums belong to
+        self._generation = None  # Store generation the folder keys were last checked against
+        self._folder_keys = {}  # folder_id -> (sync folder version, store digest) folded into the sums
+        self._lock = threading.Lock()  # Guards the sums; held only to read them or apply a refresh
+        self._refresh_lock = threading.Lock()  # One refresh at a time
+        self.stats = {'classified': 0, 'confident': 0, 'low_margin': 0, 'single_centroid': 0, 'no_centroids': 0, 'documents_moved': 0}
+
+    def _add(self, doc_id, folder_id, vector):
+        self._documents[doc_id] = (folder_id, vector)
+        if folder_id is None:
+            return
+        self._sums[folder_id] = self._sums.get(folder_id, 0) + vector
+        self._counts[folder_id] = self._counts.get(folder_id, 0) + 1
+
+    def _remove(self, doc_id):
+        folder_id, vector = self._documents.pop(doc_id)
+        if folder_id is None:
+            return
+        self._sums[folder_id] = self._sums[folder_id] - vector
+        self._counts[folder_id] -= 1
+        if not self._counts[folder_id]:
+            del self._sums[folder_id], self._counts[folder_id]
+
+    def refresh(self, embedding_sync, namespace, prepare_records=None, store=None):
+        """Fold the documents of folders changed since the last refresh into the centroid sums
+
+        `namespace` identifies the vector space; a new one starts over. `prepare_records` maps
+        synced rows to rows carrying that space's vectors, and `store` is the namespace's
+        bridge-side vector store, if any. Rows are read and averaged without holding the lock,
+        so classifications keep using the current sums meanwhile.
+        """
+        with self._refresh_lock:
+            folder_versions = dict(embedding_sync.folder_versions)
+            generation = store.generation if store is not None and store.exists() else None
+            with self._lock:
+                if namespace != self._namespace:
+                    self._documents, self._sums, self._counts, self._folder_keys = {}, {}, {}, {}
+                    self._namespace, self._generation = namespace, None
+                known, known_generation = dict(self._folder_keys), self._generation
+
+            changed = {
+                folder_id for folder_id, version in folder_versions.items()
+                if known.get(folder_id, (None, None))[0] != version
+            }
+            changed |= set(known) - set(folder_versions)
+            vectors_by_id = store.vectors_by_id() if generation is not None else {}
+            digests = {}
+            if generation != known_generation:
+                # The store changed; only folders whose own rows gained or lost store vectors are refolded
+                for folder_id, records in embedding_sync.records_by_folder().items():
+                    digests[folder_id] = store_digest(records, vectors_by_id)
+                changed |= {
+                    folder_id for folder_id, digest in digests.items()
+                    if folder_id not in changed and known.get(folder_id, (None, None))[1] != digest
+                }
+            if not changed:
+                with self._lock:
+                    if self._namespace == namespace:
+                        self._generation = generation
+                return 0
+
+            grouped = embedding_sync.records_by_folder(changed)
+            chunks, keys = {}, {}
+            for folder_id in changed & set(folder_versions):
+                records = grouped.get(folder_id, [])
+                prepared = prepare_records(records) if prepare_records is not None else records
+                if generation is not None and store.generation != generation:
+                    # Rows embedded on the fly were just added to the store
+                    digest = store_digest(records, store.vectors_by_id())
+                else:
+                    digest = digests[folder_id] if folder_id in digests else store_digest(records, vectors_by_id)
+                keys[folder_id] = (folder_versions[folder_id], digest)
+                for record in prepared:
+                    chunks.setdefault(record['doc_id'], (folder_id, []))[1].append(record['embedding_vector'])
+            vectors = {doc_id: (folder_id, _document_vector(chunk_vectors)) for doc_id, (folder_id, chunk_vectors) in chunks.items()}
+
+            with self._lock:
+                if self._namespace != namespace:
+                    return 0
+                # Documents that were in a changed folder and are no longer there moved or were removed;
+                # a moved document shows up again under its new (also changed) folder
+                stale = [doc_id for doc_id, (folder_id, _) in self._documents.items() if folder_id in changed]
+                moved = 0
+                for doc_id in stale:
+                    previous_folder = self._documents[doc_id][0]
+                    self._remove(doc_id)
+                    if doc_id in vectors and vectors[doc_id][0] != previous_folder:
+                        moved += 1
+                for doc_id, (folder_id, vector) in vectors.items():
+                    if doc_id in self._documents:
+                        self._remove(doc_id)
+                    self._add(doc_id, folder_id, vector)
+
+                for folder_id in changed:
+                    if folder_id in keys:
+                        self._folder_keys[folder_id] = keys[folder_id]
+                    else:
+                        self._folder_keys.pop(folder_id, None)
+                self._generation = generation
+                self.stats['documents_moved'] += moved
+            return len(vectors)
+
+    def document_vector(self, doc_id=None, text=None, encoder=None, chunk_chars=1000):
+        """Vector of a document: its synced chunk vectors if known, else `text` encoded on the spot"""
+        with self._lock:
+            known = self._documents.get(doc_id)
+        if known is not None:
+            return known[1]
+        if not text or encoder is None:
+            return None
+        chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+        chunks = [chunk for chunk in chunks[:FOLDER_CLASSIFIER_TEXT_CHUNKS] if chunk.strip()]
+        return _document_vector(encoder.encode(chunks, convert_to_tensor=False)) if chunks else None
+
+    def classify(self, vector, folder_ids=None, doc_id=None):
+        """Folders ranked by centroid similarity, with the winner's margin and confidence
+
+        Only `folder_ids` are candidates when given. A document that is already filed is left
+        out of its own folder's centroid. Returns None when no candidate folder has `min_docs`
+        documents.
+        """
+        with self._lock:
+            own = self._documents.get(doc_id)
+            candidates, centroids = [], []
+            for folder_id, total in self._sums.items():
+                if folder_ids is not None and folder_id not in folder_ids:
+                    continue
+                count = self._counts[folder_id]
+                if own is not None and own[0] == folder_id:
+                    total, count = total - own[1], count - 1
+                if count < self.min_docs:
+                    continue
+                candidates.append(folder_id)
+                centroids.append(total / count)
+
+            self.stats['classified'] += 1
+            if not candidates:
+                self.stats['no_centroids'] += 1
+                return None
+
+            similarities = normalize_rows(np.asarray(centroids, dtype=np.float32)) @ np.asarray(vector, dtype=np.float32)
+            order = np.argsort(-similarities)
+            best = float(similarities[order[0]])
+            if len(candidates) < 2:
+                # A softmax over one folder is always 1.0 and says nothing about the fit
+                self.stats['single_centroid'] += 1
+                return {
+                    'folder_id': candidates[0],
+                    'similarity': round(best, 4),
+                    'margin': None,
+                    'confidence': None,
+                    'confident': False,
+                    'probabilities': {}
+                }
+
+            margin = best - float(similarities[order[1]])
+            weights = np.exp((similarities - similarities[order[0]]) / self.temperature)
+            probabilities = weights / weights.sum()
+            confident = margin >= self.min_margin and best >= self.min_similarity
+            self.stats['confident' if confident else 'low_margin'] += 1
+
+        return {
+            'folder_id': candidates[order[0]],
+            'similarity': round(best, 4),
+            'margin': round(margin, 4),
+            'confidence': round(float(probabilities[order[0]]), 4),
+            'confident': confident,
+            'probabilities': {candidates[index]: round(float(probabilities[index]), 4) for index in order}
+        }
+
+    def status(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                documents=len(self._documents),
+                folders=len(self._sums),
+                min_margin=self.min_margin,
+                min_similarity=self.min_similarity
+            )
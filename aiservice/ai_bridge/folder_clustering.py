@@ -0,0 +1,209 @@
+"""
+Offline clustering of document vectors to review folder organization across the archive
+"""
+import os
+import json
+import time
+import logging
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from config import (
+    SEARCH_INDEX_DIR, CLUSTER_BATCH_SIZE, CLUSTER_MAX_ITERATIONS, CLUSTER_MIN_DOMINANT_SHARE,
+    CLUSTER_CROSS_FOLDER_PURITY
+)
+from search_index import normalize_rows
+from file_utils import write_json_atomic
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CLUSTER_REPORT_PATH = os.path.join(SEARCH_INDEX_DIR, 'folder_clusters.json')
+
+# Rows assigned per block in the final labelling pass
+_ASSIGN_BLOCK_ROWS = 16384
+
+def _init_centers(vectors, n_clusters, generator, sample_size=10000):
+    """k-means++ seeding on a sample, using cosine distance between normalized rows"""
+    sample = vectors[generator.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+    centers = [sample[generator.integers(len(sample))]]
+    closest = 1.0 - sample @ centers[0]
+    for _ in range(1, n_clusters):
+        weights = np.clip(closest, 0, None) ** 2
+        total = weights.sum()
+        pick = generator.choice(len(sample), p=weights / total) if total > 0 else generator.integers(len(sample))
+        centers.append(sample[pick])
+        closest = np.minimum(closest, 1.0 - sample @ sample[pick])
+    return np.stack(centers).astype(np.float32)
+
+def assign_clusters(vectors, centers):
+    """Nearest center (by cosine) and its similarity for every row, scored block by block"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    similarities = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK_ROWS):
+        scores = vectors[start:start + _ASSIGN_BLOCK_ROWS] @ centers.T
+        labels[start:start + len(scores)] = scores.argmax(axis=1)
+        similarities[start:start + len(scores)] = scores.max(axis=1)
+    return labels, similarities
+
+def mini_batch_kmeans(vectors, n_clusters, batch_size=CLUSTER_BATCH_SIZE, max_iterations=CLUSTER_MAX_ITERATIONS,
+                      tolerance=1e-4, seed=0):
+    """Spherical mini-batch k-means over normalized rows; returns (centers, labels, similarities)"""
+    vectors = normalize_rows(vectors)
+    n_clusters = max(1, min(n_clusters, len(vectors)))
+    generator = np.random.default_rng(seed)
+    centers = _init_centers(vectors, n_clusters, generator)
+    counts = np.zeros(n_clusters, dtype=np.float64)
+
+    for _ in range(max_iterations):
+        batch = vectors[generator.choice(len(vectors), min(batch_size, len(vectors)), replace=False)]
+        labels = (batch @ centers.T).argmax(axis=1)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+        batch_counts = np.bincount(labels, minlength=n_clusters)
+
+        # Per-center learning rate decays with the number of rows the center has absorbed
+        counts += batch_counts
+        updated = batch_counts > 0
+        rates = np.zeros(n_clusters, dtype=np.float32)
+        rates[updated] = batch_counts[updated] / counts[updated]
+        means = sums[updated] / batch_counts[updated, None]
+        previous = centers.copy()
+        centers[updated] = (1 - rates[updated, None]) * centers[updated] + rates[updated, None] * means
+        centers = normalize_rows(centers)
+        if np.abs(centers - previous).max() < tolerance:
+            break
+
+    labels, similarities = assign_clusters(vectors, centers)
+    return centers, labels, similarities
+
+def build_cluster_report(doc_ids, labels, similarities, documents, folder_names):
+    """Cluster composition by folder, clusters that cut across folders, and bulk folder moves
+
+    `documents` maps doc_id -> {'title', 'folder_id'}; `folder_names` maps folder_id -> name.
+    """
+    clusters, suggestions = [], []
+    for cluster in np.unique(labels):
+        members = np.flatnonzero(labels == cluster)
+        folders = Counter(documents[int(doc_ids[row])].get('folder_id') for row in members)
+        dominant_folder, dominant_count = max(
+            ((folder, count) for folder, count in folders.items() if folder is not None),
+            key=lambda item: item[1], default=(None, 0)
+        )
+        dominant_share = dominant_count / len(members)
+        filed_folders = [folder for folder in folders if folder is not None]
+
+        clusters.append({
+            'cluster_id': int(cluster),
+            'size': int(len(members)),
+            'folders': {str(folder) if folder is not None else 'unfiled': count for folder, count in folders.most_common()},
+            'dominant_folder_id': dominant_folder,
+            'dominant_folder_name': folder_names.get(dominant_folder),
+            'purity': round(dominant_share, 3),
+            'cuts_across_folders': len(filed_folders) > 1 and dominant_share < CLUSTER_CROSS_FOLDER_PURITY,
+            'sample_titles': [documents[int(doc_ids[row])].get('title') for row in members[np.argsort(-similarities[members])][:5]]
+        })
+
+        # A clear majority folder suggests where the cluster's strays and unfiled documents belong
+        if dominant_folder is None or dominant_share < CLUSTER_MIN_DOMINANT_SHARE:
+            continue
+        for row in members:
+            doc_id = int(doc_ids[row])
+            current_folder = documents[doc_id].get('folder_id')
+            if current_folder != dominant_folder:
+                suggestions.append({
+                    'doc_id': doc_id,
+                    'title': documents[doc_id].get('title'),
+                    'current_folder_id': current_folder,
+                    'suggested_folder_id': dominant_folder,
+                    'suggested_folder_name': folder_names.get(dominant_folder),
+                    'cluster_id': int(cluster),
+                    'confidence': round(float(dominant_share * similarities[row]), 3)
+                })
+
+    suggestions.sort(key=lambda suggestion: suggestion['confidence'], reverse=True)
+    return {
+        'clusters': sorted(clusters, key=lambda cluster: (not cluster['cuts_across_folders'], -cluster['size'])),
+        'cross_folder_clusters': sum(1 for cluster in clusters if cluster['cuts_across_folders']),
+        'folder_suggestions': suggestions
+    }
+
+class FolderClusteringJob(threading.Thread):
+    """Clusters every document centroid of a namespace and writes a folder organization report"""
+
+    def __init__(self, bridge_service, namespace, headers=None, n_clusters=None):
+        super().__init__(name=f"cluster-{namespace}", daemon=True)
+        self.bridge_service = bridge_service
+        self.namespace = namespace
+        self.headers = headers or {}
+        self.n_clusters = n_clusters
+        self.state = {'namespace': namespace, 'status': 'queued', 'error': None}
+
+    def status(self):
+        return dict(self.state)
+
+    def _folder_names(self):
+        response = self.bridge_service.call_laravel_api('/ai/folders/public')
+        folders = response.get('data') if response.get('success') else None
+        if isinstance(folders, dict):
+            folders = folders.get('data')
+        return {folder['folder_id']: folder.get('folder_name') for folder in folders or [] if 'folder_id' in folder}
+
+    def run(self):
+        self.state.update({'status': 'running', 'started_at': datetime.now().isoformat()})
+        try:
+            started = time.perf_counter()
+            # The index is built from the streamed sync mirror, so no per-document JSON is fetched
+            with self.bridge_service.search_index(headers=self.headers, namespace=self.namespace,
+                                                  wait_for_rebuild=True) as search_index:
+                if not len(search_index):
+                    raise Exception(f"No embeddings available in namespace {self.namespace}")
+                order, offsets, centroids = search_index.documents()
+                doc_ids = search_index.doc_ids[order[offsets[:-1]]]
+            documents = {}
+            for record in self.bridge_service.embedding_sync.records():
+                documents.setdefault(record['doc_id'], {
+                    'title': record.get('document_title'),
+                    'folder_id': record.get('folder_id')
+                })
+            folder_names = self._folder_names()
+
+            # Default to one cluster per folder in use, so clusters line up with the current layout
+            n_clusters = self.n_clusters or max(2, len({doc['folder_id'] for doc in documents.values() if doc['folder_id']}))
+            logger.info(f"Clustering {len(doc_ids)} documents into {n_clusters} clusters")
+            _, labels, similarities = mini_batch_kmeans(centroids, n_clusters)
+
+            report = build_cluster_report(doc_ids, labels, similarities, documents, folder_names)
+            report.update({
+                'namespace': self.namespace,
+                'documents': int(len(doc_ids)),
+                'n_clusters': int(len(np.unique(labels))),
+                'elapsed_seconds': round(time.perf_counter() - started, 2),
+                'generated_at': datetime.now().isoformat()
+            })
+            write_json_atomic(CLUSTER_REPORT_PATH, report)
+
+            self.state.update({
+                'status': 'complete',
+                'completed_at': report['generated_at'],
+                'documents': report['documents'],
+                'cross_folder_clusters': report['cross_folder_clusters'],
+                'folder_suggestions': len(report['folder_suggestions']),
+                'elapsed_seconds': report['elapsed_seconds']
+            })
+            logger.info(f"Folder clustering complete: {report['cross_folder_clusters']} cross-folder clusters, "
+                        f"{len(report['folder_suggestions'])} folder suggestions in {report['elapsed_seconds']}s")
+
+        except Exception as e:
+            logger.error(f"Folder clustering failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            self.state.update({'status': 'failed', 'error': str(e)})
+
+def load_cluster_report():
+    """Most recent clustering report, or None if the job has not completed yet"""
+    if not os.path.exists(CLUSTER_REPORT_PATH):
+        return None
+    with open(CLUSTER_REPORT_PATH, 'r', encoding='utf-8') as handle:
+        return json.load(handle)
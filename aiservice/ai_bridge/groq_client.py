@@ -0,0 +1,141 @@
+"""
+Shared Groq chat completion client with connection pooling and bounded retries
+"""
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from circuit_breaker import CircuitBreaker
+from config import (
+    GROQ_API_URL, GROQ_TIMEOUT, GROQ_POOL_SIZE, GROQ_MAX_RETRIES, GROQ_BACKOFF_BASE, GROQ_BACKOFF_MAX
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class GroqError(Exception):
+    """Raised when a Groq request fails for good, after any retries"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class GroqCircuitOpen(GroqError):
+    """Raised without calling Groq while its circuit breaker is open"""
+
+class GroqClient:
+    """One keep-alive requests session shared by every Groq generation
+
+    Connections are pooled (up to `pool_size` per host), so concurrent title, description and
+    remarks requests reuse warm TLS connections instead of opening one each. Rate limits (429),
+    5xx responses and connection errors are retried up to `max_retries` times with full-jitter
+    exponential backoff, honouring a Retry-After header when Groq sends one. A circuit breaker
+    over the final outcome of each call fails calls immediately while Groq is down or slow, so
+    callers fall back to local Llama without waiting out timeouts. Requests Groq rejects as
+    invalid (other 4xx) fail without counting against the breaker.
+    """
+
+    def __init__(self, api_key=None, api_url=None, timeout=GROQ_TIMEOUT, pool_size=GROQ_POOL_SIZE,
+                 max_retries=GROQ_MAX_RETRIES, backoff_base=GROQ_BACKOFF_BASE, backoff_max=GROQ_BACKOFF_MAX):
+        self.api_key = api_key if api_key is not None else os.getenv('GROQ_API_KEY')
+        self.api_url = api_url or os.getenv('GROQ_API_URL', GROQ_API_URL)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.breaker = CircuitBreaker('Groq')
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _backoff_seconds(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, or the server's Retry-After when it is given"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def chat(self, model, messages, temperature=0.3, max_tokens=None):
+        """Content of the first choice of a chat completion; raises GroqError on failure"""
+        if not self.api_key:
+            raise GroqError("Groq API key not configured")
+
+        payload = {'model': model, 'messages': messages, 'temperature': temperature}
+        if max_tokens:
+            payload['max_tokens'] = max_tokens
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+        if not self.breaker.allow():
+            raise GroqCircuitOpen("Groq circuit breaker is open")
+
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._count('requests')
+                retry_after = None
+                try:
+                    response = self.session.post(self.api_url, headers=headers, json=payload, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = GroqError(f"Groq API unreachable: {str(e)}")
+                else:
+                    if response.status_code == 200:
+                        try:
+                            content = response.json()['choices'][0]['message']['content']
+                        except (ValueError, KeyError, IndexError, TypeError) as e:
+                            raise GroqError(f"Unexpected Groq API response: {str(e)}", response.status_code)
+                        self.breaker.record_success(time.perf_counter() - started)
+                        return content
+                    error = GroqError(f"Groq API error: {response.status_code} - {response.text[:200]}", response.status_code)
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        raise error
+                    retry_after = response.headers.get('Retry-After')
+
+                if attempt == self.max_retries:
+                    raise error
+                delay = self._backoff_seconds(attempt, retry_after)
+                self._count('retries')
+                logger.warning(f"{str(error)}; retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+        except Exception as e:
+            self._count('failures')
+            # Only transport errors, timeouts, 429 and 5xx say Groq itself is unhealthy
+            if isinstance(e, GroqError) and e.status_code is not None and e.status_code not in RETRYABLE_STATUS_CODES:
+                self.breaker.record_ignored()
+            else:
+                self.breaker.record_failure()
+            raise
+        finally:
+            self._count('seconds', time.perf_counter() - started)
+
+    def status(self):
+        with self._lock:
+            return dict(
+                {name: round(value, 3) if isinstance(value, float) else value for name, value in self.stats.items()},
+                configured=bool(self.api_key),
+                api_url=self.api_url,
+                breaker=self.breaker.status()
+            )
+
+# Global Groq client instance
+groq_client = GroqClient()
+
+# Threads issuing independent Groq generations of a request concurrently
+groq_executor = ThreadPoolExecutor(max_workers=GROQ_POOL_SIZE, thread_name_prefix='groq')
+
+# Separate threads for hedged Groq/Llama races, which are started from groq_executor tasks
+hedge_executor = ThreadPoolExecutor(max_workers=GROQ_POOL_SIZE * 2, thread_name_prefix='groq-hedge')
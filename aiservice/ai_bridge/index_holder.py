@@ -0,0 +1,145 @@
+"""
+Double-buffered holder that swaps in rebuilt search indexes without disturbing live queries
+"""
+import time
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class IndexVersion:
+    """One published index and the number of queries currently reading it"""
+
+    def __init__(self, key, index):
+        self.key = key
+        self.index = index
+        self.readers = 0
+        self.published_at = time.time()
+
+class DoubleBufferedIndex:
+    """Serves the published index while a shadow copy is built, then swaps the pointer atomically
+
+    Readers take the current version through acquire(). A swap only replaces the pointer, so
+    queries already running finish on the version they started with; a replaced version is
+    closed once its last reader has left.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()  # Guards the pointer, reader counts and retired versions
+        self._build_lock = threading.Lock()  # One build at a time
+        self._current = None
+        self._retired = []
+        self._rebuild_thread = None
+        self.stats = {'builds': 0, 'failed_builds': 0, 'swaps': 0, 'released': 0, 'last_build_seconds': None}
+
+    @property
+    def key(self):
+        current = self._current
+        return current.key if current else None
+
+    def is_rebuilding(self):
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    @contextmanager
+    def acquire(self):
+        """Hold the current index for the duration of a query"""
+        with self._lock:
+            version = self._current
+            if version is None:
+                raise LookupError(f"No index has been published for {self.name}")
+            version.readers += 1
+        try:
+            yield version.index
+        finally:
+            with self._lock:
+                version.readers -= 1
+                self._release_drained()
+
+    def indexes(self):
+        """The published index and the replaced ones still being read"""
+        with self._lock:
+            return ([self._current.index] if self._current else []) + [version.index for version in self._retired]
+
+    def publish(self, key, index):
+        """Make `index` the version new readers get; the previous one is released when drained"""
+        with self._lock:
+            previous, self._current = self._current, IndexVersion(key, index)
+            if previous is not None:
+                self._retired.append(previous)
+            self.stats['swaps'] += 1
+            self._release_drained()
+
+    def _release_drained(self):
+        """Close retired versions nobody is reading any more (called with the lock held)"""
+        draining = []
+        for version in self._retired:
+            if version.readers:
+                draining.append(version)
+                continue
+            if hasattr(version.index, 'close'):
+                try:
+                    version.index.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close retired {self.name} index: {str(e)}")
+            self.stats['released'] += 1
+        self._retired = draining
+
+    def build(self, build_fn, only_if_empty=False):
+        """Build a new version in the calling thread and publish it
+
+        `build_fn` returns (key, index), or None when the version it would build is already
+        published. With `only_if_empty`, nothing is built if another caller published a
+        version while this one waited for the build lock.
+        """
+        with self._build_lock:
+            if only_if_empty and self._current is not None:
+                return False
+            started = time.perf_counter()
+            try:
+                built = build_fn()
+            except Exception:
+                self.stats['failed_builds'] += 1
+                raise
+            if built is None:
+                return False
+            key, index = built
+            self.stats['builds'] += 1
+            self.stats['last_build_seconds'] = round(time.perf_counter() - started, 3)
+            self.publish(key, index)
+            return True
+
+    def rebuild_async(self, build_fn):
+        """Build a shadow version in a background thread; returns False if one is already running"""
+        with self._lock:
+            if self.is_rebuilding():
+                return False
+            self._rebuild_thread = threading.Thread(
+                target=self._run_rebuild, args=(build_fn,), name=f"rebuild-{self.name}", daemon=True
+            )
+            self._rebuild_thread.start()
+            return True
+
+    def _run_rebuild(self, build_fn):
+        try:
+            if not self.build(build_fn):
+                return
+            logger.info(f"Rebuilt {self.name} index in {self.stats['last_build_seconds']}s and swapped it in")
+        except Exception as e:
+            logger.error(f"Background rebuild of {self.name} index failed: {str(e)}")
+            logger.error(traceback.format_exc())
+
+    def status(self):
+        with self._lock:
+            current = self._current
+            return dict(
+                self.stats,
+                key=list(current.key) if current and isinstance(current.key, tuple) else (current.key if current else None),
+                readers=current.readers if current else 0,
+                draining_versions=len(self._retired),
+                rebuilding=self.is_rebuilding(),
+                published_at=current.published_at if current else None
+            )
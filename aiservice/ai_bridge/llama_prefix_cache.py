@@ -0,0 +1,107 @@
+"""
+Reuse of evaluated document prefixes across Llama analysis prompts
+"""
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from config import LLAMA_PREFIX_CACHE_STATES, LLAMA_POOL_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class LlamaPrefixCache:
+    """llama.cpp states saved right after evaluating a shared document prefix
+
+    The title, description, remarks and folder prompts all start with the same system turn and
+    document excerpt. The first prompt for a document evaluates that prefix once and saves the
+    model state; later prompts restore it, and llama-cpp-python's prefix matching then only
+    evaluates their task-specific suffix. Must be used while holding the Llama worker.
+    """
+
+    def __init__(self, max_states=LLAMA_PREFIX_CACHE_STATES * LLAMA_POOL_SIZE):
+        self.max_states = max_states
+        self._lock = threading.Lock()  # Guards the states and stats; workers evaluate in parallel
+        self._states = OrderedDict()  # (worker model id, prefix hash) -> entry, least recently used first
+        self.stats = {
+            'documents': 0,
+            'reuses': 0,
+            'prefix_tokens': 0,
+            'prefix_eval_seconds': 0.0,
+            'restore_seconds': 0.0,
+            'saved_seconds': 0.0
+        }
+        self.last_document = None
+
+    def prepare(self, llama_model, prefix):
+        """Leave `llama_model` in the state right after `prefix`, evaluating it only on first use"""
+        # States belong to the context they were saved from, so each pool worker has its own
+        key = (id(llama_model), hashlib.sha1(prefix.encode('utf-8')).hexdigest())
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is not None:
+                self._states.move_to_end(key)
+        if entry is not None:
+            started = time.perf_counter()
+            llama_model.load_state(entry['state'])
+            restore_seconds = time.perf_counter() - started
+            with self._lock:
+                entry['reuses'] += 1
+                entry['saved_seconds'] += max(entry['eval_seconds'] - restore_seconds, 0.0)
+                self.stats['reuses'] += 1
+                self.stats['restore_seconds'] += restore_seconds
+                self.stats['saved_seconds'] += max(entry['eval_seconds'] - restore_seconds, 0.0)
+                self._report(entry)
+            return
+
+        # Tokenized the way create_completion tokenizes the full prompt, so the prefixes line up
+        tokens = llama_model.tokenize(prefix.encode('utf-8'), special=True)
+        started = time.perf_counter()
+        llama_model.reset()
+        llama_model.eval(tokens)
+        eval_seconds = time.perf_counter() - started
+        entry = {
+            'state': llama_model.save_state(),
+            'prefix_tokens': len(tokens),
+            'eval_seconds': eval_seconds,
+            'reuses': 0,
+            'saved_seconds': 0.0
+        }
+        with self._lock:
+            self._states[key] = entry
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+            self.stats['documents'] += 1
+            self.stats['prefix_tokens'] += len(tokens)
+            self.stats['prefix_eval_seconds'] += eval_seconds
+            self._report(entry)
+
+    def _report(self, entry):
+        self.last_document = {
+            'prefix_tokens': entry['prefix_tokens'],
+            'prefix_eval_seconds': round(entry['eval_seconds'], 3),
+            'reuses': entry['reuses'],
+            'saved_seconds': round(entry['saved_seconds'], 3)
+        }
+        if entry['reuses']:
+            logger.info(f"Reused {entry['prefix_tokens']}-token document prefix ({entry['reuses']} reuses), "
+                        f"saving {entry['saved_seconds']:.2f}s of prompt evaluation so far")
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def status(self):
+        with self._lock:
+            documents = self.stats['documents']
+            return dict(
+                {name: round(value, 3) if isinstance(value, float) else value for name, value in self.stats.items()},
+                cached_states=len(self._states),
+                saved_seconds_per_document=round(self.stats['saved_seconds'] / documents, 3) if documents else 0.0,
+                last_document=self.last_document
+            )
+
+# Global prefix cache instance
+llama_prefix_cache = LlamaPrefixCache()
@@ -4,9 +4,16 @@ Model loading functionality for AI Bridge Service
 import os
 import logging
 import traceback
+import time
+import queue
 import threading
+from collections import deque
+from contextlib import contextmanager
 from sentence_transformers import SentenceTransformer
-from config import EMBEDDING_MODEL_PATH, FALLBACK_MODEL_PATH, LLAMA_MODEL_PATH
+from config import (
+    EMBEDDING_MODEL_PATH, FALLBACK_MODEL_PATH, LLAMA_MODEL_PATH, EMBEDDING_NAMESPACES,
+    LLAMA_POOL_SIZE, LLAMA_CPU_BUDGET, LLAMA_POOL_MAX_QUEUE, LLAMA_POOL_WAIT_TIMEOUT
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,7 +21,9 @@ logger = logging.getLogger(__name__)
 # Global variables for models
 embedding_model = None
 llama_model = None
-llama_lock = threading.Lock()  # Thread lock for Llama model access
+llama_pool = None  # LlamaWorkerPool over every loaded Llama instance
+namespace_encoders = {}  # Query encoders keyed by embedding namespace
+namespace_encoders_lock = threading.Lock()
 
 def load_embedding_model():
     """Load the BERT embedding model (legal-bert-base-uncased only)"""
@@ -41,9 +50,120 @@ def get_embedding_model():
     """Get the loaded embedding model"""
     return embedding_model
 
+def get_namespace_encoder(namespace):
+    """Get the encoder that produces vectors for an embedding namespace, loading it on first use"""
+    settings = EMBEDDING_NAMESPACES.get(namespace)
+    if not settings:
+        return None
+
+    model_path = settings['model_path']
+    if model_path == EMBEDDING_MODEL_PATH and embedding_model is not None:
+        return embedding_model
+
+    with namespace_encoders_lock:
+        if namespace not in namespace_encoders:
+            if not os.path.exists(model_path):
+                logger.error(f"Model for namespace {namespace} not found at {model_path}")
+                return None
+            try:
+                logger.info(f"Loading encoder for namespace {namespace} from {model_path}")
+                namespace_encoders[namespace] = SentenceTransformer(model_path)
+            except Exception as e:
+                logger.error(f"Failed to load encoder for namespace {namespace}: {str(e)}")
+                return None
+        return namespace_encoders[namespace]
+
+class LlamaPoolBusy(Exception):
+    """Raised when the Llama queue is full or no worker became free in time"""
+
+class LlamaWorkerPool:
+    """Dispatches generation jobs to idle Llama instances
+
+    Each job checks out one free worker for the duration of its generation, so up to `size`
+    generations run in parallel (llama.cpp releases the GIL while evaluating). Jobs waiting for
+    a worker form a bounded queue; when it is full new jobs are rejected with LlamaPoolBusy
+    instead of piling up behind long generations.
+    """
+
+    def __init__(self, models, max_queue=LLAMA_POOL_MAX_QUEUE, wait_timeout=LLAMA_POOL_WAIT_TIMEOUT):
+        self.size = len(models)
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self._idle = queue.Queue()
+        for worker_id, model in enumerate(models):
+            self._idle.put((worker_id, model))
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._recent_waits = deque(maxlen=500)
+        self.stats = {
+            'jobs': 0,
+            'rejected': 0,
+            'max_queue_depth': 0,
+            'wait_seconds': 0.0,
+            'busy_seconds': [0.0] * self.size
+        }
+
+    @contextmanager
+    def worker(self):
+        """Hold a free Llama instance for one generation job"""
+        with self._lock:
+            if self._waiting >= self.max_queue and self._idle.empty():
+                self.stats['rejected'] += 1
+                raise LlamaPoolBusy(f"Llama queue is full ({self._waiting} jobs waiting)")
+            self._waiting += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._waiting)
+
+        started = time.perf_counter()
+        try:
+            worker_id, model = self._idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise LlamaPoolBusy(f"No Llama worker became free within {self.wait_timeout}s")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.stats['jobs'] += 1
+            self.stats['wait_seconds'] += waited
+            self._recent_waits.append(waited)
+
+        busy_started = time.perf_counter()
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self.stats['busy_seconds'][worker_id] += time.perf_counter() - busy_started
+            self._idle.put((worker_id, model))
+
+    def status(self):
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            percentile = lambda q: round(waits[min(int(q * len(waits)), len(waits) - 1)] * 1000, 1) if waits else 0.0
+            return {
+                'workers': self.size,
+                'idle_workers': self._idle.qsize(),
+                'queue_depth': self._waiting,
+                'max_queue': self.max_queue,
+                'max_queue_depth': self.stats['max_queue_depth'],
+                'jobs': self.stats['jobs'],
+                'rejected': self.stats['rejected'],
+                'mean_wait_ms': round(self.stats['wait_seconds'] / self.stats['jobs'] * 1000, 1) if self.stats['jobs'] else 0.0,
+                'p50_wait_ms': percentile(0.5),
+                'p95_wait_ms': percentile(0.95),
+                'busy_seconds': [round(seconds, 1) for seconds in self.stats['busy_seconds']]
+            }
+
+def llama_threads_per_worker(pool_size=LLAMA_POOL_SIZE, cpu_budget=LLAMA_CPU_BUDGET):
+    """Split the CPU core budget evenly across the pool's workers"""
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    return max(1, cpu_budget // max(1, pool_size))
+
 def load_llama_model():
-    """Load the Llama model for text generation"""
-    global llama_model
+    """Load the Llama worker pool for text generation"""
+    global llama_model, llama_pool
 
     try:
         # Check if model file exists
@@ -60,21 +180,28 @@ def load_llama_model():
             logger.warning("AI Bridge will use rule-based description generation instead")
             return False
 
-        logger.info(f"Loading Llama model from {LLAMA_MODEL_PATH}")
-
-        # Reduced context size for stability on Windows
-        llama_model = Llama(
-            model_path=LLAMA_MODEL_PATH,
-            n_ctx=2048,  # Reduced for stability
-            n_threads=2,  # Reduced threads
-            n_batch=256,  # Smaller batch
-            n_ubatch=256, # Match batch size for stability
-            verbose=False,
-            n_gpu_layers=0,  # Force CPU usage
-            use_mmap=False,  # Disable mmap for Windows stability
-            use_mlock=False, # Disable mlock to avoid memory issues on Windows
-        )
+        n_threads = llama_threads_per_worker()
+        logger.info(f"Loading {LLAMA_POOL_SIZE} Llama worker(s) with {n_threads} threads each from {LLAMA_MODEL_PATH}")
+
+        models = []
+        for _ in range(LLAMA_POOL_SIZE):
+            # Reduced context size for stability on Windows
+            models.append(Llama(
+                model_path=LLAMA_MODEL_PATH,
+                n_ctx=2048,  # Reduced for stability
+                n_threads=n_threads,  # Share of the core budget
+                n_batch=256,  # Smaller batch
+                n_ubatch=256, # Match batch size for stability
+                verbose=False,
+                n_gpu_layers=0,  # Force CPU usage
+                # A single instance keeps mmap off for Windows stability; a pool maps the weights
+                # so every worker shares one copy of them in the page cache
+                use_mmap=LLAMA_POOL_SIZE > 1,
+                use_mlock=False, # Disable mlock to avoid memory issues on Windows
+            ))
 
+        llama_model = models[0]
+        llama_pool = LlamaWorkerPool(models)
         logger.info("Llama model loaded successfully on CPU!")
         return True
 
@@ -88,14 +215,14 @@ def get_llama_model():
     """Get the loaded Llama model (thread-safe)"""
     return llama_model
 
-def get_llama_lock():
-    """Get the Llama thread lock for safe concurrent access"""
-    return llama_lock
+def get_llama_pool():
+    """Get the Llama worker pool (None until the model is loaded)"""
+    return llama_pool
 
 def is_model_loaded():
     """Check if embedding model is loaded"""
     return embedding_model is not None
 
 def is_llama_loaded():
-    """Check if Llama model is loaded"""
-    return llama_model is not None
\ No newline at end of file
+    """Check if the Llama worker pool is loaded"""
+    return llama_pool is not None
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+MinHash/LSH near-duplicate detection over extracted document text
+"""
+import os
+import re
+import zlib
+import sqlite3
+import logging
+import threading
+import numpy as np
+from config import (
+    SEARCH_INDEX_DIR, NEAR_DUPLICATE_NUM_PERM, NEAR_DUPLICATE_BANDS, NEAR_DUPLICATE_SHINGLE_WORDS,
+    NEAR_DUPLICATE_THRESHOLD
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+NEAR_DUPLICATE_INDEX_PATH = os.path.join(SEARCH_INDEX_DIR, 'near_duplicates.sqlite3')
+
+def shingles(text, size=NEAR_DUPLICATE_SHINGLE_WORDS):
+    """Set of overlapping word n-grams, case- and whitespace-insensitive so re-scans still match"""
+    words = _WORD_PATTERN.findall((text or '').lower())
+    if len(words) < size:
+        return set()
+    return {' '.join(words[position:position + size]) for position in range(len(words) - size + 1)}
+
+class MinHasher:
+    """Fixed family of `num_perm` universal hash permutations shared by every signature"""
+
+    def __init__(self, num_perm=NEAR_DUPLICATE_NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """MinHash signature of the text's shingles, or None for text too short to shingle"""
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set),
+                             dtype=np.uint64, count=len(shingle_set))
+        permuted = np.bitwise_and((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0).astype(np.uint32)
+
+class NearDuplicateIndex:
+    """LSH banding over MinHash signatures, persisted next to the search index
+
+    A lookup hashes `bands` slices of the signature into bucket tables, so its cost does not
+    grow with the archive; only colliding documents are compared signature-to-signature.
+    Signatures are stored one SQLite row per document, so registering or removing a document
+    writes that row only. The table is opened on first use rather than at import.
+    """
+
+    def __init__(self, path=NEAR_DUPLICATE_INDEX_PATH, num_perm=NEAR_DUPLICATE_NUM_PERM, bands=NEAR_DUPLICATE_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations cannot be split into {bands} equal bands")
+        self.path = path
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()  # Guards the in-memory signatures and buckets
+        self._db_lock = threading.Lock()  # Serializes use of the SQLite connection
+        self._connection = None
+        self._loaded = False
+        self._signatures = {}  # doc_id -> uint32 signature
+        self._buckets = [{} for _ in range(bands)]  # band -> band bytes -> set of doc_ids
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                for band in range(self.bands)]
+
+    def _insert(self, doc_id, signature):
+        self._remove(doc_id)
+        self._signatures[doc_id] = signature
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        signature = self._signatures.pop(doc_id, None)
+        if signature is None:
+            return False
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            members = bucket.get(key)
+            if members:
+                members.discard(doc_id)
+                if not members:
+                    del bucket[key]
+        return True
+
+    def _ensure_loaded(self):
+        """Open the signature table and build the buckets from it on first use"""
+        if self._loaded:
+            return
+        with self._db_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.execute('PRAGMA synchronous=NORMAL')
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS signatures (doc_id INTEGER PRIMARY KEY, signature BLOB NOT NULL)'
+                )
+                rows = self._connection.execute('SELECT doc_id, signature FROM signatures').fetchall()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Could not open near-duplicate index {self.path}: {str(e)}")
+                self._connection = None
+                return
+            with self._lock:
+                for doc_id, blob in rows:
+                    signature = np.frombuffer(blob, dtype=np.uint32)
+                    if len(signature) == self.hasher.num_perm:
+                        self._insert(int(doc_id), signature)
+            logger.info(f"Loaded {len(self._signatures)} near-duplicate signatures from {self.path}")
+
+    def _persist(self, statement, parameters):
+        """Write one document's row; the in-memory index stays usable if the disk write fails"""
+        if self._connection is None:
+            return
+        with self._db_lock:
+            try:
+                self._connection.execute(statement, parameters)
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist near-duplicate signature: {str(e)}")
+
+    def query_signature(self, signature, threshold=NEAR_DUPLICATE_THRESHOLD, exclude=None):
+        """Documents whose estimated Jaccard similarity to the signature reaches `threshold`"""
+        self._ensure_loaded()
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+            candidates.discard(exclude)
+            matches = []
+            for doc_id in candidates:
+                similarity = float(np.mean(self._signatures[doc_id] == signature))
+                if similarity >= threshold:
+                    matches.append({'doc_id': doc_id, 'similarity': round(similarity, 3)})
+        return sorted(matches, key=lambda match: match['similarity'], reverse=True)
+
+    def check(self, doc_id, text, register=True, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """Near-duplicates of a document's text, optionally adding the document to the index"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return []
+        matches = self.query_signature(signature, threshold, exclude=doc_id)
+        if register and doc_id is not None:
+            with self._lock:
+                self._insert(doc_id, signature)
+            self._persist(
+                'INSERT OR REPLACE INTO signatures (doc_id, signature) VALUES (?, ?)', (doc_id, signature.tobytes())
+            )
+        return matches
+
+    def remove(self, doc_id):
+        self._ensure_loaded()
+        with self._lock:
+            removed = self._remove(doc_id)
+        if removed:
+            self._persist('DELETE FROM signatures WHERE doc_id = ?', (doc_id,))
+        return removed
+
+    def status(self):
+        return {
+            'loaded': self._loaded,
+            'documents': len(self._signatures),
+            'bands': self.bands,
+            'rows_per_band': self.rows_per_band,
+            'threshold': NEAR_DUPLICATE_THRESHOLD
+        }
+
+# Global near-duplicate index instance
+near_duplicate_index = NearDuplicateIndex()
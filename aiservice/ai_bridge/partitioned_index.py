@@ -0,0 +1,309 @@
+"""
+Folder-partitioned vector index with lazy loading and LRU eviction for AI Bridge search
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import SEARCH_PARTITION_DIR, SEARCH_PARTITION_MEMORY_BUDGET_MB, SEARCH_MIN_SIMILARITY
+from search_index import VectorIndex
+from file_utils import write_json_atomic
+from vector_namespaces import store_digest
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _partition_bytes(index):
+    """Approximate resident bytes of a loaded partition, including its text columns"""
+    text_bytes = sum(len(text or '') for text in index.titles) + sum(len(text or '') for text in index.chunk_texts)
+    return index.memory_footprint()['resident_bytes'] + text_bytes
+
+def _rows_digest(records):
+    """Digest of a folder's synced rows, stable across restarts unlike the sync's folder versions"""
+    digest = hashlib.sha1()
+    for record in sorted(records, key=lambda record: record.get('embedding_id') or 0):
+        digest.update(json.dumps([
+            record.get('embedding_id'), record.get('doc_id'), record.get('chunk_index'),
+            record.get('document_title'), record.get('model_namespace')
+        ], default=str).encode('utf-8'))
+        digest.update(np.asarray(record['embedding_vector'], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+# Folders whose rows were all deleted have no partition to compare against
+_EMPTY_ROWS_DIGEST = hashlib.sha1().hexdigest()
+
+class FolderPartitionedIndex:
+    """Per-folder sub-indexes of one namespace, written to disk and loaded on first use
+
+    Each partition is keyed by a digest of its folder's synced rows and of which of them the
+    namespace's bridge-side store holds vectors for, so a partition is rewritten only when its
+    own folder changed. The keys are saved in a manifest next to the partition files, and a
+    restarted bridge reuses every partition whose folder is unchanged. Loaded partitions are
+    kept in least-recently-used order and evicted once their combined size exceeds the memory
+    budget, so resident memory follows the folders queries actually touch.
+    """
+
+    def __init__(self, namespace, directory=None, memory_budget_mb=SEARCH_PARTITION_MEMORY_BUDGET_MB):
+        self.namespace = namespace
+        self.directory = directory or os.path.join(
+            SEARCH_PARTITION_DIR, namespace.replace('/', '_').replace('@', '__v')
+        )
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.resident_bytes = 0
+        self.stats = {'writes': 0, 'loads': 0, 'hits': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # One refresh at a time writes partition files
+        self._partitions = {}  # folder_id -> {'key', 'path', 'rows'} for every partition on disk
+        self._loaded = OrderedDict()  # folder_id -> (index, resident bytes), least recently used first
+        self._keys = {}  # folder_id -> ((folder version, store generation), key) computed by refresh
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self._load_manifest()
+
+    def _path(self, folder_id):
+        return os.path.join(self.directory, f"folder_{'none' if folder_id is None else folder_id}.npz")
+
+    def _load_manifest(self):
+        """Pick up the partitions an earlier run left on disk"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as handle:
+                entries = json.load(handle).get('partitions', [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read search partition manifest {self.manifest_path}: {str(e)}")
+            return
+        for entry in entries:
+            path = self._path(entry['folder_id'])
+            if os.path.exists(path):
+                self._partitions[entry['folder_id']] = {'key': tuple(entry['key']), 'path': path, 'rows': entry['rows']}
+        logger.info(f"Found {len(self._partitions)} search partitions of {self.namespace} on disk")
+
+    def _save_manifest(self):
+        """Record the partitions on disk and their keys (refresh lock held)"""
+        with self._lock:
+            entries = [
+                {'folder_id': folder_id, 'key': list(entry['key']), 'rows': entry['rows']}
+                for folder_id, entry in self._partitions.items()
+            ]
+        try:
+            write_json_atomic(self.manifest_path, {'namespace': self.namespace, 'partitions': entries})
+        except OSError as e:
+            logger.warning(f"Could not save search partition manifest {self.manifest_path}: {str(e)}")
+
+    def folders(self):
+        with self._lock:
+            return list(self._partitions)
+
+    def rows(self, folder_ids):
+        """Chunks stored in the partitions of `folder_ids`"""
+        with self._lock:
+            return sum(self._partitions.get(folder_id, {}).get('rows', 0) for folder_id in folder_ids)
+
+    def refresh(self, embedding_sync, prepare_records=None, folder_ids=None, store=None):
+        """Rewrite the partitions whose folder changed since they were written
+
+        Only `folder_ids` are checked when given. `prepare_records` maps a folder's synced
+        rows to rows carrying this namespace's vectors, and `store` is the namespace's
+        bridge-side vector store, if any. A folder's key is recomputed only when the sync or
+        the store changed since it was last computed. Concurrent refreshes run one after the
+        other and each re-checks what is stale, so a folder is not rewritten twice.
+        """
+        with self._refresh_lock:
+            folder_versions = dict(embedding_sync.folder_versions)
+            wanted = list(folder_versions) if folder_ids is None else [folder_id for folder_id in folder_ids if folder_id in folder_versions]
+            generation = store.generation if store is not None and store.exists() else None
+            outdated = [
+                folder_id for folder_id in wanted
+                if self._keys.get(folder_id, (None,))[0] != (folder_versions[folder_id], generation)
+            ]
+            grouped = embedding_sync.records_by_folder(set(outdated)) if outdated else {}
+            vectors_by_id = store.vectors_by_id() if generation is not None else {}
+            for folder_id in outdated:
+                records = grouped.get(folder_id, [])
+                self._keys[folder_id] = (
+                    (folder_versions[folder_id], generation),
+                    (_rows_digest(records), store_digest(records, vectors_by_id))
+                )
+
+            with self._lock:
+                stale = [
+                    folder_id for folder_id in wanted
+                    if self._partitions.get(folder_id, {}).get('key') != self._keys[folder_id][1]
+                    and (folder_id in self._partitions or self._keys[folder_id][1][0] != _EMPTY_ROWS_DIGEST)
+                ]
+                # Partitions left on disk for folders the mirror no longer has
+                orphaned = [
+                    folder_id for folder_id in self._partitions
+                    if folder_id not in folder_versions
+                ] if folder_ids is None and len(embedding_sync) else []
+            for folder_id in orphaned:
+                self._write_partition(folder_id, None, [])
+            if not stale:
+                if orphaned:
+                    self._save_manifest()
+                return 0
+
+            missing = set(stale) - set(grouped)
+            if missing:
+                grouped.update(embedding_sync.records_by_folder(missing))
+            for folder_id in stale:
+                records = grouped.get(folder_id, [])
+                key = self._keys[folder_id][1]
+                if prepare_records is not None:
+                    prepared = prepare_records(records)
+                    # Rows embedded on the fly were just added to the store
+                    if store is not None and store.exists() and store.generation != generation:
+                        key = (key[0], store_digest(records, store.vectors_by_id()))
+                        self._keys[folder_id] = ((folder_versions[folder_id], store.generation), key)
+                    records = prepared
+                self._write_partition(folder_id, key, records)
+            self._save_manifest()
+            logger.info(f"Rewrote {len(stale)} search partitions for {self.namespace}")
+            return len(stale)
+
+    def _write_partition(self, folder_id, key, records):
+        """Persist one folder's chunks; the loaded copy, if any, is replaced in place"""
+        path = self._path(folder_id)
+        index = VectorIndex.from_records(records)
+        if len(index):
+            os.makedirs(self.directory, exist_ok=True)
+            # A unique temp file, so no other writer (another bridge process) can collide with it
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp.npz')
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    np.savez(
+                        temp_file,
+                        vectors=index.vectors,
+                        embedding_ids=index.embedding_ids,
+                        doc_ids=index.doc_ids,
+                        chunk_indexes=index.chunk_indexes,
+                        titles=np.array(index.titles, dtype=str),
+                        chunk_texts=np.array([text or '' for text in index.chunk_texts], dtype=str)
+                    )
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        elif os.path.exists(path):
+            os.remove(path)
+
+        with self._lock:
+            self.stats['writes'] += 1
+            was_loaded = folder_id in self._loaded
+            if was_loaded:
+                self.resident_bytes -= self._loaded.pop(folder_id)[1]
+            if not len(index):
+                self._partitions.pop(folder_id, None)
+                return
+            self._partitions[folder_id] = {'key': key, 'path': path, 'rows': len(index)}
+            if was_loaded:
+                self._keep_loaded(folder_id, index)
+
+    def _keep_loaded(self, folder_id, index):
+        """Track a loaded partition as most recently used and evict past the budget (lock held)"""
+        size = _partition_bytes(index)
+        self._loaded[folder_id] = (index, size)
+        self.resident_bytes += size
+        # The partition just loaded always stays, even if it alone exceeds the budget
+        while self.resident_bytes > self.memory_budget_bytes and len(self._loaded) > 1:
+            evicted, (_, evicted_size) = self._loaded.popitem(last=False)
+            self.resident_bytes -= evicted_size
+            self.stats['evictions'] += 1
+            logger.debug(f"Evicted search partition {evicted} of {self.namespace}")
+
+    @staticmethod
+    def _load(path):
+        with np.load(path) as stored:
+            return VectorIndex(
+                vectors=stored['vectors'],
+                embedding_ids=stored['embedding_ids'],
+                doc_ids=stored['doc_ids'],
+                chunk_indexes=stored['chunk_indexes'],
+                titles=stored['titles'].tolist(),
+                # Rows saved without text come back as None so their hits are hydrated
+                chunk_texts=[text or None for text in stored['chunk_texts'].tolist()]
+            )
+
+    def partition(self, folder_id):
+        """Loaded sub-index of a folder, read from disk if it is not resident
+
+        The file is read without holding the lock, so loading one partition does not stall
+        searches of the others. If the partition was rewritten while it loaded, it is read again.
+        """
+        while True:
+            with self._lock:
+                if folder_id in self._loaded:
+                    self._loaded.move_to_end(folder_id)
+                    self.stats['hits'] += 1
+                    return self._loaded[folder_id][0]
+                entry = self._partitions.get(folder_id)
+                if entry is None:
+                    return None
+
+            try:
+                index = self._load(entry['path'])
+            except FileNotFoundError:
+                index = None
+
+            with self._lock:
+                if folder_id in self._loaded:
+                    # Another search loaded it meanwhile
+                    self._loaded.move_to_end(folder_id)
+                    return self._loaded[folder_id][0]
+                if self._partitions.get(folder_id) is not entry:
+                    continue
+                if index is None:
+                    return None
+                self.stats['loads'] += 1
+                self._keep_loaded(folder_id, index)
+                return index
+
+    def scope(self, folder_ids=None):
+        """Search view over the partitions of `folder_ids` (every partition when None)"""
+        return PartitionScope(self, folder_ids)
+
+    def status(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                partitions=len(self._partitions),
+                rows=sum(entry['rows'] for entry in self._partitions.values()),
+                loaded_partitions=len(self._loaded),
+                resident_bytes=self.resident_bytes,
+                memory_budget_bytes=self.memory_budget_bytes
+            )
+
+class PartitionScope:
+    """Fans queries out over the partitions of a set of folders and merges their top-k"""
+
+    def __init__(self, partitioned, folder_ids=None):
+        self.partitioned = partitioned
+        known = partitioned.folders()
+        self.folder_ids = known if folder_ids is None else [folder_id for folder_id in folder_ids if folder_id in known]
+
+    def __len__(self):
+        return self.partitioned.rows(self.folder_ids)
+
+    def search(self, query_vector, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        return self.search_batch([query_vector], limit, min_score, top_docs)[0]
+
+    def search_batch(self, query_vectors, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        """Search each partition in turn; every partition's top `limit` covers the merged top `limit`"""
+        merged = [[] for _ in range(len(query_vectors))]
+        for folder_id in self.folder_ids:
+            index = self.partitioned.partition(folder_id)
+            if index is None or not len(index):
+                continue
+            for results, partition_results in zip(merged, index.search_batch(query_vectors, limit, min_score, top_docs)):
+                for result in partition_results:
+                    result['folder_id'] = folder_id
+                results.extend(partition_results)
+        return [
+            sorted(results, key=lambda result: result['similarity_score'], reverse=True)[:limit]
+            for results in merged
+        ]
@@ -0,0 +1,233 @@
+"""
+Quantized vector index with full-precision rescoring for AI Bridge Service
+"""
+import os
+import re
+import glob
+import logging
+import tempfile
+import numpy as np
+from config import SEARCH_INDEX_DIR, SEARCH_MIN_SIMILARITY, SEARCH_RESCORE_CANDIDATES
+from search_index import VectorIndex, normalize_rows, parse_records, top_k_rows
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('int8', 'binary')
+
+# Number of set bits for every byte value, used for Hamming distance on packed sign codes
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Rows scored, quantized or written per block so no second full float32 matrix is built
+_SCAN_BLOCK_ROWS = 16384
+
+QUANTIZED_DIR = os.path.join(SEARCH_INDEX_DIR, 'quantized')
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9.-]', '_', name)
+
+def float_file_path(name, key):
+    """Float vector file of the quantized index of `name` (a namespace) built for `key`
+
+    One file per index version: rebuilding the same version after a restart reuses the
+    file instead of leaving another one behind.
+    """
+    return os.path.join(QUANTIZED_DIR, f"{_slug(name)}__{'_'.join(str(part) for part in key)}.npy")
+
+def remove_float_files(name, keep=()):
+    """Delete the float files of `name` except `keep`; returns how many were removed
+
+    A file still mapped by a reader cannot be deleted on Windows; it stays until the next call.
+    """
+    keep = {os.path.abspath(path) for path in keep if path}
+    removed = 0
+    for path in glob.glob(os.path.join(QUANTIZED_DIR, f"{_slug(name)}__*.npy")):
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            logger.debug(f"Quantized index file {path} still in use: {str(e)}")
+    return removed
+
+def _quantize(vectors, mode):
+    """(codes, scales) of a normalized float matrix, computed block by block"""
+    rows, dimension = vectors.shape
+    if mode == 'int8':
+        # Symmetric per-dimension scale so the largest magnitude maps to 127
+        scales = np.zeros(dimension, dtype=np.float32)
+        for start in range(0, rows, _SCAN_BLOCK_ROWS):
+            np.maximum(scales, np.abs(vectors[start:start + _SCAN_BLOCK_ROWS]).max(axis=0), out=scales)
+        scales = np.where(scales == 0, 1.0, scales / 127.0).astype(np.float32)
+        codes = np.empty((rows, dimension), dtype=np.int8)
+        for start in range(0, rows, _SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _SCAN_BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / scales), -127, 127)
+        return codes, scales
+    if mode == 'binary':
+        codes = np.empty((rows, (dimension + 7) // 8), dtype=np.uint8)
+        for start in range(0, rows, _SCAN_BLOCK_ROWS):
+            block = vectors[start:start + _SCAN_BLOCK_ROWS]
+            codes[start:start + len(block)] = np.packbits(block > 0, axis=1)
+        return codes, None
+    raise ValueError(f"Unsupported quantization mode: {mode}")
+
+class QuantizedVectorIndex(VectorIndex):
+    """Chunk index that scans int8 or 1-bit sign codes and rescores candidates from an mmap'd float file"""
+
+    def __init__(self, codes, mode, scales=None, float_path=None, rescore_candidates=SEARCH_RESCORE_CANDIDATES,
+                 owns_float_file=False, **columns):
+        super().__init__(**columns)
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.codes = codes
+        self.mode = mode
+        self.scales = scales
+        self.float_path = float_path
+        self.rescore_candidates = rescore_candidates
+        self.owns_float_file = owns_float_file
+        self._dimension = self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @classmethod
+    def from_index(cls, index, mode, float_path=None, rescore_candidates=SEARCH_RESCORE_CANDIDATES):
+        """Quantize a VectorIndex, moving its float vectors to a memory-mapped file on disk"""
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        owns_float_file = float_path is None
+        if owns_float_file:
+            os.makedirs(QUANTIZED_DIR, exist_ok=True)
+            handle, float_path = tempfile.mkstemp(prefix='vectors_', suffix='.npy', dir=QUANTIZED_DIR)
+            os.close(handle)
+        blocks = (index.vectors[start:start + _SCAN_BLOCK_ROWS] for start in range(0, len(index), _SCAN_BLOCK_ROWS))
+        columns = {
+            'embedding_ids': index.embedding_ids,
+            'doc_ids': index.doc_ids,
+            'chunk_indexes': index.chunk_indexes,
+            'titles': index.titles,
+            'chunk_texts': index.chunk_texts,
+        }
+        return cls._from_blocks(blocks, (len(index), index.dimension), mode, float_path, rescore_candidates,
+                                owns_float_file, columns)
+
+    @classmethod
+    def from_records(cls, records, mode, float_path, rescore_candidates=SEARCH_RESCORE_CANDIDATES):
+        """Quantize Laravel embedding rows straight into an index whose float file is `float_path`
+
+        The normalized vectors are written to the file block by block and the codes computed
+        from the mapped file, so the build never holds a full float32 matrix in memory. The
+        index owns the file and deletes it on close(). Returns an empty VectorIndex for no rows.
+        """
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        parsed = parse_records(records)
+        if not parsed:
+            return VectorIndex()
+        os.makedirs(os.path.dirname(float_path), exist_ok=True)
+        blocks = (
+            normalize_rows(np.stack([vector for _, vector in parsed[start:start + _SCAN_BLOCK_ROWS]]))
+            for start in range(0, len(parsed), _SCAN_BLOCK_ROWS)
+        )
+        columns = VectorIndex.metadata_columns([record for record, _ in parsed])
+        return cls._from_blocks(blocks, (len(parsed), parsed[0][1].size), mode, float_path, rescore_candidates,
+                                True, columns)
+
+    @classmethod
+    def _from_blocks(cls, blocks, shape, mode, float_path, rescore_candidates, owns_float_file, columns):
+        """Write normalized vector blocks to `float_path`, then quantize from the mapped file"""
+        vectors = np.lib.format.open_memmap(float_path, mode='w+', dtype=np.float32, shape=shape)
+        start = 0
+        for block in blocks:
+            vectors[start:start + len(block)] = block
+            start += len(block)
+        vectors.flush()
+        del vectors
+
+        float_vectors = np.load(float_path, mmap_mode='r')
+        codes, scales = _quantize(float_vectors, mode)
+        return cls(
+            codes=codes,
+            mode=mode,
+            scales=scales,
+            float_path=float_path,
+            rescore_candidates=rescore_candidates,
+            owns_float_file=owns_float_file,
+            vectors=float_vectors,
+            **columns
+        )
+
+    def approximate_scores(self, query):
+        """First-pass scores for one normalized query computed from the quantized codes"""
+        if self.mode == 'binary':
+            query_code = np.packbits(query > 0)
+            hamming = _POPCOUNT[np.bitwise_xor(self.codes, query_code)].sum(axis=1, dtype=np.int32)
+            return -hamming.astype(np.float32)
+
+        scaled_query = query * self.scales
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + _SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return scores
+
+    def search_batch(self, query_vectors, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        """Shortlist candidates from the codes, then rescore them against full-precision vectors"""
+        if not len(self):
+            return [[] for _ in range(len(query_vectors))]
+        if top_docs and top_docs < self.document_count():
+            # Two-stage search already limits the scan to a few documents' rows in the float file
+            return self.search_two_stage(query_vectors, limit, min_score, top_docs)
+        queries = normalize_rows(query_vectors)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query dimension {queries.shape[1]} does not match index dimension {self.dimension}"
+            )
+
+        shortlist = max(limit, self.rescore_candidates)
+        batch_results = []
+        for query in queries:
+            approximate = self.approximate_scores(query)
+            if approximate.size > shortlist:
+                candidates = np.sort(np.argpartition(-approximate, shortlist - 1)[:shortlist])
+            else:
+                candidates = np.arange(approximate.size)
+            exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+            batch_results.append([
+                self.build_result(int(candidates[position]), score)
+                for position, score in top_k_rows(exact, limit, min_score)
+            ])
+        return batch_results
+
+    @property
+    def dimension(self):
+        return self._dimension
+
+    def memory_footprint(self):
+        """Resident bytes for codes and id columns, plus the on-disk float file size"""
+        footprint = super().memory_footprint()
+        footprint['vector_bytes'] = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        footprint['resident_bytes'] = footprint['vector_bytes'] + footprint['id_bytes']
+        footprint['disk_bytes'] = os.path.getsize(self.float_path) if self.float_path and os.path.exists(self.float_path) else 0
+        return footprint
+
+    def close(self):
+        """Unmap the float file and delete it if this index owns it
+
+        Called by the index holder once the last query reading this index has finished. If
+        the file cannot be deleted yet, remove_float_files() retries on the next build.
+        """
+        vectors, self.vectors = self.vectors, np.zeros((0, self._dimension), dtype=np.float32)
+        mapping = getattr(vectors, '_mmap', None)
+        del vectors
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # A view handed out earlier is still alive; the mapping closes when it is collected
+                pass
+        if self.owns_float_file and self.float_path and os.path.exists(self.float_path):
+            try:
+                os.remove(self.float_path)
+            except OSError as e:
+                logger.warning(f"Could not remove quantized index file {self.float_path}: {str(e)}")
+        self.owns_float_file = False
@@ -0,0 +1,103 @@
+"""
+Background re-embedding of the archive into a new vector namespace
+"""
+import time
+import logging
+import threading
+import traceback
+from datetime import datetime
+from config import REEMBED_BATCH_SIZE, REEMBED_MAX_CHUNKS_PER_SECOND, SEARCH_LAZY_CHUNK_TEXT
+from vector_namespaces import namespace_registry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ReembeddingJob(threading.Thread):
+    """Re-embeds every chunk into a target namespace while the active namespace keeps serving
+
+    Progress is checkpointed after each batch, so a stopped or crashed job resumes after the
+    last stored embedding_id. Throughput is capped at `max_chunks_per_second`.
+    """
+
+    def __init__(self, bridge_service, namespace, encoder, headers=None, activate_on_complete=True,
+                 batch_size=REEMBED_BATCH_SIZE, max_chunks_per_second=REEMBED_MAX_CHUNKS_PER_SECOND):
+        super().__init__(name=f"reembed-{namespace}", daemon=True)
+        self.bridge_service = bridge_service
+        self.namespace = namespace
+        self.encoder = encoder
+        self.headers = headers or {}
+        self.activate_on_complete = activate_on_complete
+        self.batch_size = batch_size
+        self.max_chunks_per_second = max_chunks_per_second
+        self.store = namespace_registry.store(namespace)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Ask the job to pause after the current batch"""
+        self._stop_event.set()
+
+    def status(self):
+        return self.store.load_state()
+
+    def run(self):
+        state = self.store.load_state()
+        state.update({
+            'namespace': self.namespace,
+            'status': 'running',
+            'started_at': state.get('started_at') or datetime.now().isoformat(),
+            'error': None
+        })
+        self.store.save_state(state)
+
+        try:
+            self.bridge_service.embedding_sync.sync(headers=self.headers, force=True)
+            records = [
+                record for record in self.bridge_service.embedding_sync.records()
+                if SEARCH_LAZY_CHUNK_TEXT or record.get('chunk_text')
+            ]
+            pending = [record for record in records if record['embedding_id'] > state.get('last_embedding_id', 0)]
+            state['total'] = len(records)
+            logger.info(f"Re-embedding {len(pending)} of {len(records)} chunks into namespace {self.namespace}")
+
+            min_batch_seconds = self.batch_size / self.max_chunks_per_second if self.max_chunks_per_second else 0
+            for start in range(0, len(pending), self.batch_size):
+                if self._stop_event.is_set():
+                    state['status'] = 'paused'
+                    self.store.save_state(state)
+                    logger.info(f"Re-embedding into {self.namespace} paused at embedding_id {state['last_embedding_id']}")
+                    return
+
+                batch_started = time.monotonic()
+                batch = pending[start:start + self.batch_size]
+                if SEARCH_LAZY_CHUNK_TEXT:
+                    texts = self.bridge_service.chunk_texts([record['embedding_id'] for record in batch], headers=self.headers)
+                    batch_texts = [texts.get(record['embedding_id'], '') for record in batch]
+                else:
+                    batch_texts = [record['chunk_text'] for record in batch]
+                vectors = self.encoder.encode(batch_texts, convert_to_tensor=False)
+                self.store.append([record['embedding_id'] for record in batch], vectors)
+
+                state['last_embedding_id'] = batch[-1]['embedding_id']
+                state['processed'] = state.get('processed', 0) + len(batch)
+                state['updated_at'] = datetime.now().isoformat()
+                self.store.save_state(state)
+
+                # Rate limit so live queries and uploads keep most of the CPU
+                elapsed = time.monotonic() - batch_started
+                if elapsed < min_batch_seconds:
+                    self._stop_event.wait(min_batch_seconds - elapsed)
+
+            state['status'] = 'complete'
+            state['completed_at'] = datetime.now().isoformat()
+            self.store.save_state(state)
+            logger.info(f"Re-embedding into namespace {self.namespace} complete")
+
+            if self.activate_on_complete:
+                namespace_registry.activate(self.namespace)
+
+        except Exception as e:
+            logger.error(f"Re-embedding into {self.namespace} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            state['status'] = 'failed'
+            state['error'] = str(e)
+            self.store.save_state(state)
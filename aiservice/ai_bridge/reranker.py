@@ -0,0 +1,160 @@
+"""
+Budgeted cross-encoder re-ranking of semantic search candidates
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from config import RERANK_MODEL_PATH, RERANK_TOP_N, RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class CrossEncoderReranker:
+    """Re-scores the top-N (query, chunk) pairs with a small local cross-encoder in one batch
+
+    Re-ranking is skipped when the predicted cost of the uncached pairs exceeds the latency
+    budget. The budget is a skip-if-predicted-slow threshold, not a time limit: a batch that
+    was predicted to fit runs to completion even if it turns out slower. The model is loaded
+    at startup (load()); until it is, searches are returned in their original order. The
+    prediction is a moving average of observed per-call and per-pair cost. Every
+    skip moves it back towards the initial guesses, so one slow batch (a cold first pass, CPU
+    contention) cannot switch re-ranking off for good: after a few skips a batch runs again
+    and measures the current cost.
+    """
+
+    INITIAL_OVERHEAD_MS = 5.0
+    INITIAL_PER_PAIR_MS = 2.0
+    SKIP_DECAY = 0.8  # Share of the gap to the initial guesses kept after each skipped request
+
+    def __init__(self, model_path=RERANK_MODEL_PATH, top_n=RERANK_TOP_N, budget_ms=RERANK_BUDGET_MS,
+                 cache_size=RERANK_CACHE_SIZE):
+        self.model_path = model_path
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.model = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._overhead_ms = self.INITIAL_OVERHEAD_MS  # Replaced by measurements after the first batch
+        self._per_pair_ms = self.INITIAL_PER_PAIR_MS
+        self.stats = {'reranked': 0, 'skipped_budget': 0, 'cache_hits': 0, 'cache_misses': 0}
+
+    def load(self):
+        """Load the cross-encoder (called once at startup); returns False if it is unavailable"""
+        with self._lock:
+            if self.model is not None or self._load_failed:
+                return self.model is not None
+            if not os.path.exists(self.model_path):
+                logger.warning(f"Cross-encoder not found at {self.model_path}, re-ranking disabled")
+                self._load_failed = True
+                return False
+            try:
+                from sentence_transformers import CrossEncoder
+                logger.info(f"Loading cross-encoder from {self.model_path}")
+                self.model = CrossEncoder(self.model_path)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to load cross-encoder: {str(e)}")
+                self._load_failed = True
+                return False
+
+    def is_loaded(self):
+        return self.model is not None
+
+    def estimate_ms(self, pair_count):
+        """Predicted latency of scoring `pair_count` uncached pairs"""
+        if pair_count == 0:
+            return 0.0
+        return self._overhead_ms + self._per_pair_ms * pair_count
+
+    def _cache_key(self, query, result):
+        chunk = result.get('matched_chunk') or ''
+        if not chunk and result.get('embedding_id') is not None:
+            # Text not hydrated: every such chunk would share sha1('') and each other's scores
+            return (query, 'embedding', result['embedding_id'])
+        return (query, hashlib.sha1(chunk.encode('utf-8')).hexdigest())
+
+    def _record_timing(self, pair_count, elapsed_ms):
+        """Fold an observed batch time into the moving averages"""
+        with self._lock:
+            observed_per_pair = max(elapsed_ms - self._overhead_ms, 0.0) / pair_count
+            self._per_pair_ms = 0.8 * self._per_pair_ms + 0.2 * observed_per_pair
+            if pair_count == 1:
+                self._overhead_ms = 0.8 * self._overhead_ms + 0.2 * max(elapsed_ms - self._per_pair_ms, 0.0)
+
+    def _decay_estimate(self):
+        """Pull the cost estimate back towards the initial guesses after a skipped request"""
+        with self._lock:
+            self._per_pair_ms = self.INITIAL_PER_PAIR_MS + self.SKIP_DECAY * (self._per_pair_ms - self.INITIAL_PER_PAIR_MS)
+            self._overhead_ms = self.INITIAL_OVERHEAD_MS + self.SKIP_DECAY * (self._overhead_ms - self.INITIAL_OVERHEAD_MS)
+
+    def rerank(self, query, results, budget_ms=None):
+        """Re-order the top-N results by cross-encoder score; returns (results, info)
+
+        `budget_ms` (default RERANK_BUDGET_MS) is the largest predicted cost at which the
+        uncached pairs are still scored.
+        """
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        candidates = results[:self.top_n]
+        info = {'applied': False, 'candidates': len(candidates), 'cached': 0, 'elapsed_ms': 0.0}
+
+        if len(candidates) < 2:
+            info['reason'] = 'too_few_candidates'
+            return results, info
+        if not self.is_loaded():
+            info['reason'] = 'model_unavailable'
+            return results, info
+
+        started = time.perf_counter()
+        keys = [self._cache_key(query, result) for result in candidates]
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+        missing = [position for position, score in enumerate(scores) if score is None]
+        info['cached'] = len(candidates) - len(missing)
+
+        estimate_ms = self.estimate_ms(len(missing))
+        if estimate_ms > budget_ms:
+            self.stats['skipped_budget'] += 1
+            self._decay_estimate()
+            info.update({'reason': 'over_budget', 'estimated_ms': round(estimate_ms, 1)})
+            return results, info
+
+        if missing:
+            pairs = [(query, candidates[position].get('matched_chunk', '')) for position in missing]
+            batch_started = time.perf_counter()
+            predicted = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            self._record_timing(len(pairs), (time.perf_counter() - batch_started) * 1000)
+
+            with self._lock:
+                for position, score in zip(missing, predicted):
+                    scores[position] = float(score)
+                    self._cache[keys[position]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        self.stats['cache_hits'] += info['cached']
+        self.stats['cache_misses'] += len(missing)
+        self.stats['reranked'] += 1
+
+        reranked = [dict(result, rerank_score=score) for result, score in zip(candidates, scores)]
+        reranked.sort(key=lambda result: result['rerank_score'], reverse=True)
+        info.update({'applied': True, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)})
+        return reranked + results[self.top_n:], info
+
+    def status(self):
+        return dict(
+            self.stats,
+            model_loaded=self.is_loaded(),
+            cache_entries=len(self._cache),
+            estimated_ms_per_pair=round(self._per_pair_ms, 2)
+        )
+
+# Global re-ranker instance
+reranker = CrossEncoderReranker()
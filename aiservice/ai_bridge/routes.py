@@ -2,23 +2,109 @@
 Flask routes for AI Bridge Service
 """
 import os
+import re
+import math
+import time
 import logging
 import traceback
 from datetime import datetime
 from flask import Flask, request, jsonify
-from config import LARAVEL_BASE_URL, EMBEDDING_MODEL_PATH, FALLBACK_MODEL_PATH
-from model_loader import get_embedding_model, is_model_loaded, is_llama_loaded
-from ai_service import AIBridgeService
+from config import (
+    LARAVEL_BASE_URL, EMBEDDING_MODEL_PATH, FALLBACK_MODEL_PATH,
+    SEARCH_DEFAULT_LIMIT, SEARCH_BATCH_MAX_QUERIES, SEARCH_MODE, SEARCH_TWO_STAGE_TOP_DOCS,
+    RERANK_ENABLED, RERANK_TOP_N,
+    SUGGEST_DEFAULT_LIMIT, SUGGEST_SELECT_WEIGHT, SUGGEST_SEARCH_HIT_WEIGHT,
+    NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_REUSE_THRESHOLD, SEARCH_SNAPSHOT_PATH,
+    SEARCH_PARTITION_BY_FOLDER, SEARCH_INDEX_DIR
+)
+from model_loader import is_model_loaded, is_llama_loaded, get_llama_pool, get_namespace_encoder
+from ai_service import AIBridgeService, document_features
+from analysis_jobs import AnalysisJobQueue, AnalysisQueueFull, run_document_analysis
+from reembed_job import ReembeddingJob
+from folder_clustering import FolderClusteringJob, load_cluster_report
+from reranker import reranker
+from suggest_index import suggestion_index
+from near_duplicates import near_duplicate_index
+from llama_prefix_cache import llama_prefix_cache
+from excerpt_selector import excerpt_selector
+from analysis_cache import analysis_cache
+from groq_client import groq_client
+from vector_namespaces import namespace_registry, model_name_of
+from search_snapshot import export_snapshot
+from dedup_index import DeduplicatedVectorIndex
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+SEARCH_MODES = ('flat', 'two_stage')
+
+def parse_folder_ids(raw_folder_ids):
+    """Validate an optional folder scope; null stands for documents outside any folder"""
+    if raw_folder_ids is None:
+        return None
+    if not isinstance(raw_folder_ids, list) or not all(
+        folder_id is None or (isinstance(folder_id, int) and not isinstance(folder_id, bool))
+        for folder_id in raw_folder_ids
+    ):
+        raise ValueError('folder_ids must be a list of folder ids')
+    return raw_folder_ids
+
+def parse_top_docs(raw_top_docs, search_mode):
+    """Documents scored in two-stage mode (None in flat mode); at least one"""
+    if search_mode != 'two_stage':
+        return None
+    if raw_top_docs is None:
+        return SEARCH_TWO_STAGE_TOP_DOCS
+    if isinstance(raw_top_docs, bool) or not isinstance(raw_top_docs, (int, str)):
+        raise ValueError('top_docs must be a positive integer')
+    try:
+        top_docs = int(raw_top_docs)
+    except ValueError:
+        raise ValueError('top_docs must be a positive integer')
+    if top_docs < 1:
+        raise ValueError('top_docs must be a positive integer')
+    return top_docs
+
+def parse_rerank_budget(raw_budget_ms):
+    """Optional re-ranking budget in milliseconds: a non-negative number"""
+    if raw_budget_ms is None:
+        return None
+    if (isinstance(raw_budget_ms, bool) or not isinstance(raw_budget_ms, (int, float))
+            or not math.isfinite(raw_budget_ms) or raw_budget_ms < 0):
+        raise ValueError('rerank_budget_ms must be a non-negative number')
+    return float(raw_budget_ms)
+
+SNAPSHOT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*\.bin$')
+
+def snapshot_path(raw_name):
+    """Snapshot file for an optional bare file name, always inside SEARCH_INDEX_DIR"""
+    if raw_name is None:
+        return SEARCH_SNAPSHOT_PATH
+    if not isinstance(raw_name, str) or not SNAPSHOT_NAME_PATTERN.match(raw_name):
+        raise ValueError('name must be a bare file name ending in .bin')
+    return os.path.join(SEARCH_INDEX_DIR, raw_name)
+
 def register_routes(app):
     """Register all routes with the Flask app"""
     
     # Initialize the bridge service
     bridge_service = AIBridgeService()
 
+    # Queued document analyses processed off the request threads
+    analysis_jobs = AnalysisJobQueue(bridge_service)
+
+    # Background re-embedding job (at most one at a time)
+    reembed_jobs = {}
+
+    # Background folder clustering job (at most one at a time)
+    cluster_jobs = {}
+
+    def scoped_search_index(headers, namespace, folder_ids):
+        """Folder partitions for scoped (or partition-mode) searches, else the whole-namespace index"""
+        if folder_ids is not None or SEARCH_PARTITION_BY_FOLDER:
+            return bridge_service.folder_search_index(headers=headers, namespace=namespace, folder_ids=folder_ids)
+        return bridge_service.search_index(headers=headers, namespace=namespace)
+
     @app.route('/health', methods=['GET'])
     def health_check():
         """Health check for the AI bridge service"""
@@ -30,6 +116,20 @@ def register_routes(app):
             'model_path': EMBEDDING_MODEL_PATH if os.path.exists(EMBEDDING_MODEL_PATH) else FALLBACK_MODEL_PATH,
             'laravel_url': LARAVEL_BASE_URL,
             'description_method': 'llama' if is_llama_loaded() else 'rule_based',
+            'search_namespace': namespace_registry.active_namespace,
+            'search_sync': bridge_service.embedding_sync.status(),
+            'reranker': reranker.status(),
+            'near_duplicates': near_duplicate_index.status(),
+            'llama_pool': get_llama_pool().status() if get_llama_pool() else None,
+            'llama_prefix_cache': llama_prefix_cache.status(),
+            'search_indexes': bridge_service.search_index_status(),
+            'background_refresh': bridge_service.background_refresh_status(),
+            'folder_classifier': bridge_service.folder_classifier.status(),
+            'document_features': document_features.status(),
+            'excerpts': excerpt_selector.status(),
+            'analysis_jobs': analysis_jobs.status(),
+            'analysis_cache': analysis_cache.status(),
+            'groq_client': groq_client.status(),
             'timestamp': datetime.now().isoformat()
         })
 
@@ -140,8 +240,7 @@ def register_routes(app):
                     'message': 'Insufficient content extracted from document embeddings. Please ensure embeddings were generated properly.'
                 }), 400
             
-            content_analysis = bridge_service.analyze_document_content(extracted_text)
-            suggestions = bridge_service.suggest_category_and_folder(extracted_text, categories, folders)
+            content_analysis, suggestions = bridge_service.analyze_document(extracted_text, categories, folders, doc_id=doc_id)
             
             # Find original file in D:\legal_office
             storage_base = 'D:/legal_office'
@@ -221,6 +320,7 @@ def register_routes(app):
             
             if update_response['success']:
                 logger.info(f"Document {doc_id} successfully processed with AI - moved to appropriate folder")
+                suggestion_index.update_document(int(doc_id), content_analysis['suggested_title'])
                 
                 return jsonify({
                     'success': True,
@@ -264,93 +364,165 @@ def register_routes(app):
                     'success': False,
                     'message': 'Document ID is required'
                 }), 400
-            
-            # Get document text - either from request or fetch from Laravel
-            extracted_text = data.get('documentText', '')
-            
-            # Get available folders from request payload (avoids circular callback)
-            folders = data.get('folders', [])
-
-            # Only fetch document info from Laravel if we don't have the text AND it wasn't provided
-            # This logic should be kept minimal to avoid deadlocks
-            if not extracted_text:
-                auth_header = request.headers.get('Authorization')
-                headers = {'Authorization': auth_header} if auth_header else {}
-                
-                # Fallback: Get document text from Laravel if not provided
-                logger.info(f"Getting document text for document ID {doc_id}")
-                text_response = bridge_service.call_laravel_api(f'/documents/{doc_id}/text', headers=headers)
-                
-                if text_response['success'] and text_response.get('data'):
-                    response_data = text_response['data']
-                    # Handle nested data structure
-                    if isinstance(response_data, dict) and 'data' in response_data:
-                        extracted_text = response_data['data'].get('text', '')
-                    else:
-                        extracted_text = response_data.get('text', '')
 
-            logger.info(f"Got document text: {len(extracted_text)} characters")
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
 
-            # If no text available, return error
-            if not extracted_text or len(extracted_text.strip()) < 50:
-                logger.error(f"No text content available for doc_id {doc_id}.")
+            # Document text and folders come in the payload (avoids circular callbacks to Laravel)
+            analysis_result = run_document_analysis(
+                bridge_service, doc_id, data.get('documentText', ''), data.get('folders', []), headers=headers
+            )
+
+            logger.info(f"AI Bridge analysis completed for doc_id {doc_id}")
+
+            return jsonify(analysis_result)
+
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Document analysis error: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Document analysis failed: {str(e)}'
+            }), 500
+
+    @app.route('/api/documents/analyze/jobs', methods=['POST'])
+    def submit_analysis_job():
+        """Queue a document analysis and return its job id without waiting for the LLM"""
+        try:
+            data = request.get_json() or {}
+            doc_id = data.get('docId')
+
+            if not doc_id:
                 return jsonify({
                     'success': False,
-                    'message': 'Document text not available.'
+                    'message': 'Document ID is required'
                 }), 400
-            
-            # Categories are removed as per requirement, passing empty list
-            categories = []
 
-            # If folders weren't passed (old behavior), try to fetch them (careful of deadlock if single threaded)
-            if not folders:
-                logger.warning("Folders not provided in payload, attempting to fetch (risk of deadlock)")
-                folders_response = bridge_service.call_laravel_api('/ai/folders/public')
-                if folders_response.get('success') and folders_response.get('data'):
-                    laravel_data = folders_response.get('data')
-                    if isinstance(laravel_data, dict) and 'data' in laravel_data:
-                        folders = laravel_data['data']
-                    elif isinstance(laravel_data, list):
-                        folders = laravel_data
-
-            logger.info(f"Analyzing with {len(folders)} folders")
-            
-            # Analyze document content - simple and clean like Groq
-            content_analysis = bridge_service.analyze_document_content(extracted_text)
+            callback = data.get('callback')
+            if callback is not None and (not isinstance(callback, str) or not callback.startswith('/')):
+                return jsonify({
+                    'success': False,
+                    'message': 'callback must be a Laravel API path such as /ai/analysis-results'
+                }), 400
 
-            # Get AI suggestions for folder only (categories ignored)
-            suggestions = bridge_service.suggest_category_and_folder(extracted_text, categories, folders)
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
 
-            # Extract folder name from suggestions
-            suggested_folder_name = None
-            if suggestions['suggested_folder']:
-                if isinstance(suggestions['suggested_folder'], dict):
-                    suggested_folder_name = suggestions['suggested_folder'].get('folder_name')
-                else:
-                     suggested_folder_name = suggestions['suggested_folder']
+            job_id = analysis_jobs.submit(
+                doc_id, data.get('documentText', ''), data.get('folders', []), headers=headers, callback=callback
+            )
 
-            # Return result (clean format)
-            analysis_result = {
-                'title': content_analysis['suggested_title'],
-                'description': content_analysis['suggested_description'],
-                'remarks': content_analysis['ai_remarks'],
-                'suggested_folder': suggested_folder_name,
-                'category': None,
-                'document_type': None,
-            }
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': analysis_jobs.get(job_id)
+            }), 202
 
-            logger.info(f"AI Bridge analysis completed for doc_id {doc_id}")
+        except AnalysisQueueFull as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 503
+        except Exception as e:
+            logger.error(f"Failed to queue document analysis: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Failed to queue document analysis: {str(e)}'
+            }), 500
 
-            return jsonify(analysis_result)
-            
+    @app.route('/api/documents/analyze/jobs/<job_id>', methods=['GET'])
+    def get_analysis_job(job_id):
+        """State, progress and, once completed, the result of an analysis job"""
+        job = analysis_jobs.get(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'message': f'Analysis job {job_id} not found or expired'
+            }), 404
+        return jsonify({
+            'success': True,
+            'job': job
+        })
+
+    @app.route('/api/documents/analyze/cache', methods=['GET'])
+    def get_analysis_cache():
+        """Hit/miss counters and size of the persistent analysis cache"""
+        return jsonify({
+            'success': True,
+            'cache': analysis_cache.status()
+        })
+
+    @app.route('/api/documents/analyze/cache', methods=['DELETE'])
+    def clear_analysis_cache():
+        """Drop cached analyses, optionally only those of one model id"""
+        try:
+            removed = analysis_cache.clear(model_id=request.args.get('model_id'))
+            return jsonify({
+                'success': True,
+                'removed': removed
+            })
         except Exception as e:
-            logger.error(f"Document analysis error: {str(e)}")
+            logger.error(f"Failed to clear analysis cache: {str(e)}")
+            return jsonify({
+                'success': False,
+                'message': f'Failed to clear analysis cache: {str(e)}'
+            }), 500
+
+    @app.route('/api/documents/near-duplicates', methods=['POST'])
+    def find_near_duplicates():
+        """Flag earlier documents whose extracted text nearly matches a newly ingested one"""
+        try:
+            data = request.get_json() or {}
+            doc_id = data.get('docId')
+            text = data.get('documentText', '')
+            register = data.get('register', True)
+            threshold = float(data.get('threshold', NEAR_DUPLICATE_THRESHOLD))
+
+            if not text:
+                return jsonify({
+                    'success': False,
+                    'message': 'documentText is required'
+                }), 400
+
+            started = time.perf_counter()
+            duplicates = near_duplicate_index.check(
+                int(doc_id) if doc_id else None, text, register=register, threshold=threshold
+            )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            # The closest match is safe to copy analysis and embeddings from only when nearly identical
+            reusable = [match for match in duplicates if match['similarity'] >= NEAR_DUPLICATE_REUSE_THRESHOLD]
+            if duplicates:
+                logger.info(f"Document {doc_id} is a near-duplicate of {[match['doc_id'] for match in duplicates]}")
+
+            return jsonify({
+                'success': True,
+                'doc_id': doc_id,
+                'duplicates': duplicates,
+                'reusable_doc_id': reusable[0]['doc_id'] if reusable else None,
+                'elapsed_ms': round(elapsed_ms, 2)
+            })
+
+        except Exception as e:
+            logger.error(f"Near-duplicate check error: {str(e)}")
             logger.error(traceback.format_exc())
             return jsonify({
                 'success': False,
-                'message': f'Document analysis failed: {str(e)}'
+                'message': f'Near-duplicate check failed: {str(e)}'
             }), 500
 
+    @app.route('/api/documents/near-duplicates/<int:doc_id>', methods=['DELETE'])
+    def forget_near_duplicate(doc_id):
+        """Drop a deleted document's signature so it is no longer offered for reuse"""
+        removed = near_duplicate_index.remove(doc_id)
+        return jsonify({'success': True, 'removed': removed})
+
     @app.route('/api/documents/similarity', methods=['POST'])
     def calculate_document_similarity():
         """Calculate similarity between documents using BERT embeddings"""
@@ -397,8 +569,12 @@ def register_routes(app):
         try:
             data = request.get_json()
             query = data.get('query', '')
-            limit = data.get('limit', 10)
+            limit = data.get('limit', SEARCH_DEFAULT_LIMIT)
             user_id = data.get('user_id')
+            requested_namespace = data.get('namespace')
+            search_mode = data.get('mode', SEARCH_MODE)
+            rerank = data.get('rerank', RERANK_ENABLED)
+            folder_ids = data.get('folder_ids')
 
             if not query:
                 return jsonify({
@@ -406,94 +582,472 @@ def register_routes(app):
                     'message': 'Search query is required'
                 }), 400
 
-            logger.info(f"Semantic search query: '{query}' for user {user_id}")
+            try:
+                namespace = namespace_registry.resolve(requested_namespace)
+                folder_ids = parse_folder_ids(folder_ids)
+                top_docs = parse_top_docs(data.get('top_docs'), search_mode)
+                rerank_budget_ms = parse_rerank_budget(data.get('rerank_budget_ms'))
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+
+            if search_mode not in SEARCH_MODES:
+                return jsonify({
+                    'success': False,
+                    'message': f"Search mode must be one of: {', '.join(SEARCH_MODES)}"
+                }), 400
+
+            logger.info(f"Semantic search query: '{query}' for user {user_id} in namespace {namespace}")
 
             # Get authentication header
             auth_header = request.headers.get('Authorization')
             headers = {'Authorization': auth_header} if auth_header else {}
 
-            # Get all document embeddings from Laravel
-            embeddings_response = bridge_service.call_laravel_api('/document-embeddings/all', headers=headers)
+            if not get_namespace_encoder(namespace):
+                return jsonify({
+                    'success': False,
+                    'message': f'Embedding model for namespace {namespace} not loaded'
+                }), 503
+
+            # Read the folder partitions the query is scoped to, or the namespace's published chunk index
+            with scoped_search_index(headers, namespace, folder_ids) as search_index:
+                results = []
+                rerank_info = None
+                if len(search_index):
+                    query_embedding = bridge_service.encode_queries([query], namespace=namespace)[0]
+                    candidate_limit = max(limit, RERANK_TOP_N) if rerank else limit
+                    results = search_index.search(query_embedding, limit=candidate_limit, top_docs=top_docs)
+                    # Only the candidates get their chunk text, and the reranker needs it
+                    hydrated = bridge_service.hydrate_results(results, headers=headers)
+                    if rerank and not hydrated:
+                        # Scoring missing texts as empty strings would rank those hits last
+                        rerank_info = {
+                            'applied': False, 'candidates': min(len(results), RERANK_TOP_N), 'cached': 0,
+                            'elapsed_ms': 0.0, 'reason': 'chunk_text_unavailable'
+                        }
+                    elif rerank:
+                        results, rerank_info = reranker.rerank(query, results, budget_ms=rerank_budget_ms)
+                    results = results[:limit]
+                    for doc_id in {result['doc_id'] for result in results}:
+                        suggestion_index.record_hit(doc_id, SUGGEST_SEARCH_HIT_WEIGHT)
+
+            logger.info(f"Semantic search found {len(results)} results for query: '{query}'")
+
+            return jsonify({
+                'success': True,
+                'query': query,
+                'results': results,
+                'total_results': len(results),
+                'search_method': 'semantic_similarity',
+                'search_mode': search_mode,
+                'rerank': rerank_info,
+                'model_used': model_name_of(namespace),
+                'namespace': namespace
+            })
+
+        except Exception as e:
+            logger.error(f"Semantic search error: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Semantic search failed: {str(e)}'
+            }), 500
+
+    @app.route('/api/documents/suggest', methods=['GET'])
+    def suggest_documents():
+        """Typeahead completions for a partially typed title, name or reference"""
+        started = time.perf_counter()
+        try:
+            prefix = request.args.get('q', '')
+            limit = request.args.get('limit', SUGGEST_DEFAULT_LIMIT, type=int)
+
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+            index = bridge_service.refresh_suggestions(headers=headers)
+            suggestions = index.suggest(prefix, limit=limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            return jsonify({
+                'success': True,
+                'query': prefix,
+                'suggestions': suggestions,
+                'indexed_documents': len(index),
+                'elapsed_ms': round(elapsed_ms, 3)
+            })
+
+        except Exception as e:
+            logger.error(f"Suggestion lookup error: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Suggestion lookup failed: {str(e)}'
+            }), 500
+
+    @app.route('/api/documents/suggest/select', methods=['POST'])
+    def select_suggestion():
+        """Record that a suggestion was picked so the document ranks higher next time"""
+        data = request.get_json() or {}
+        doc_id = data.get('doc_id')
+        if not doc_id:
+            return jsonify({
+                'success': False,
+                'message': 'doc_id is required'
+            }), 400
+        suggestion_index.record_hit(int(doc_id), SUGGEST_SELECT_WEIGHT)
+        return jsonify({'success': True})
+
+    @app.route('/api/documents/search/batch', methods=['POST'])
+    def semantic_search_batch():
+        """Run several semantic searches with one encode call and one matrix product"""
+        try:
+            data = request.get_json() or {}
+            queries = data.get('queries', [])
+            limit = data.get('limit', SEARCH_DEFAULT_LIMIT)
+            user_id = data.get('user_id')
+            requested_namespace = data.get('namespace')
+            search_mode = data.get('mode', SEARCH_MODE)
+            folder_ids = data.get('folder_ids')
+
+            if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+                return jsonify({
+                    'success': False,
+                    'message': 'A non-empty list of search queries is required'
+                }), 400
+
+            if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+                return jsonify({
+                    'success': False,
+                    'message': f'At most {SEARCH_BATCH_MAX_QUERIES} queries are allowed per batch'
+                }), 400
+
+            try:
+                namespace = namespace_registry.resolve(requested_namespace)
+                folder_ids = parse_folder_ids(folder_ids)
+                top_docs = parse_top_docs(data.get('top_docs'), search_mode)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+
+            if search_mode not in SEARCH_MODES:
+                return jsonify({
+                    'success': False,
+                    'message': f"Search mode must be one of: {', '.join(SEARCH_MODES)}"
+                }), 400
+
+            logger.info(f"Batch semantic search with {len(queries)} queries for user {user_id} in namespace {namespace}")
+
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+
+            if not get_namespace_encoder(namespace):
+                return jsonify({
+                    'success': False,
+                    'message': f'Embedding model for namespace {namespace} not loaded'
+                }), 503
+
+            with scoped_search_index(headers, namespace, folder_ids) as search_index:
+                if len(search_index):
+                    query_embeddings = bridge_service.encode_queries(queries, namespace=namespace)
+                    batch_results = search_index.search_batch(query_embeddings, limit=limit, top_docs=top_docs)
+                    bridge_service.hydrate_results(
+                        [result for results in batch_results for result in results], headers=headers
+                    )
+                else:
+                    batch_results = [[] for _ in queries]
+
+            return jsonify({
+                'success': True,
+                'results': [
+                    {
+                        'query': query,
+                        'results': results,
+                        'total_results': len(results)
+                    }
+                    for query, results in zip(queries, batch_results)
+                ],
+                'total_queries': len(queries),
+                'search_method': 'semantic_similarity',
+                'search_mode': search_mode,
+                'model_used': model_name_of(namespace),
+                'namespace': namespace
+            })
+
+        except Exception as e:
+            logger.error(f"Batch semantic search error: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Batch semantic search failed: {str(e)}'
+            }), 500
+
+    @app.route('/api/search/namespaces', methods=['GET'])
+    def list_namespaces():
+        """List embedding namespaces, the active one and re-embedding progress"""
+        return jsonify(dict(namespace_registry.describe(), success=True))
 
-            if not embeddings_response['success'] or not embeddings_response.get('data'):
-                logger.warning("No embeddings found in database")
+    @app.route('/api/search/namespaces/activate', methods=['POST'])
+    def activate_namespace():
+        """Switch the namespace that serves search queries"""
+        try:
+            data = request.get_json() or {}
+            namespace = namespace_registry.resolve(data.get('namespace'))
+            previous = namespace_registry.activate(namespace)
+            return jsonify({
+                'success': True,
+                'active_namespace': namespace,
+                'previous_namespace': previous
+            })
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+    @app.route('/api/search/namespaces/reembed', methods=['POST'])
+    def start_reembedding():
+        """Start or resume a background re-embedding job into a namespace"""
+        try:
+            data = request.get_json() or {}
+            namespace = namespace_registry.resolve(data.get('namespace'))
+
+            running = reembed_jobs.get('current')
+            if running and running.is_alive():
                 return jsonify({
-                    'success': True,
-                    'query': query,
-                    'results': [],
-                    'total_results': 0,
-                    'search_method': 'semantic_similarity',
-                    'model_used': 'legal-bert-base-uncased'
-                })
+                    'success': False,
+                    'message': f'Re-embedding into {running.namespace} is already running',
+                    'status': running.status()
+                }), 409
 
-            # Generate embedding for the query
-            embedding_model = get_embedding_model()
-            if not embedding_model:
+            encoder = get_namespace_encoder(namespace)
+            if not encoder:
                 return jsonify({
                     'success': False,
-                    'message': 'Embedding model not loaded'
+                    'message': f'Embedding model for namespace {namespace} not loaded'
                 }), 503
 
-            query_embedding = embedding_model.encode([query], convert_to_tensor=False)[0]
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+
+            job_options = {}
+            if data.get('max_chunks_per_second'):
+                job_options['max_chunks_per_second'] = float(data['max_chunks_per_second'])
+            job = ReembeddingJob(
+                bridge_service,
+                namespace,
+                encoder,
+                headers=headers,
+                activate_on_complete=data.get('activate_on_complete', True),
+                **job_options
+            )
+            reembed_jobs['current'] = job
+            job.start()
+
+            return jsonify({
+                'success': True,
+                'message': f'Re-embedding into {namespace} started',
+                'active_namespace': namespace_registry.active_namespace,
+                'status': job.status()
+            }), 202
+
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Failed to start re-embedding: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Failed to start re-embedding: {str(e)}'
+            }), 500
+
+    @app.route('/api/search/namespaces/reembed', methods=['DELETE'])
+    def stop_reembedding():
+        """Pause the running re-embedding job; it resumes from its checkpoint when restarted"""
+        job = reembed_jobs.get('current')
+        if not job or not job.is_alive():
+            return jsonify({
+                'success': False,
+                'message': 'No re-embedding job is running'
+            }), 404
+        job.stop()
+        return jsonify({
+            'success': True,
+            'message': f'Re-embedding into {job.namespace} will pause after the current batch'
+        })
+
+    @app.route('/api/search/clusters', methods=['POST'])
+    def start_folder_clustering():
+        """Start an offline clustering of all documents to review folder organization"""
+        try:
+            data = request.get_json() or {}
+            namespace = namespace_registry.resolve(data.get('namespace'))
 
-            # Calculate cosine similarity with all document chunks
-            import numpy as np
-            from numpy.linalg import norm
+            running = cluster_jobs.get('current')
+            if running and running.is_alive():
+                return jsonify({
+                    'success': False,
+                    'message': 'Folder clustering is already running',
+                    'status': running.status()
+                }), 409
 
-            results = []
-            embeddings_data = embeddings_response['data']
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
 
-            for embedding_record in embeddings_data:
-                if not isinstance(embedding_record, dict):
-                    continue
+            n_clusters = int(data['n_clusters']) if data.get('n_clusters') else None
+            job = FolderClusteringJob(bridge_service, namespace, headers=headers, n_clusters=n_clusters)
+            cluster_jobs['current'] = job
+            job.start()
 
-                chunk_embedding = embedding_record.get('embedding_vector')
-                if not chunk_embedding:
-                    continue
+            return jsonify({
+                'success': True,
+                'message': f'Folder clustering over {namespace} started',
+                'status': job.status()
+            }), 202
 
-                # Convert to numpy array if it's a list
-                if isinstance(chunk_embedding, list):
-                    chunk_embedding = np.array(chunk_embedding)
-                elif isinstance(chunk_embedding, str):
-                    # Handle JSON string
-                    import json
-                    chunk_embedding = np.array(json.loads(chunk_embedding))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Failed to start folder clustering: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Failed to start folder clustering: {str(e)}'
+            }), 500
 
-                # Calculate cosine similarity
-                similarity = np.dot(query_embedding, chunk_embedding) / (norm(query_embedding) * norm(chunk_embedding))
+    @app.route('/api/search/clusters', methods=['GET'])
+    def get_folder_clusters():
+        """Latest clustering report with cross-folder clusters and bulk folder suggestions"""
+        job = cluster_jobs.get('current')
+        return jsonify({
+            'success': True,
+            'status': job.status() if job else None,
+            'report': load_cluster_report()
+        })
 
-                # Only include results with similarity > 0.3 (threshold)
-                if similarity > 0.3:
-                    results.append({
-                        'doc_id': embedding_record.get('doc_id'),
-                        'title': embedding_record.get('document_title', 'Unknown Document'),
-                        'similarity_score': float(similarity),
-                        'matched_chunk': embedding_record.get('chunk_text', ''),
-                        'chunk_index': embedding_record.get('chunk_index', 0),
-                        'embedding_id': embedding_record.get('embedding_id')
-                    })
+    @app.route('/api/search/dedup-report', methods=['GET'])
+    def search_dedup_report():
+        """Memory and scan work that chunk deduplication saves on the current archive"""
+        try:
+            namespace = namespace_registry.resolve(request.args.get('namespace'))
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+
+            with bridge_service.search_index(headers=headers, namespace=namespace) as search_index:
+                if not isinstance(search_index, DeduplicatedVectorIndex):
+                    search_index = DeduplicatedVectorIndex.from_index(search_index)
+                report = search_index.dedup_report(top_repeated=request.args.get('top', 10, type=int))
+            return jsonify({
+                'success': True,
+                'namespace': namespace,
+                'report': report
+            })
 
-            # Sort by similarity score (descending)
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Dedup report failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Dedup report failed: {str(e)}'
+            }), 500
 
-            # Limit results
-            results = results[:limit]
+    @app.route('/api/search/snapshot/export', methods=['POST'])
+    def export_search_snapshot():
+        """Write the synced embeddings, sync cursor and typeahead state to one snapshot file"""
+        try:
+            data = request.get_json(silent=True) or {}
+            path = snapshot_path(data.get('name'))
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
 
-            logger.info(f"Semantic search found {len(results)} results for query: '{query}'")
+            # Catch up first so the snapshot's cursor is as fresh as possible
+            bridge_service.embedding_sync.sync(headers=headers, force=True)
+            info = export_snapshot(bridge_service.embedding_sync, path, suggestion_index)
+            return jsonify({'success': True, 'snapshot': info})
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Search snapshot export failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Search snapshot export failed: {str(e)}'
+            }), 500
 
+    @app.route('/api/search/snapshot/import', methods=['POST'])
+    def import_search_snapshot():
+        """Replace the synced embeddings with a snapshot, then pull the changes made since it was taken"""
+        try:
+            data = request.get_json(silent=True) or {}
+            try:
+                path = snapshot_path(data.get('name'))
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            if not os.path.exists(path):
+                return jsonify({
+                    'success': False,
+                    'message': f'Snapshot not found: {path}'
+                }), 404
+
+            info = bridge_service.load_search_snapshot(path)
+            if info is None:
+                return jsonify({
+                    'success': False,
+                    'message': f'Snapshot could not be read: {path}'
+                }), 400
+
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+            stats = bridge_service.embedding_sync.sync(headers=headers, force=True)
             return jsonify({
                 'success': True,
-                'query': query,
-                'results': results,
-                'total_results': len(results),
-                'search_method': 'semantic_similarity',
-                'model_used': 'legal-bert-base-uncased'
+                'snapshot': info,
+                'catch_up': stats,
+                'status': bridge_service.embedding_sync.status()
             })
+        except Exception as e:
+            logger.error(f"Search snapshot import failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            return jsonify({
+                'success': False,
+                'message': f'Search snapshot import failed: {str(e)}'
+            }), 500
 
+    @app.route('/api/search/sync', methods=['POST'])
+    def sync_search_embeddings():
+        """Pull embedding changes from Laravel now instead of waiting for the next search"""
+        try:
+            auth_header = request.headers.get('Authorization')
+            headers = {'Authorization': auth_header} if auth_header else {}
+            stats = bridge_service.embedding_sync.sync(headers=headers, force=True)
+            return jsonify({
+                'success': True,
+                'sync': stats,
+                'status': bridge_service.embedding_sync.status()
+            })
         except Exception as e:
-            logger.error(f"Semantic search error: {str(e)}")
+            logger.error(f"Embedding sync failed: {str(e)}")
             logger.error(traceback.format_exc())
             return jsonify({
                 'success': False,
-                'message': f'Semantic search failed: {str(e)}'
-            }), 500
\ No newline at end of file
+                'message': f'Embedding sync failed: {str(e)}'
+            }), 500
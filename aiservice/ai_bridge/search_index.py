@@ -0,0 +1,209 @@
+"""
+Vectorized semantic search index for AI Bridge Service
+"""
+import json
+import logging
+from collections import Counter
+import numpy as np
+from config import SEARCH_MIN_SIMILARITY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def extract_embedding_records(response_data):
+    """Unwrap the embedding rows from a Laravel /document-embeddings response"""
+    if isinstance(response_data, dict):
+        if 'data' in response_data:
+            return extract_embedding_records(response_data['data'])
+        if 'embeddings' in response_data:
+            return extract_embedding_records(response_data['embeddings'])
+        return []
+    if isinstance(response_data, list):
+        return [record for record in response_data if isinstance(record, dict)]
+    return []
+
+def parse_vector(raw_vector):
+    """Convert a stored embedding vector (list or JSON string) to float32"""
+    if raw_vector is None:
+        return None
+    if isinstance(raw_vector, str):
+        raw_vector = json.loads(raw_vector)
+    vector = np.asarray(raw_vector, dtype=np.float32)
+    if vector.ndim != 1 or vector.size == 0:
+        return None
+    return vector
+
+def normalize_rows(matrix):
+    """L2-normalize every row so a dot product equals cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_rows(scores, limit, min_score=SEARCH_MIN_SIMILARITY):
+    """Return (row, score) pairs of the best `limit` scores above `min_score`"""
+    if scores.size == 0 or limit <= 0:
+        return []
+    if scores.size > limit:
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        candidates = np.arange(scores.size)
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return [(int(row), float(scores[row])) for row in candidates if scores[row] > min_score]
+
+def parse_records(records):
+    """(row, float32 vector) pairs of Laravel embedding rows that share the dominant vector dimension"""
+    parsed = []
+    for record in extract_embedding_records(records):
+        try:
+            vector = parse_vector(record.get('embedding_vector'))
+        except (TypeError, ValueError):
+            vector = None
+        if vector is not None:
+            parsed.append((record, vector))
+
+    if not parsed:
+        return parsed
+    dimensions = Counter(vector.size for _, vector in parsed)
+    dimension = dimensions.most_common(1)[0][0]
+    if len(dimensions) > 1:
+        skipped = sum(count for dim, count in dimensions.items() if dim != dimension)
+        logger.warning(f"Skipping {skipped} embeddings whose dimension differs from {dimension}")
+        parsed = [(record, vector) for record, vector in parsed if vector.size == dimension]
+    return parsed
+
+class VectorIndex:
+    """Chunk vectors held as one normalized float32 matrix with aligned metadata columns"""
+
+    def __init__(self, vectors=None, embedding_ids=None, doc_ids=None, chunk_indexes=None,
+                 titles=None, chunk_texts=None):
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        self.embedding_ids = embedding_ids if embedding_ids is not None else np.zeros(0, dtype=np.int64)
+        self.doc_ids = doc_ids if doc_ids is not None else np.zeros(0, dtype=np.int64)
+        self.chunk_indexes = chunk_indexes if chunk_indexes is not None else np.zeros(0, dtype=np.int32)
+        self.titles = titles if titles is not None else []
+        self.chunk_texts = chunk_texts if chunk_texts is not None else []
+        self._documents = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Build an index from Laravel embedding rows, keeping the dominant vector dimension"""
+        parsed = parse_records(records)
+        if not parsed:
+            return cls()
+        return cls(
+            vectors=normalize_rows(np.stack([vector for _, vector in parsed])),
+            **cls.metadata_columns([record for record, _ in parsed])
+        )
+
+    @staticmethod
+    def metadata_columns(records):
+        """Id, title and chunk text columns aligned with `records`"""
+        # Rows synced without chunk_text keep None in the text column; those hits are hydrated later
+        has_text = any(record.get('chunk_text') for record in records)
+        return {
+            'embedding_ids': np.array([record.get('embedding_id') or 0 for record in records], dtype=np.int64),
+            'doc_ids': np.array([record.get('doc_id') or 0 for record in records], dtype=np.int64),
+            'chunk_indexes': np.array([record.get('chunk_index') or 0 for record in records], dtype=np.int32),
+            'titles': [record.get('document_title', 'Unknown Document') for record in records],
+            'chunk_texts': [record.get('chunk_text') or None for record in records] if has_text else [],
+        }
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1] if len(self) else 0
+
+    def memory_footprint(self):
+        """Approximate resident bytes held by the vectors and id columns"""
+        id_bytes = self.embedding_ids.nbytes + self.doc_ids.nbytes + self.chunk_indexes.nbytes
+        return {
+            'vector_bytes': self.vectors.nbytes,
+            'id_bytes': id_bytes,
+            'resident_bytes': self.vectors.nbytes + id_bytes,
+            'disk_bytes': 0
+        }
+
+    def row_vectors(self, rows):
+        """Float32 vectors of the given chunk rows"""
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def score_batch(self, query_vectors):
+        """Score every query against every chunk with a single matrix-matrix product"""
+        queries = normalize_rows(query_vectors)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query dimension {queries.shape[1]} does not match index dimension {self.dimension}"
+            )
+        return queries @ self.vectors.T
+
+    def search(self, query_vector, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        """Return the top-k results for one query vector"""
+        return self.search_batch([query_vector], limit, min_score, top_docs)[0]
+
+    def search_batch(self, query_vectors, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=None):
+        """Return per-query top-k results for a batch of query vectors
+
+        With `top_docs`, only the chunks of the best-matching documents are scored (two-stage).
+        """
+        if not len(self):
+            return [[] for _ in range(len(query_vectors))]
+        if top_docs and top_docs < self.document_count():
+            return self.search_two_stage(query_vectors, limit, min_score, top_docs)
+        scores = self.score_batch(query_vectors)
+        return [
+            [self.build_result(row, score) for row, score in top_k_rows(query_scores, limit, min_score)]
+            for query_scores in scores
+        ]
+
+    def documents(self):
+        """Per-document chunk grouping and normalized centroid vectors, computed on first use
+
+        Returns (row order sorted by doc_id, group offsets into that order, centroid matrix).
+        """
+        if self._documents is None:
+            order = np.argsort(self.doc_ids, kind='stable')
+            _, starts = np.unique(self.doc_ids[order], return_index=True)
+            offsets = np.append(starts, len(order))
+            centroids = np.add.reduceat(self.row_vectors(order), starts, axis=0)
+            self._documents = (order, offsets, normalize_rows(centroids))
+        return self._documents
+
+    def document_count(self):
+        return len(self.documents()[1]) - 1 if len(self) else 0
+
+    def search_two_stage(self, query_vectors, limit=10, min_score=SEARCH_MIN_SIMILARITY, top_docs=50):
+        """Score one centroid per document, then only the chunks of the `top_docs` best documents"""
+        order, offsets, centroids = self.documents()
+        queries = normalize_rows(query_vectors)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query dimension {queries.shape[1]} does not match index dimension {self.dimension}"
+            )
+
+        document_scores = queries @ centroids.T
+        batch_results = []
+        for query, scores in zip(queries, document_scores):
+            best_documents = [row for row, _ in top_k_rows(scores, top_docs, min_score=-np.inf)]
+            rows = np.sort(np.concatenate([order[offsets[doc]:offsets[doc + 1]] for doc in best_documents]))
+            chunk_scores = self.row_vectors(rows) @ query
+            batch_results.append([
+                self.build_result(int(rows[position]), score)
+                for position, score in top_k_rows(chunk_scores, limit, min_score)
+            ])
+        return batch_results
+
+    def build_result(self, row, score):
+        """Format one matched chunk in the /api/documents/search result shape"""
+        return {
+            'doc_id': int(self.doc_ids[row]),
+            'title': self.titles[row],
+            'similarity_score': float(score),
+            'matched_chunk': self.chunk_texts[row] if self.chunk_texts else None,
+            'chunk_index': int(self.chunk_indexes[row]),
+            'embedding_id': int(self.embedding_ids[row])
+        }
@@ -0,0 +1,133 @@
+"""
+Versioned snapshot export/import of the AI Bridge search state for fast instance bootstrap
+"""
+import os
+import json
+import struct
+import logging
+import time
+from datetime import datetime
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'AIBSNAP\x00'
+SNAPSHOT_FORMAT_VERSION = 1
+
+# magic, format version, metadata length
+_HEADER = struct.Struct('<8sIQ')
+_ALIGNMENT = 64
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+def export_snapshot(embedding_sync, path, suggestion_index=None):
+    """Write the synced rows, sync cursor and typeahead state as one file
+
+    Layout: fixed header, JSON metadata (metadata columns, cursor, per-dimension section
+    offsets), then one float32 row-major vector section per dimension, each 64-byte aligned
+    so it can be read with one contiguous read.
+    """
+    started = time.perf_counter()
+    records, cursor, version = embedding_sync.snapshot()
+
+    # Rows from different namespaces can differ in dimension, so vectors are stored per dimension
+    sections = {}
+    for position, record in enumerate(records):
+        sections.setdefault(int(np.asarray(record['embedding_vector']).size), []).append(position)
+
+    column_names = sorted({name for record in records for name in record if name != 'embedding_vector'})
+    metadata = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'sync_cursor': cursor,
+        'sync_version': version,
+        'rows': len(records),
+        'columns': {name: [record.get(name) for record in records] for name in column_names},
+        'suggestions': suggestion_index.state() if suggestion_index is not None else None,
+        'sections': []
+    }
+
+    # Section offsets depend on the metadata length, which depends on the offsets; iterate until stable
+    section_offsets = {}
+    while True:
+        metadata['sections'] = [
+            {'dimension': dimension, 'rows': rows, 'offset': section_offsets.get(dimension, 0)}
+            for dimension, rows in sections.items()
+        ]
+        encoded = json.dumps(metadata).encode('utf-8')
+        offsets, offset = {}, _aligned(_HEADER.size + len(encoded))
+        for dimension, rows in sections.items():
+            offsets[dimension] = offset
+            offset = _aligned(offset + len(rows) * dimension * 4)
+        if offsets == section_offsets:
+            break
+        section_offsets = offsets
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as handle:
+        handle.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(encoded)))
+        handle.write(encoded)
+        for section in metadata['sections']:
+            handle.write(b'\x00' * (section['offset'] - handle.tell()))
+            for position in section['rows']:
+                handle.write(np.asarray(records[position]['embedding_vector'], dtype=np.float32).tobytes())
+    os.replace(temp_path, path)
+
+    info = {
+        'path': path,
+        'rows': len(records),
+        'bytes': os.path.getsize(path),
+        'sync_cursor': cursor,
+        'elapsed_seconds': round(time.perf_counter() - started, 2)
+    }
+    logger.info(f"Exported search snapshot with {info['rows']} rows ({info['bytes']} bytes) to {path}")
+    return info
+
+def read_snapshot(path):
+    """Metadata and in-memory vector sections of a snapshot file
+
+    Each section is read with one sequential read and nothing stays mapped, so the file can be
+    replaced by the next export (os.replace fails on Windows while a mapping is open).
+    """
+    with open(path, 'rb') as handle:
+        magic, format_version, metadata_length = _HEADER.unpack(handle.read(_HEADER.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an AI Bridge search snapshot")
+        if format_version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {format_version} (expected {SNAPSHOT_FORMAT_VERSION})")
+        metadata = json.loads(handle.read(metadata_length).decode('utf-8'))
+
+    matrices = [
+        (section, np.fromfile(path, dtype=np.float32, count=len(section['rows']) * section['dimension'],
+                              offset=section['offset']).reshape(len(section['rows']), section['dimension']))
+        for section in metadata['sections'] if section['rows']
+    ]
+    return metadata, matrices
+
+def import_snapshot(embedding_sync, path, suggestion_index=None):
+    """Replace the bridge's synced rows with a snapshot; the next sync catches up from its cursor"""
+    started = time.perf_counter()
+    metadata, matrices = read_snapshot(path)
+
+    columns = metadata['columns']
+    records = [{name: values[position] for name, values in columns.items()} for position in range(metadata['rows'])]
+    for section, matrix in matrices:
+        for row, position in enumerate(section['rows']):
+            records[position]['embedding_vector'] = matrix[row]
+
+    embedding_sync.restore(records, metadata['sync_cursor'])
+    if suggestion_index is not None and metadata.get('suggestions'):
+        suggestion_index.restore(metadata['suggestions'])
+
+    info = {
+        'path': path,
+        'rows': metadata['rows'],
+        'created_at': metadata['created_at'],
+        'sync_cursor': metadata['sync_cursor'],
+        'elapsed_seconds': round(time.perf_counter() - started, 2)
+    }
+    logger.info(f"Imported search snapshot with {info['rows']} rows from {path} (created {info['created_at']})")
+    return info
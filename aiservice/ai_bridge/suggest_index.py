@@ -0,0 +1,217 @@
+"""
+Prefix index over document titles and entities for typeahead search suggestions
+"""
+import re
+import bisect
+import logging
+import threading
+from collections import defaultdict
+import numpy as np
+from config import SUGGEST_DEFAULT_LIMIT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"[\w][\w.'/-]*", re.UNICODE)
+
+# Titles follow "[Document Type] - [Person/Org Name] - [Date or Reference]"; each part is an entity
+_ENTITY_SEPARATOR = re.compile(r"\s+[-–—|]\s+")
+
+KIND_WEIGHTS = {'title': 1.0, 'entity': 0.6}
+
+def normalize_key(text):
+    """Lowercase and collapse whitespace so prefixes compare consistently"""
+    return ' '.join(text.lower().split())
+
+def extract_entities(title):
+    """Entity strings (names, dates, reference numbers) embedded in a structured title"""
+    parts = [part.strip() for part in _ENTITY_SEPARATOR.split(title or '')]
+    return [part for part in parts[1:] if len(part) > 2] if len(parts) > 1 else []
+
+class SuggestionIndex:
+    """Sorted array of word-start keys with binary search and popularity-weighted completion
+
+    Every title and entity is indexed under each position where a word starts, so typing any
+    word of "Affidavit of Loss - Juan Dela Cruz" (e.g. "juan") completes it. A lookup is two
+    bisects for the matching key range plus a vectorized top-k over that range's scores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._titles = {}  # doc_id -> title
+        self._popularity = defaultdict(float)  # doc_id -> accumulated hit weight
+        self._keys = []  # sorted normalized keys
+        self._key_entries = np.zeros(0, dtype=np.int32)  # entry each key points to
+        self._key_bonus = np.zeros(0, dtype=np.float32)  # boost for keys at the start of the text
+        self._entries = []  # (text, kind) per entry; identical entities share one entry
+        self._entry_docs = []  # doc_ids behind each entry
+        self._entry_scores = np.zeros(0, dtype=np.float32)
+        self._doc_entries = {}  # doc_id -> entry ids, used to apply popularity hits in place
+        self._dirty = False
+        self._revision = 0  # Bumped on every title change so a rebuild knows whether it went stale
+        self.synced_version = None
+
+    def __len__(self):
+        return len(self._titles)
+
+    def _mark_dirty(self):
+        """Record a title change (lock held)"""
+        self._dirty = True
+        self._revision += 1
+
+    def update_document(self, doc_id, title):
+        """Index a new or retitled document"""
+        if not doc_id or not title:
+            return
+        with self._lock:
+            if self._titles.get(doc_id) != title:
+                self._titles[doc_id] = title
+                self._mark_dirty()
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            if self._titles.pop(doc_id, None) is not None:
+                self._mark_dirty()
+
+    def sync_titles(self, titles_by_doc, version=None):
+        """Replace the indexed titles with the given doc_id -> title mapping"""
+        with self._lock:
+            if titles_by_doc != self._titles:
+                self._titles = dict(titles_by_doc)
+                self._mark_dirty()
+            self.synced_version = version
+
+    def record_hit(self, doc_id, weight=1.0):
+        """Boost a document's suggestions after it was picked or returned by search"""
+        if not doc_id:
+            return
+        with self._lock:
+            self._popularity[doc_id] += weight
+            # Entry ids refer to the published key array, which stays consistent until the next swap
+            for entry_id in self._doc_entries.get(doc_id, ()):
+                self._entry_scores[entry_id] = self._entry_score(entry_id)
+
+    def state(self):
+        """Titles and popularity, for inclusion in a search snapshot"""
+        with self._lock:
+            return {
+                'titles': {str(doc_id): title for doc_id, title in self._titles.items()},
+                'popularity': {str(doc_id): weight for doc_id, weight in self._popularity.items()},
+                'synced_version': self.synced_version
+            }
+
+    def restore(self, state):
+        """Load titles and popularity saved by state()"""
+        with self._lock:
+            self._titles = {int(doc_id): title for doc_id, title in state.get('titles', {}).items()}
+            self._popularity = defaultdict(float, {
+                int(doc_id): weight for doc_id, weight in state.get('popularity', {}).items()
+            })
+            # Sync versions are per process, so the next refresh re-derives titles from the restored rows
+            self.synced_version = None
+            self._mark_dirty()
+
+    def _entry_score(self, entry_id):
+        """Kind weight plus the popularity of the entry's most popular document"""
+        _, kind = self._entries[entry_id]
+        docs = self._entry_docs[entry_id]
+        score = KIND_WEIGHTS[kind] + max(self._popularity.get(doc_id, 0.0) for doc_id in docs)
+        if kind == 'entity':
+            score += 0.1 * np.log1p(len(docs) - 1)  # Names shared by many documents rank higher
+        return score
+
+    def _build(self, titles):
+        """Sorted keys and entries for `titles`; needs no lock, so it runs beside live lookups"""
+        entries, entry_docs, entity_ids = [], [], {}
+        doc_entries = defaultdict(list)
+        for doc_id, title in titles.items():
+            doc_entries[doc_id].append(len(entries))
+            entries.append((title, 'title'))
+            entry_docs.append([doc_id])
+            for entity in extract_entities(title):
+                normalized = normalize_key(entity)
+                if normalized not in entity_ids:
+                    entity_ids[normalized] = len(entries)
+                    entries.append((entity, 'entity'))
+                    entry_docs.append([])
+                entry_docs[entity_ids[normalized]].append(doc_id)
+                doc_entries[doc_id].append(entity_ids[normalized])
+
+        keys = []
+        for entry_id, (text, _) in enumerate(entries):
+            normalized = normalize_key(text)
+            # Shorter texts win ties so "Juan Dela Cruz" precedes every title containing it
+            length_penalty = 1e-4 * min(len(text), 1000)
+            for match in _WORD_PATTERN.finditer(normalized):
+                keys.append((normalized[match.start():], entry_id, (0.5 if match.start() == 0 else 0.0) - length_penalty))
+        keys.sort(key=lambda key: key[0])
+        return (
+            [key for key, _, _ in keys],
+            np.array([entry_id for _, entry_id, _ in keys], dtype=np.int32),
+            np.array([bonus for _, _, bonus in keys], dtype=np.float32),
+            entries, entry_docs, dict(doc_entries)
+        )
+
+    def _publish(self, built, revision):
+        """Swap in a built key array and score it against the current popularity (lock held)"""
+        self._keys, self._key_entries, self._key_bonus, self._entries, self._entry_docs, self._doc_entries = built
+        self._entry_scores = np.array([self._entry_score(entry_id) for entry_id in range(len(self._entries))], dtype=np.float32)
+        # Titles changed while this build ran are picked up by the next rebuild
+        self._dirty = revision != self._revision
+        logger.info(f"Rebuilt suggestion index: {len(self._entries)} entries under {len(self._keys)} keys")
+
+    def rebuild(self):
+        """Rebuild the key array outside the lock if titles changed; lookups keep the previous one meanwhile"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            titles, revision = dict(self._titles), self._revision
+        built = self._build(titles)
+        with self._lock:
+            self._publish(built, revision)
+        return True
+
+    def suggest(self, prefix, limit=SUGGEST_DEFAULT_LIMIT):
+        """Completions for a typed prefix, best first"""
+        prefix = normalize_key(prefix or '')
+        if not prefix or limit <= 0:
+            return []
+
+        with self._lock:
+            # Later title changes are rebuilt in the background; only the first build is waited for
+            if self._dirty and not self._entries:
+                self._publish(self._build(self._titles), self._revision)
+            keys, key_entries, key_bonus = self._keys, self._key_entries, self._key_bonus
+            entries, entry_docs, entry_scores = self._entries, self._entry_docs, self._entry_scores
+
+        low = bisect.bisect_left(keys, prefix)
+        high = bisect.bisect_left(keys, prefix + '\U0010ffff', low)
+        if low == high:
+            return []
+
+        matched = key_entries[low:high]
+        scores = entry_scores[matched] + key_bonus[low:high]
+        # An entry can match under several of its words, so over-fetch before de-duplicating
+        take = min(scores.size, limit * 4)
+        best = np.argpartition(-scores, take - 1)[:take] if scores.size > take else np.arange(scores.size)
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        suggestions, seen = [], set()
+        for position in best:
+            entry_id = int(matched[position])
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+            text, kind = entries[entry_id]
+            suggestion = {'text': text, 'kind': kind, 'score': round(float(scores[position]), 3)}
+            if kind == 'title':
+                suggestion['doc_id'] = entry_docs[entry_id][0]
+            else:
+                suggestion['document_count'] = len(entry_docs[entry_id])
+            suggestions.append(suggestion)
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+# Global suggestion index instance
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,143 @@
+"""
+Tests for the pooled Groq client against the mock Groq server of benchmark_groq.py
+
+Run with `python -m pytest aiservice/ai_bridge/test_groq_client.py`; nothing here talks to the
+real Groq API.
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+# The bridge modules import each other by bare name, as when ai_bridge_app.py runs
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_groq import MockGroqServer
+from groq_client import GroqClient, GroqError
+
+MESSAGES = [{'role': 'user', 'content': 'Write the title of this document'}]
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs):
+        server = MockGroqServer(**dict({'latency_ms': 0}, **kwargs))
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+def make_client(server, **kwargs):
+    client = GroqClient(api_key='test-key', api_url=server.url, **dict({'backoff_base': 0.01, 'backoff_max': 1.0}, **kwargs))
+    delays = []
+    backoff_seconds = client._backoff_seconds
+
+    def record(attempt, retry_after=None):
+        delays.append(backoff_seconds(attempt, retry_after))
+        return delays[-1]
+
+    client._backoff_seconds = record
+    return client, delays
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_retries_up_to_max_retries_then_raises(make_server, status):
+    server = make_server(fail_every=1, fail_status=status)
+    client, delays = make_client(server, max_retries=2)
+
+    with pytest.raises(GroqError) as raised:
+        client.chat('mock-model', MESSAGES)
+
+    assert raised.value.status_code == status
+    assert server.requests == 3
+    assert client.stats['retries'] == 2
+    assert len(delays) == 2
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_retried_request_succeeds(make_server, status):
+    # Every second request fails, so the first call succeeds and the second needs one retry
+    server = make_server(fail_every=2, fail_status=status)
+    client, delays = make_client(server, max_retries=2)
+
+    assert client.chat('mock-model', MESSAGES).startswith('mock answer')
+    assert client.chat('mock-model', MESSAGES).startswith('mock answer')
+    assert server.requests == 3
+    assert client.stats['retries'] == 1
+    assert client.stats['failures'] == 0
+
+def test_retry_after_is_honoured(make_server):
+    # The mock server sends Retry-After: 0.05 with every injected failure
+    server = make_server(fail_every=1, fail_status=429)
+    client, delays = make_client(server, max_retries=2)
+
+    with pytest.raises(GroqError):
+        client.chat('mock-model', MESSAGES)
+
+    assert delays == [0.05, 0.05]
+    assert client.stats['seconds'] >= 0.1
+
+def test_retry_after_is_capped_by_backoff_max(make_server):
+    client = GroqClient(api_key='test-key', api_url=make_server().url, backoff_max=0.5)
+    assert client._backoff_seconds(0, '30') == 0.5
+
+def test_backoff_without_retry_after_is_jittered_and_bounded(make_server):
+    client = GroqClient(api_key='test-key', api_url=make_server().url, backoff_base=0.1, backoff_max=0.5)
+    for attempt in range(6):
+        for _ in range(50):
+            assert 0 <= client._backoff_seconds(attempt) <= min(0.5, 0.1 * 2 ** attempt)
+
+def test_non_retryable_status_is_not_retried(make_server):
+    server = make_server(fail_every=1, fail_status=400)
+    client, delays = make_client(server, max_retries=2)
+
+    with pytest.raises(GroqError) as raised:
+        client.chat('mock-model', MESSAGES)
+
+    assert raised.value.status_code == 400
+    assert server.requests == 1
+    assert delays == []
+
+def test_sequential_calls_reuse_one_connection(make_server):
+    server = make_server()
+    client, _ = make_client(server)
+
+    for _ in range(5):
+        client.chat('mock-model', MESSAGES)
+
+    assert server.requests == 5
+    assert len(server.connections) == 1
+
+def test_concurrent_calls_stay_within_the_pool(make_server):
+    server = make_server(latency_ms=50)
+    client, _ = make_client(server, pool_size=3)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        answers = list(executor.map(lambda _: client.chat('mock-model', MESSAGES), range(12)))
+
+    assert len(answers) == 12
+    assert server.requests == 12
+    assert len(server.connections) <= 3
+
+def test_rejected_requests_do_not_trip_the_breaker(make_server):
+    server = make_server(fail_every=1, fail_status=400)
+    client, _ = make_client(server, max_retries=0)
+
+    for _ in range(client.breaker.min_calls * 2):
+        with pytest.raises(GroqError):
+            client.chat('mock-model', MESSAGES)
+
+    assert client.breaker.state == 'closed'
+    assert client.breaker.stats['failures'] == 0
+
+def test_server_errors_trip_the_breaker(make_server):
+    server = make_server(fail_every=1, fail_status=503)
+    client, _ = make_client(server, max_retries=0)
+
+    for _ in range(client.breaker.min_calls):
+        with pytest.raises(GroqError):
+            client.chat('mock-model', MESSAGES)
+
+    assert client.breaker.state == 'open'
+    assert not client.breaker.allow()
@@ -0,0 +1,181 @@
+"""
+Model-versioned vector namespaces for AI Bridge semantic search
+"""
+import os
+import json
+import hashlib
+import glob
+import logging
+import threading
+import numpy as np
+from config import EMBEDDING_NAMESPACES, DEFAULT_EMBEDDING_NAMESPACE, SEARCH_INDEX_DIR
+from file_utils import write_json_atomic
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_ACTIVE_NAMESPACE_FILE = os.path.join(SEARCH_INDEX_DIR, 'active_namespace.json')
+_NAMESPACES_DIR = os.path.join(SEARCH_INDEX_DIR, 'namespaces')
+
+def namespace_of(record):
+    """Namespace a Laravel embedding row was produced in (legacy rows predate tagging)"""
+    return record.get('model_namespace') or DEFAULT_EMBEDDING_NAMESPACE
+
+def model_name_of(namespace):
+    """Model name part of a '<model>@<version>' namespace"""
+    return namespace.split('@', 1)[0]
+
+def store_digest(records, vectors_by_id):
+    """Digest of which of `records` have a vector in a bridge-side store, or None if none do"""
+    stored = sorted(record.get('embedding_id') for record in records if record.get('embedding_id') in vectors_by_id)
+    return hashlib.sha1(json.dumps(stored).encode('utf-8')).hexdigest() if stored else None
+
+class NamespaceStore:
+    """Bridge-side vectors for a namespace that Laravel does not store, kept as append-only parts on disk"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.path = os.path.join(_NAMESPACES_DIR, namespace.replace('/', '_').replace('@', '__v'))
+        self.state_path = os.path.join(self.path, 'state.json')
+        self._lock = threading.Lock()
+        self._vectors_by_id = None
+        self.generation = 0  # Bumped on every append so cached indexes know to rebuild
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def load_state(self):
+        """Read the job/progress state for this namespace"""
+        if not self.exists():
+            return {'namespace': self.namespace, 'status': 'new', 'last_embedding_id': 0, 'processed': 0}
+        with open(self.state_path, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+
+    def save_state(self, state):
+        write_json_atomic(self.state_path, state)
+
+    def append(self, embedding_ids, vectors):
+        """Persist a batch of re-embedded vectors as a new part file"""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            part_number = len(glob.glob(os.path.join(self.path, 'part_*.npz'))) + 1
+            part_path = os.path.join(self.path, f"part_{part_number:06d}.npz")
+            temp_path = part_path + '.tmp.npz'
+            np.savez(temp_path, embedding_ids=np.asarray(embedding_ids, dtype=np.int64),
+                     vectors=np.asarray(vectors, dtype=np.float32))
+            os.replace(temp_path, part_path)
+            self.generation += 1
+            if self._vectors_by_id is not None:
+                for embedding_id, vector in zip(embedding_ids, vectors):
+                    self._vectors_by_id[int(embedding_id)] = np.asarray(vector, dtype=np.float32)
+
+    def vectors_by_id(self):
+        """All stored vectors keyed by embedding_id (later parts win)"""
+        with self._lock:
+            if self._vectors_by_id is None:
+                vectors_by_id = {}
+                for part_path in sorted(glob.glob(os.path.join(self.path, 'part_*.npz'))):
+                    with np.load(part_path) as part:
+                        for embedding_id, vector in zip(part['embedding_ids'], part['vectors']):
+                            vectors_by_id[int(embedding_id)] = vector
+                self._vectors_by_id = vectors_by_id
+            return self._vectors_by_id
+
+class NamespaceRegistry:
+    """Tracks the namespace that serves queries and the bridge-side stores of other namespaces"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores = {}
+        self._active_namespace = self._load_active_namespace()
+
+    def _load_active_namespace(self):
+        try:
+            with open(_ACTIVE_NAMESPACE_FILE, 'r', encoding='utf-8') as handle:
+                namespace = json.load(handle).get('namespace')
+            if namespace in EMBEDDING_NAMESPACES:
+                return namespace
+        except (OSError, ValueError):
+            pass
+        return DEFAULT_EMBEDDING_NAMESPACE
+
+    @property
+    def active_namespace(self):
+        return self._active_namespace
+
+    def resolve(self, namespace=None):
+        """Validate a requested namespace, defaulting to the active one"""
+        namespace = namespace or self._active_namespace
+        if namespace not in EMBEDDING_NAMESPACES:
+            raise ValueError(f"Unknown embedding namespace: {namespace}")
+        return namespace
+
+    def activate(self, namespace):
+        """Atomically switch the namespace that serves queries"""
+        namespace = self.resolve(namespace)
+        with self._lock:
+            write_json_atomic(_ACTIVE_NAMESPACE_FILE, {'namespace': namespace})
+            previous, self._active_namespace = self._active_namespace, namespace
+        logger.info(f"Active embedding namespace switched from {previous} to {namespace}")
+        return previous
+
+    def store(self, namespace):
+        """Bridge-side vector store for a namespace"""
+        with self._lock:
+            if namespace not in self._stores:
+                self._stores[namespace] = NamespaceStore(namespace)
+            return self._stores[namespace]
+
+    def records_for(self, records, namespace, encoder=None, fetch_texts=None):
+        """Embedding rows with vectors from the requested namespace
+
+        Rows Laravel already stores in the namespace are used as-is. The other rows are merged in
+        per embedding_id with vectors from the bridge-side store, unless Laravel also has a
+        native row for the same chunk, so during a partial migration every chunk is searchable
+        exactly once. Once the store's re-embedding job is complete, rows it has not seen yet are
+        embedded on the fly with `encoder`. `fetch_texts` supplies chunk text by embedding_id for
+        rows synced without it.
+        """
+        native = [record for record in records if namespace_of(record) == namespace]
+        store = self.store(namespace)
+        if not store.exists():
+            return native
+
+        native_ids = {record.get('embedding_id') for record in native}
+        native_chunks = {(record.get('doc_id'), record.get('chunk_index')) for record in native}
+        others = [
+            record for record in records
+            if record.get('embedding_id') not in native_ids
+            and (record.get('doc_id'), record.get('chunk_index')) not in native_chunks
+        ]
+
+        vectors_by_id = store.vectors_by_id()
+        missing = [record for record in others if record.get('embedding_id') not in vectors_by_id]
+        if missing and encoder is not None and store.load_state().get('status') == 'complete':
+            logger.info(f"Embedding {len(missing)} new chunks into namespace {namespace}")
+            texts = [record.get('chunk_text') for record in missing]
+            if fetch_texts is not None and not all(texts):
+                fetched = fetch_texts([record.get('embedding_id') for record in missing])
+                texts = [text or fetched.get(record.get('embedding_id'), '') for text, record in zip(texts, missing)]
+            vectors = encoder.encode([text or '' for text in texts], convert_to_tensor=False)
+            store.append([record.get('embedding_id') for record in missing], vectors)
+
+        routed = list(native)
+        for record in others:
+            vector = vectors_by_id.get(record.get('embedding_id'))
+            if vector is not None:
+                routed.append(dict(record, embedding_vector=vector, model_namespace=namespace))
+        return routed
+
+    def describe(self):
+        """Namespaces known to the bridge with their store progress"""
+        return {
+            'active_namespace': self._active_namespace,
+            'namespaces': {
+                namespace: dict(settings, store=self.store(namespace).load_state())
+                for namespace, settings in EMBEDDING_NAMESPACES.items()
+            }
+        }
+
+# Global namespace registry instance
+namespace_registry = NamespaceRegistry()
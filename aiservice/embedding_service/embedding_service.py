@@ -21,6 +21,8 @@ embedding_model = None
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # aiservice/embedding_service
 PROJECT_ROOT = os.path.dirname(os.path.dirname(BASE_DIR)) # Legal_Arch_aiu
 EMBEDDING_MODEL_PATH = os.path.join(PROJECT_ROOT, "storage", "app", "models", "all-MiniLM-L6-v2")       
+# Vector namespace ('<model>@<version>') stored with every embedding; bump the version when the model changes
+MODEL_NAMESPACE = "all-MiniLM-L6-v2@1"
           
 def load_embedding_model():
     """Load the sentence transformer embedding model"""
@@ -52,6 +54,7 @@ def health_check():
         'status': 'healthy' if embedding_model is not None else 'loading',
         'model_loaded': embedding_model is not None,
         'model_name': 'all-MiniLM-L6-v2',
+        'model_namespace': MODEL_NAMESPACE,
         'model_path': EMBEDDING_MODEL_PATH,
         'service': 'embedding',
         'timestamp': datetime.now().isoformat()
@@ -84,6 +87,7 @@ def embed_single():
         return jsonify({
             'embedding': embedding.tolist(),
             'dimensions': len(embedding),
+            'model_namespace': MODEL_NAMESPACE,
             'text_length': len(text),
             'timestamp': datetime.now().isoformat()
         })
@@ -127,6 +131,7 @@ def embed_batch():
             'embeddings': embeddings_list,
             'count': len(embeddings_list),
             'dimensions': len(embeddings_list[0]) if embeddings_list else 0,
+            'model_namespace': MODEL_NAMESPACE,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -195,6 +200,7 @@ def model_info():
         info = {
             'service': 'document_embedding',
             'model_name': 'all-MiniLM-L6-v2',
+            'model_namespace': MODEL_NAMESPACE,
             'model_path': EMBEDDING_MODEL_PATH,
             'model_loaded': embedding_model is not None,
             'dimensions': 384,
@@ -236,4 +236,27 @@ public function processWithAI(Request $request)
             ], 500);
         }
     }
-}
\ No newline at end of file
+
+    /**
+     * Receive a finished analysis job from the AI Bridge (public callback)
+     */
+    public function receiveAnalysisResult(Request $request)
+    {
+        $validated = $request->validate([
+            'job_id' => 'required|string|max:64',
+            'docId' => 'required|integer',
+            'status' => 'required|string|in:completed,failed',
+            'result' => 'nullable|array',
+            'error' => 'nullable|string'
+        ]);
+
+        if (!$this->documentProcessor->handleAnalysisJobResult($validated)) {
+            return response()->json([
+                'success' => false,
+                'message' => 'Unknown analysis job'
+            ], 404);
+        }
+
+        return response()->json(['success' => true]);
+    }
+}
@@ -504,13 +504,15 @@ public function storeEmbeddings(Request $request)
                 'doc_id' => 'required|integer',
                 'embeddings' => 'required|array',
                 'total_chunks' => 'required|integer',
-                'model_used' => 'required|string'
+                'model_used' => 'required|string',
+                'model_namespace' => 'nullable|string'
             ]);
 
             $totalStored = $this->queryService->storeEmbeddings(
                 $validated['doc_id'],
                 $validated['embeddings'],
-                $validated['model_used']
+                $validated['model_used'],
+                $validated['model_namespace'] ?? null
             );
 
             return response()->json([
@@ -610,6 +612,65 @@ public function getAllEmbeddings()
         }
     }
 
+    /**
+     * Get chunk texts for the embeddings the AI Bridge returns as search hits
+     */
+    public function getEmbeddingTexts(Request $request)
+    {
+        $request->validate([
+            'embedding_ids' => 'required|array|max:1000',
+            'embedding_ids.*' => 'integer'
+        ]);
+
+        try {
+            $texts = $this->queryService->getEmbeddingTexts($request->input('embedding_ids'));
+
+            return response()->json([
+                'success' => true,
+                'data' => $texts
+            ]);
+
+        } catch (\Exception $e) {
+            Log::error('Failed to get embedding texts', [
+                'error' => $e->getMessage()
+            ]);
+
+            return response()->json([
+                'success' => false,
+                'error' => 'Failed to retrieve embedding texts',
+                'message' => $e->getMessage()
+            ], 500);
+        }
+    }
+
+    /**
+     * Stream embedding changes since a sync cursor for the AI Bridge search index
+     */
+    public function getEmbeddingChanges(Request $request)
+    {
+        $cursor = $request->query('cursor');
+        $limit = min(max((int) $request->query('limit', 500), 1), 5000);
+        $includeText = $request->boolean('include_text', true);
+
+        return response()->stream(function () use ($cursor, $limit, $includeText) {
+            try {
+                foreach ($this->queryService->streamEmbeddingChanges($cursor, $limit, $includeText) as $row) {
+                    echo json_encode($row) . "\n";
+                    flush();
+                }
+            } catch (\Exception $e) {
+                Log::error('Failed to stream embedding changes', [
+                    'error' => $e->getMessage()
+                ]);
+
+                echo json_encode(['error' => 'Failed to stream embedding changes']) . "\n";
+            }
+        }, 200, [
+            'Content-Type' => 'application/x-ndjson',
+            'X-Accel-Buffering' => 'no'
+        ]);
+    }
+
     /**
      * Get single document by ID
      */
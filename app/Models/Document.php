@@ -29,6 +29,16 @@ class Document extends Model
         'created_by' => 'integer',
     ];
 
+    protected static function booted(): void
+    {
+        // Fields the AI Bridge search index mirrors; touching the embeddings puts them back in the sync feed
+        static::updated(function (Document $document) {
+            if ($document->wasChanged(['title', 'status', 'folder_id'])) {
+                DocumentEmbedding::where('doc_id', $document->doc_id)->update(['updated_at' => now()]);
+            }
+        });
+    }
+
     public function user()
     {
         return $this->belongsTo(User::class, 'created_by', 'user_id');
@@ -18,13 +18,43 @@ class DocumentEmbedding extends Model
         'embedding_vector',
         'metadata',
         'created_at',
+        'updated_at',
     ];
 
     protected $casts = [
         'created_at' => 'datetime',
+        'updated_at' => 'datetime',
         'metadata' => 'array',
     ];
 
+    protected static function booted(): void
+    {
+        static::creating(function (DocumentEmbedding $embedding) {
+            $embedding->updated_at = $embedding->updated_at ?? now();
+        });
+    }
+
+    /**
+     * Delete all embeddings of a document, leaving tombstones so the AI Bridge sync drops them too
+     */
+    public static function deleteForDocument(int $docId): int
+    {
+        $embeddingIds = static::where('doc_id', $docId)->pluck('embedding_id');
+
+        if ($embeddingIds->isEmpty()) {
+            return 0;
+        }
+
+        $deletedAt = now();
+        DocumentEmbeddingTombstone::insert($embeddingIds->map(fn ($embeddingId) => [
+            'embedding_id' => $embeddingId,
+            'doc_id' => $docId,
+            'deleted_at' => $deletedAt,
+        ])->all());
+
+        return static::whereIn('embedding_id', $embeddingIds)->delete();
+    }
+
     public function document(): BelongsTo
     {
         return $this->belongsTo(Document::class, 'doc_id', 'doc_id');
@@ -0,0 +1,22 @@
+<?php
+
+namespace App\Models;
+
+use Illuminate\Database\Eloquent\Model;
+
+class DocumentEmbeddingTombstone extends Model
+{
+    protected $table = 'document_embedding_tombstones';
+    protected $primaryKey = 'tombstone_id';
+    public $timestamps = false;
+
+    protected $fillable = [
+        'embedding_id',
+        'doc_id',
+        'deleted_at',
+    ];
+
+    protected $casts = [
+        'deleted_at' => 'datetime',
+    ];
+}
@@ -7,6 +7,7 @@
 use App\Models\Folder;
 use Illuminate\Support\Facades\Storage;
 use Illuminate\Support\Facades\Http;
+use Illuminate\Support\Facades\Cache;
 use Illuminate\Support\Facades\Log;
 use App\Services\GroqService;
 
@@ -19,6 +20,7 @@ class DocumentProcessingService
     private string $embeddingUrl;
     private string $aiBridgeUrl;
     private string $aiServiceType;
+    private bool $asyncAnalysis;
     private int $chunkSize;
     private int $chunkOverlap;
     private GroqService $groqService;
@@ -29,6 +31,7 @@ public function __construct(GroqService $groqService)
         $this->embeddingUrl = env('LOCAL_EMBEDDING_URL', 'http://127.0.0.1:5001');
         $this->aiBridgeUrl = env('AI_BRIDGE_URL', 'http://127.0.0.1:5003');
         $this->aiServiceType = env('AI_SERVICE_TYPE', 'groq');
+        $this->asyncAnalysis = filter_var(env('AI_BRIDGE_ASYNC_ANALYSIS', false), FILTER_VALIDATE_BOOLEAN);
         $this->chunkSize = env('CHUNK_SIZE', 1000);
         $this->chunkOverlap = env('CHUNK_OVERLAP', 200);
         $this->groqService = $groqService;
@@ -50,6 +53,11 @@ public function processDocument(Document $document, string $mimeType): void
                 return;
             }
 
+            // A re-scan or re-upload of an already processed document reuses its analysis and embeddings
+            if ($this->reuseNearDuplicate($document, $fullText)) {
+                return;
+            }
+
             // Split text into chunks
             $chunks = $this->chunkText($fullText);
 
@@ -66,21 +74,15 @@ public function processDocument(Document $document, string $mimeType): void
 
             // --- Generate AI metadata (title, description, remarks) ---
             // Use AI Bridge for local mode, GROQ for online mode
+            $analysisQueued = false;
             if ($this->aiServiceType === 'local') {
-                // Use local AI Bridge service (Llama)
-                $aiResult = $this->callAiBridgeForAnalysis($fullText, $document);
-                if ($aiResult) {
-                    $document->title = $aiResult['title'] ?? $document->title;
-                    $document->description = $aiResult['description'] ?? null;
-                    $document->remarks = $aiResult['remarks'] ?? null;
-                    $document->ai_suggested_folder = $aiResult['suggested_folder'] ?? null;
-                    $document->save();
-                    Log::info('Updated document via AI Bridge (local Llama)', [
-                        'doc_id' => $document->doc_id,
-                        'title' => $document->title,
-                        'description' => substr($document->description ?? '', 0, 100),
-                        'suggested_folder' => $document->ai_suggested_folder
-                    ]);
+                // Use local AI Bridge service (Llama); in async mode the result arrives later via callback
+                $analysisQueued = $this->asyncAnalysis && $this->submitAiBridgeAnalysisJob($fullText, $document);
+                if (!$analysisQueued) {
+                    $aiResult = $this->callAiBridgeForAnalysis($fullText, $document);
+                    if ($aiResult) {
+                        $this->applyAiAnalysis($document, $aiResult);
+                    }
                 }
             } elseif ($this->groqService->isConfigured()) {
                 // Use GROQ API (online)
@@ -94,29 +96,15 @@ public function processDocument(Document $document, string $mimeType): void
                 }
             }
 
-            // Update document status to active after successful processing
-            // REMOVED: Do not set to active yet. Wait for user to accept AI suggestions or manual review.
-            // $updateData = ['status' => 'active'];
-            $updateData = [];
-
-            // Keep AI-generated remarks if we have them, otherwise clear old processing info
-            if (empty($document->remarks) || str_contains($document->remarks, 'Processed into') || str_contains($document->remarks, 'chunks')) {
-                if (!empty($document->description)) {
-                    $descriptionSummary = $document->description;
-                    $firstSentence = preg_split('/(?<=[.!?])\s+/', $descriptionSummary, 2);
-                    $updateData['remarks'] = strlen($firstSentence[0]) > 150
-                        ? substr($firstSentence[0], 0, 147) . '...'
-                        : $firstSentence[0];
-                } else {
-                    $updateData['remarks'] = null;
-                }
+            // A queued analysis finishes the remarks in its callback; this copy of the document is stale by then
+            if (!$analysisQueued) {
+                $this->summarizeRemarks($document);
             }
 
-            $document->update($updateData);
-
             Log::info('Document processed successfully', [
                 'doc_id' => $document->doc_id,
-                'chunks' => count($chunks)
+                'chunks' => count($chunks),
+                'analysis_queued' => $analysisQueued
             ]);
 
         } catch (\Exception $e) {
@@ -251,6 +239,7 @@ private function generateEmbeddings(array $chunks): array
                         'chunk_text' => $chunk,
                         'embedding' => $data['embedding'] ?? [],
                         'model_type' => 'all-MiniLM-L6-v2',
+                        'model_namespace' => $data['model_namespace'] ?? 'all-MiniLM-L6-v2@1',
                         'dimensions' => $data['dimensions'] ?? 384,
                         'service_response' => true
                     ];
@@ -260,6 +249,7 @@ private function generateEmbeddings(array $chunks): array
                         'chunk_text' => $chunk,
                         'embedding' => $this->generateMockEmbedding($chunk),
                         'model_type' => 'mock-fallback',
+                        'model_namespace' => 'mock-fallback@1',
                         'dimensions' => 384,
                         'service_response' => false
                     ];
@@ -274,6 +264,7 @@ private function generateEmbeddings(array $chunks): array
                     'chunk_text' => $chunk,
                     'embedding' => $this->generateMockEmbedding($chunk),
                     'model_type' => 'mock-fallback',
+                    'model_namespace' => 'mock-fallback@1',
                     'dimensions' => 384,
                     'service_response' => false,
                     'error' => $e->getMessage()
@@ -297,6 +288,7 @@ private function storeEmbeddings(Document $document, array $embeddings): void
                 'embedding_vector' => json_encode($embeddingData['embedding']),
                 'metadata' => [
                     'model_type' => $embeddingData['model_type'] ?? 'all-MiniLM-L6-v2',
+                    'model_namespace' => $embeddingData['model_namespace'] ?? 'all-MiniLM-L6-v2@1',
                     'embedding_dimensions' => count($embeddingData['embedding']),
                     'chunk_length' => strlen($embeddingData['chunk_text']),
                     'generated_at' => now()->toISOString(),
@@ -308,6 +300,73 @@ private function storeEmbeddings(Document $document, array $embeddings): void
         }
     }
 
+    /**
+     * Check the AI Bridge near-duplicate index and, for a nearly identical earlier document,
+     * copy its embeddings and AI metadata instead of processing the text again
+     */
+    private function reuseNearDuplicate(Document $document, string $fullText): bool
+    {
+        try {
+            $response = Http::timeout(10)->post($this->aiBridgeUrl . '/api/documents/near-duplicates', [
+                'docId' => $document->doc_id,
+                'documentText' => $fullText
+            ]);
+
+            if (!$response->successful()) {
+                return false;
+            }
+
+            $data = $response->json();
+            if (!empty($data['duplicates'])) {
+                Log::info('Near-duplicate documents detected at ingest', [
+                    'doc_id' => $document->doc_id,
+                    'duplicates' => $data['duplicates']
+                ]);
+            }
+
+            $sourceId = $data['reusable_doc_id'] ?? null;
+            $source = $sourceId ? Document::find($sourceId) : null;
+            if (!$source || $source->embeddings()->doesntExist()) {
+                return false;
+            }
+
+            foreach ($source->embeddings()->orderBy('chunk_index')->get() as $embedding) {
+                DocumentEmbedding::create([
+                    'doc_id' => $document->doc_id,
+                    'chunk_index' => $embedding->chunk_index,
+                    'chunk_text' => $embedding->chunk_text,
+                    'embedding_vector' => $embedding->embedding_vector,
+                    'metadata' => array_merge($embedding->metadata ?? [], [
+                        'reused_from_doc_id' => $source->doc_id,
+                        'generated_at' => now()->toISOString()
+                    ]),
+                    'created_at' => now(),
+                ]);
+            }
+
+            $document->update([
+                'title' => $source->title ?? $document->title,
+                'description' => $source->description,
+                'remarks' => $source->remarks,
+                'ai_suggested_folder' => $source->ai_suggested_folder
+            ]);
+
+            Log::info('Reused analysis and embeddings of near-duplicate document', [
+                'doc_id' => $document->doc_id,
+                'source_doc_id' => $source->doc_id
+            ]);
+
+            return true;
+
+        } catch (\Exception $e) {
+            Log::warning('Near-duplicate check failed, processing document normally', [
+                'doc_id' => $document->doc_id,
+                'error' => $e->getMessage()
+            ]);
+            return false;
+        }
+    }
+
     /**
      * Generate mock embedding for fallback
      */
@@ -353,16 +412,7 @@ private function callAiBridgeForAnalysis(string $text, Document $document): ?arr
     {
         try {
             // Get available folders for AI suggestion
-            $folders = Folder::select('folder_id', 'folder_name', 'folder_path')
-                ->get()
-                ->map(function ($folder) {
-                    return [
-                        'folder_id' => $folder->folder_id,
-                        'folder_name' => $folder->folder_name,
-                        'folder_path' => $folder->folder_path
-                    ];
-                })
-                ->toArray();
+            $folders = $this->analysisFolders();
 
             Log::info('Calling AI Bridge for analysis', [
                 'doc_id' => $document->doc_id,
@@ -412,4 +462,136 @@ private function callAiBridgeForAnalysis(string $text, Document $document): ?arr
             return null;
         }
     }
+
+    /**
+     * Folders offered to the AI Bridge for the folder suggestion
+     */
+    private function analysisFolders(): array
+    {
+        return Folder::select('folder_id', 'folder_name', 'folder_path')
+            ->get()
+            ->map(function ($folder) {
+                return [
+                    'folder_id' => $folder->folder_id,
+                    'folder_name' => $folder->folder_name,
+                    'folder_path' => $folder->folder_path
+                ];
+            })
+            ->toArray();
+    }
+
+    /**
+     * Queue document analysis on the AI Bridge without waiting for the LLM
+     * The result is delivered to /api/ai/analysis-results; returns false if the job could not be queued
+     */
+    private function submitAiBridgeAnalysisJob(string $text, Document $document): bool
+    {
+        try {
+            $response = Http::timeout(10)->post($this->aiBridgeUrl . '/api/documents/analyze/jobs', [
+                'docId' => $document->doc_id,
+                'documentText' => $text,
+                'folders' => $this->analysisFolders(),
+                'callback' => '/ai/analysis-results'
+            ]);
+
+            if ($response->status() === 202 && $response->json('job_id')) {
+                $jobId = $response->json('job_id');
+                // Only callbacks for jobs submitted here are accepted
+                Cache::put('ai_analysis_job:' . $jobId, $document->doc_id, now()->addHours(6));
+                Log::info('Queued AI Bridge analysis job', ['doc_id' => $document->doc_id, 'job_id' => $jobId]);
+                return true;
+            }
+
+            Log::warning('AI Bridge did not queue analysis job, analyzing synchronously', [
+                'doc_id' => $document->doc_id,
+                'status' => $response->status(),
+                'body' => substr($response->body(), 0, 500)
+            ]);
+            return false;
+
+        } catch (\Exception $e) {
+            Log::warning('AI Bridge analysis job submission failed, analyzing synchronously', [
+                'doc_id' => $document->doc_id,
+                'error' => $e->getMessage()
+            ]);
+            return false;
+        }
+    }
+
+    /**
+     * Apply a finished AI Bridge analysis job delivered by callback
+     * Returns false for unknown or already handled jobs
+     */
+    public function handleAnalysisJobResult(array $payload): bool
+    {
+        $cacheKey = 'ai_analysis_job:' . ($payload['job_id'] ?? '');
+        $docId = Cache::get($cacheKey);
+        if ($docId === null || (int) $docId !== (int) ($payload['docId'] ?? 0)) {
+            return false;
+        }
+        Cache::forget($cacheKey);
+
+        $document = Document::find($docId);
+        if (!$document) {
+            return false;
+        }
+
+        if (($payload['status'] ?? null) !== 'completed' || empty($payload['result'])) {
+            Log::warning('AI Bridge analysis job failed', [
+                'doc_id' => $docId,
+                'job_id' => $payload['job_id'],
+                'error' => $payload['error'] ?? null
+            ]);
+            $this->summarizeRemarks($document);
+            return true;
+        }
+
+        $this->applyAiAnalysis($document, $payload['result']);
+        return true;
+    }
+
+    /**
+     * Store the AI Bridge title, description, remarks and suggested folder on a document
+     */
+    private function applyAiAnalysis(Document $document, array $aiResult): void
+    {
+        $document->title = $aiResult['title'] ?? $document->title;
+        $document->description = $aiResult['description'] ?? null;
+        $document->remarks = $aiResult['remarks'] ?? null;
+        $document->ai_suggested_folder = $aiResult['suggested_folder'] ?? null;
+        $document->save();
+        $this->summarizeRemarks($document);
+        Log::info('Updated document via AI Bridge (local Llama)', [
+            'doc_id' => $document->doc_id,
+            'title' => $document->title,
+            'description' => substr($document->description ?? '', 0, 100),
+            'suggested_folder' => $document->ai_suggested_folder
+        ]);
+    }
+
+    /**
+     * Keep AI-generated remarks if the document has them, otherwise replace old processing
+     * info with the first sentence of the description
+     */
+    private function summarizeRemarks(Document $document): void
+    {
+        // Update document status to active after successful processing
+        // REMOVED: Do not set to active yet. Wait for user to accept AI suggestions or manual review.
+        // $updateData = ['status' => 'active'];
+        $updateData = [];
+
+        if (empty($document->remarks) || str_contains($document->remarks, 'Processed into') || str_contains($document->remarks, 'chunks')) {
+            if (!empty($document->description)) {
+                $descriptionSummary = $document->description;
+                $firstSentence = preg_split('/(?<=[.!?])\s+/', $descriptionSummary, 2);
+                $updateData['remarks'] = strlen($firstSentence[0]) > 150
+                    ? substr($firstSentence[0], 0, 147) . '...'
+                    : $firstSentence[0];
+            } else {
+                $updateData['remarks'] = null;
+            }
+        }
+
+        $document->update($updateData);
+    }
 }
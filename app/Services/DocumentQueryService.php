@@ -4,6 +4,7 @@
 
 use App\Models\Document;
 use App\Models\DocumentEmbedding;
+use App\Models\DocumentEmbeddingTombstone;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\Log;
 
@@ -167,6 +168,7 @@ public function getAllEmbeddings(): array
                     'chunk_index' => $embedding->chunk_index,
                     'chunk_text' => $embedding->chunk_text,
                     'embedding_vector' => json_decode($embedding->embedding_vector),
+                    'model_namespace' => $this->embeddingNamespace($embedding),
                     'created_at' => $embedding->created_at
                 ];
             });
@@ -178,6 +180,153 @@ public function getAllEmbeddings(): array
         ];
     }
 
+    /**
+     * Get chunk text and document title for a batch of embeddings of active documents
+     */
+    public function getEmbeddingTexts(array $embeddingIds): array
+    {
+        return DocumentEmbedding::with('document:doc_id,title,status')
+            ->whereIn('embedding_id', $embeddingIds)
+            ->whereHas('document', function($query) {
+                $query->where('status', 'active');
+            })
+            ->get(['embedding_id', 'doc_id', 'chunk_text'])
+            ->map(function ($embedding) {
+                return [
+                    'embedding_id' => $embedding->embedding_id,
+                    'doc_id' => $embedding->doc_id,
+                    'document_title' => $embedding->document->title,
+                    'chunk_text' => $embedding->chunk_text
+                ];
+            })
+            ->values()
+            ->all();
+    }
+
+    /**
+     * Stream embedding rows changed since a sync cursor as newline-delimited JSON rows.
+     *
+     * Rows are ordered by (updated_at, embedding_id). Rows of documents that are no longer
+     * active, and embeddings deleted since the cursor, are sent as tombstones. The final line
+     * carries the cursor to resume from and whether more rows are pending. Rows touched in the
+     * last two seconds are held back so a same-second update can never land behind the cursor.
+     */
+    public function streamEmbeddingChanges(?string $cursor, int $limit, bool $includeText = true): \Generator
+    {
+        $position = $this->decodeSyncCursor($cursor);
+        $sent = 0;
+
+        $rows = DocumentEmbedding::with('document:doc_id,title,status,folder_id')
+            ->where('updated_at', '<=', now()->subSeconds(2))
+            ->where(function ($query) use ($position) {
+                $query->where('updated_at', '>', $position['updated_at'])
+                    ->orWhere(function ($query) use ($position) {
+                        $query->where('updated_at', $position['updated_at'])
+                            ->where('embedding_id', '>', $position['embedding_id']);
+                    });
+            })
+            ->orderBy('updated_at')
+            ->orderBy('embedding_id')
+            ->limit($limit)
+            ->get();
+
+        foreach ($rows as $embedding) {
+            $document = $embedding->document;
+
+            if (!$document || $document->status !== 'active') {
+                yield [
+                    'embedding_id' => $embedding->embedding_id,
+                    'doc_id' => $embedding->doc_id,
+                    'deleted' => true
+                ];
+            } else {
+                $row = [
+                    'embedding_id' => $embedding->embedding_id,
+                    'doc_id' => $embedding->doc_id,
+                    'document_title' => $document->title,
+                    'folder_id' => $document->folder_id,
+                    'chunk_index' => $embedding->chunk_index,
+                    'embedding_vector' => json_decode($embedding->embedding_vector),
+                    'model_namespace' => $this->embeddingNamespace($embedding),
+                    'deleted' => false
+                ];
+
+                if ($includeText) {
+                    $row['chunk_text'] = $embedding->chunk_text;
+                }
+
+                yield $row;
+            }
+
+            $position['updated_at'] = $embedding->updated_at->format('Y-m-d H:i:s');
+            $position['embedding_id'] = $embedding->embedding_id;
+            $sent++;
+        }
+
+        $tombstones = DocumentEmbeddingTombstone::where('tombstone_id', '>', $position['tombstone_id'])
+            ->orderBy('tombstone_id')
+            ->limit($limit)
+            ->get();
+
+        $sentTombstones = 0;
+        foreach ($tombstones as $tombstone) {
+            yield [
+                'embedding_id' => $tombstone->embedding_id,
+                'doc_id' => $tombstone->doc_id,
+                'deleted' => true
+            ];
+
+            $position['tombstone_id'] = $tombstone->tombstone_id;
+            $sentTombstones++;
+        }
+
+        yield [
+            'next_cursor' => $this->encodeSyncCursor($position),
+            'has_more' => $sent >= $limit || $sentTombstones >= $limit
+        ];
+    }
+
+    /**
+     * Decode an opaque AI Bridge sync cursor; an empty cursor starts from the beginning
+     */
+    private function decodeSyncCursor(?string $cursor): array
+    {
+        $position = [
+            'updated_at' => '1970-01-01 00:00:00',
+            'embedding_id' => 0,
+            'tombstone_id' => 0
+        ];
+
+        if ($cursor) {
+            $decoded = json_decode(base64_decode($cursor, true) ?: '', true);
+            if (is_array($decoded)) {
+                $position = array_merge($position, array_intersect_key($decoded, $position));
+            }
+        }
+
+        return $position;
+    }
+
+    private function encodeSyncCursor(array $position): string
+    {
+        return base64_encode(json_encode($position));
+    }
+
+    /**
+     * Model/version namespace of a stored vector.
+     * Rows stored before namespaces existed were produced by the MiniLM embedding service.
+     */
+    private function embeddingNamespace(DocumentEmbedding $embedding): string
+    {
+        $metadata = $embedding->metadata ?? [];
+
+        if (!empty($metadata['model_namespace'])) {
+            return $metadata['model_namespace'];
+        }
+
+        return ($metadata['model_type'] ?? 'all-MiniLM-L6-v2') . '@1';
+    }
+
     /**
      * Get latest uploaded document by user
      */
@@ -192,12 +341,12 @@ public function getLatestProcessingDocument(int $userId): ?Document
     /**
      * Store embeddings from AI Bridge Service
      */
-    public function storeEmbeddings(int $docId, array $embeddings, string $modelUsed): int
+    public function storeEmbeddings(int $docId, array $embeddings, string $modelUsed, ?string $modelNamespace = null): int
     {
         $document = Document::findOrFail($docId);
 
         // Clear existing embeddings for this document
-        DocumentEmbedding::where('doc_id', $docId)->delete();
+        DocumentEmbedding::deleteForDocument($docId);
 
         // Store new embeddings
         foreach ($embeddings as $index => $embeddingData) {
@@ -208,6 +357,7 @@ public function storeEmbeddings(int $docId, array $embeddings, string $modelUsed
                 'embedding_vector' => json_encode($embeddingData['embedding']),
                 'metadata' => [
                     'model_type' => $modelUsed,
+                    'model_namespace' => $modelNamespace ?? $embeddingData['model_namespace'] ?? $modelUsed . '@1',
                     'embedding_dimensions' => count($embeddingData['embedding']),
                     'chunk_length' => strlen($embeddingData['chunk_text']),
                     'generated_at' => now()->toISOString(),
@@ -5,6 +5,7 @@
 use App\Models\Document;
 use App\Models\DocumentEmbedding;
 use Illuminate\Support\Facades\Storage;
+use Illuminate\Support\Facades\Http;
 use Illuminate\Support\Facades\Log;
 
 /**
@@ -169,7 +170,17 @@ public function deleteDocument(Document $document): void
         }
 
         // Delete document embeddings if they exist
-        DocumentEmbedding::where('doc_id', $document->doc_id)->delete();
+        DocumentEmbedding::deleteForDocument($document->doc_id);
+
+        // Stop offering this document's analysis for reuse by near-duplicate uploads
+        try {
+            Http::timeout(5)->delete(env('AI_BRIDGE_URL', 'http://127.0.0.1:5003') . "/api/documents/near-duplicates/{$document->doc_id}");
+        } catch (\Exception $e) {
+            Log::warning('Failed to remove near-duplicate signature', [
+                'doc_id' => $document->doc_id,
+                'error' => $e->getMessage()
+            ]);
+        }
     }
 
     /**
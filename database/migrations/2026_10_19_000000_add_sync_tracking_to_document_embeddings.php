@@ -0,0 +1,45 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\DB;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        Schema::table('document_embeddings', function (Blueprint $table) {
+            // Change tracking for the AI Bridge incremental sync cursor
+            $table->timestamp('updated_at')->nullable()->after('created_at');
+            $table->index(['updated_at', 'embedding_id']);
+        });
+
+        DB::table('document_embeddings')->update(['updated_at' => DB::raw('created_at')]);
+
+        Schema::create('document_embedding_tombstones', function (Blueprint $table) {
+            $table->id('tombstone_id');
+            $table->unsignedBigInteger('embedding_id');
+            $table->unsignedBigInteger('doc_id');
+            $table->timestamp('deleted_at')->useCurrent();
+
+            $table->index('deleted_at');
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::dropIfExists('document_embedding_tombstones');
+
+        Schema::table('document_embeddings', function (Blueprint $table) {
+            $table->dropIndex(['updated_at', 'embedding_id']);
+            $table->dropColumn('updated_at');
+        });
+    }
+};
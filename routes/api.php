@@ -43,6 +43,9 @@
 Route::get('/ai/categories/public', [DocumentController::class, 'getAICategories']);
 Route::get('/ai/folders/public', [DocumentController::class, 'getAIFolders']);
 Route::get('/document-embeddings/all', [DocumentController::class, 'getAllEmbeddings']); // Public endpoint for semantic search
+Route::get('/document-embeddings/changes', [DocumentController::class, 'getEmbeddingChanges']); // Incremental sync feed for AI Bridge
+Route::post('/document-embeddings/texts', [DocumentController::class, 'getEmbeddingTexts']); // Chunk text of search hits for AI Bridge
+Route::post('/ai/analysis-results', [AIProcessController::class, 'receiveAnalysisResult']); // Async analysis job callback from AI Bridge
 
 // Public scanner upload endpoint (for local scanner service)
 Route::post('/scanner/upload', [DocumentController::class, 'scannerUpload']);